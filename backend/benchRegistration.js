@@ -0,0 +1,126 @@
+import { ethers } from "ethers";
+import { createRequire } from "module";
+import { registerVotersBatched, sendPipelined } from "./txPipeline.js";
+
+/* ============================================================
+   VOTER REGISTRATION BENCHMARK (local Hardhat node)
+
+   Deploys a fresh Voting contract per mode and registers the same
+   random voter roll with:
+
+     sequential  registerVoter + wait per voter (the old createElection)
+     pipelined   registerVoter per voter, nonces managed, N in flight
+     batched     registerVoters chunks sized by gas, pipelined
+
+   and reports wall-clock time, transactions and gas used. --block-ms
+   switches the node to interval mining so confirmations cost real
+   block time; the sequential mode is then timed on --sequential-limit
+   voters and extrapolated.
+
+     cd smart-contract && npx hardhat compile && npx hardhat node
+     cd backend && node benchRegistration.js --voters 10000 --block-ms 1000
+============================================================ */
+
+const require = createRequire(import.meta.url);
+
+const arg = (name, fallback) => {
+  const i = process.argv.indexOf(`--${name}`);
+  return i === -1 ? fallback : process.argv[i + 1];
+};
+
+const RPC_URL = arg("rpc", process.env.BENCH_RPC_URL || "http://127.0.0.1:8545");
+const VOTERS = Number(arg("voters", 10000));
+const BLOCK_MS = Number(arg("block-ms", 0));
+const SEQUENTIAL_LIMIT = Number(arg("sequential-limit", BLOCK_MS ? 50 : VOTERS));
+const MODES = arg("modes", "sequential,pipelined,batched").split(",");
+const ARTIFACT = arg(
+  "artifact",
+  "../smart-contract/artifacts/contracts/Voting.sol/Voting.json"
+);
+
+const deploy = async (signer) => {
+  const Voting = require(ARTIFACT);
+  const factory = new ethers.ContractFactory(Voting.abi, Voting.bytecode, signer);
+  const contract = await factory.deploy();
+  await contract.waitForDeployment();
+  return contract;
+};
+
+const MODE_RUNNERS = {
+  sequential: async (contract, voters) => {
+    let gasUsed = 0n;
+    for (const voter of voters) {
+      const tx = await contract.registerVoter(voter);
+      gasUsed += (await tx.wait()).gasUsed;
+    }
+    return { transactions: voters.length, gasUsed };
+  },
+
+  pipelined: async (contract, voters) => {
+    const results = await sendPipelined(
+      contract.runner,
+      voters.map((v) => (overrides) => contract.registerVoter(v, overrides))
+    );
+    return {
+      transactions: results.length,
+      gasUsed: results.reduce((g, r) => g + BigInt(r.gasUsed), 0n),
+      failed: results.filter((r) => !r.ok).length,
+    };
+  },
+
+  batched: async (contract, voters) => {
+    const summary = await registerVotersBatched(contract, voters);
+    return {
+      transactions: summary.transactions,
+      gasUsed: summary.gasUsed,
+      failed: summary.failedEntries,
+    };
+  },
+};
+
+const main = async () => {
+  const provider = new ethers.JsonRpcProvider(RPC_URL);
+  const signer = await provider.getSigner(0);
+
+  if (BLOCK_MS > 0) {
+    await provider.send("evm_setAutomine", [false]);
+    await provider.send("evm_setIntervalMining", [BLOCK_MS]);
+  }
+
+  const voters = Array.from({ length: VOTERS }, () =>
+    ethers.getAddress(ethers.hexlify(ethers.randomBytes(20)))
+  );
+  const report = { voters: VOTERS, blockMs: BLOCK_MS, modes: {} };
+
+  try {
+    for (const mode of MODES) {
+      const contract = await deploy(signer);
+      const roll = mode === "sequential" ? voters.slice(0, SEQUENTIAL_LIMIT) : voters;
+
+      const start = performance.now();
+      const result = await MODE_RUNNERS[mode](contract, roll);
+      const seconds = (performance.now() - start) / 1000;
+
+      const scale = VOTERS / roll.length;
+      report.modes[mode] = {
+        measuredVoters: roll.length,
+        seconds: Number((seconds * scale).toFixed(2)),
+        extrapolated: scale !== 1,
+        transactions: Math.round(result.transactions * scale),
+        gasUsed: (result.gasUsed * BigInt(Math.round(scale * 1000)) / 1000n).toString(),
+        gasPerVoter: Number(result.gasUsed / BigInt(roll.length)),
+        failed: result.failed ?? 0,
+      };
+      console.log(mode, report.modes[mode]);
+    }
+  } finally {
+    if (BLOCK_MS > 0) await provider.send("evm_setAutomine", [true]);
+  }
+
+  console.log(JSON.stringify(report, null, 2));
+};
+
+main().catch((err) => {
+  console.error("❌ Benchmark failed:", err);
+  process.exitCode = 1;
+});
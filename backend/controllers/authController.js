@@ -2,8 +2,10 @@ import User from "../models/User.js";
 import fs from "fs";
 import path from "path";
 import { fileURLToPath } from "url";
-import { execSync } from "child_process";
+import { exec } from "child_process";
+import { promisify } from "util";
 import { votingContract } from "../blockchain.js";
+import { requestEnrollService, requestFaceService } from "../faceService.js";
 
 // import Ganache wallets
 import { ganacheWallets } from "../Wallet.js";
@@ -14,6 +16,8 @@ const __dirname = path.dirname(__filename);
 // Start assigning wallets from index 1 (index 0 reserved for Admin)
 let ganacheIndex = 0;
 
+const execAsync = promisify(exec);
+
 export const registerUser = async (req, res) => {
   try {
     const { name, email, contact, password, photos } = req.body;
@@ -46,27 +50,44 @@ export const registerUser = async (req, res) => {
     // const voterId = email;
     const voterDatasetPath = path.join(__dirname, "..", "dataset", email);
 
-    fs.mkdirSync(voterDatasetPath, { recursive: true });
+    await fs.promises.mkdir(voterDatasetPath, { recursive: true });
 
-    photos.forEach((img, i) => {
-      const buffer = Buffer.from(
-        img.replace(/^data:image\/\w+;base64,/, ""),
-        "base64"
-      );
-      fs.writeFileSync(path.join(voterDatasetPath, `${i}.jpg`), buffer);
-    });
+    await Promise.all(
+      photos.map((img, i) => {
+        const buffer = Buffer.from(
+          img.replace(/^data:image\/\w+;base64,/, ""),
+          "base64"
+        );
+        return fs.promises.writeFile(path.join(voterDatasetPath, `${i}.jpg`), buffer);
+      })
+    );
 
     // -------------------------------
-    // 3️⃣ Run Python face encoding
+    // 3️⃣ Queue Python face encoding
     // -------------------------------
-    const encodeScript = path.join(
-      __dirname,
-      "..",
-      "python",
-      "feature_encoding.py"
-    );
+    // The enrollment workers encode in the background; the client polls
+    // GET /enrollment/:email for progress. Without the queue service the
+    // script runs as before, but without blocking the event loop.
+    let enrollment;
+    try {
+      const reply = await requestEnrollService({ op: "submit", voterId: email });
+      if (reply.error) throw new Error(reply.error);
+      enrollment = reply.job;
+      console.log(`Enrollment job ${enrollment.id} queued for ${email}`);
+    } catch (err) {
+      console.log("⚠️ Enrollment queue unavailable, spawning Python:", err.message);
+
+      const encodeScript = path.join(
+        __dirname,
+        "..",
+        "python",
+        "feature_encoding.py"
+      );
 
-    execSync(`py -3.10 "${encodeScript}" ${email}`, { stdio: "inherit" });
+      const { stdout } = await execAsync(`py -3.10 "${encodeScript}" ${email}`);
+      console.log(stdout);
+      enrollment = { status: "done" };
+    }
 
     const faceEncodingPath = `encodings/${email}_face_recognition.npy`;
     const robustEncodingPath = `encodings/${email}_robust.npy`;
@@ -94,6 +115,7 @@ export const registerUser = async (req, res) => {
       message: "User registered successfully",
       voterId,
       wallet: assigned.address,
+      enrollment: { jobId: enrollment.id ?? null, status: enrollment.status },
     });
 
   } catch (err) {
@@ -142,29 +164,87 @@ export const loginUser = async (req, res) => {
 };
 
 
+/* ============================================================
+   ENROLLMENT STATUS (job queue)
+============================================================ */
+export const enrollmentStatus = async (req, res) => {
+  try {
+    const reply = await requestEnrollService({ op: "status", voterId: req.params.email });
+    if (reply.error) {
+      return res.status(400).json({ error: reply.error });
+    }
+    if (!reply.job) {
+      return res.status(404).json({ error: "No enrollment job for this voter" });
+    }
+
+    const { id, status, progress, done, total, attempts, message } = reply.job;
+    return res.json({ jobId: id, status, progress, done, total, attempts, message });
+  } catch (err) {
+    console.log("❌ Enrollment Status Error:", err.message);
+    res.status(503).json({ error: "Enrollment service unavailable" });
+  }
+};
+
+export const enrollmentMetrics = async (req, res) => {
+  try {
+    const reply = await requestEnrollService({ op: "metrics" });
+    return res.json(reply.metrics);
+  } catch (err) {
+    console.log("❌ Enrollment Metrics Error:", err.message);
+    res.status(503).json({ error: "Enrollment service unavailable" });
+  }
+};
+
+
 /* ============================================================
    VERIFY FACE (Python call)
 ============================================================ */
 export const verifyFace = async (req, res) => {
   try {
-    const { voterId, image } = req.body;
+    const { voterId, image, images } = req.body;
 
-    if (!image) {
+    /* A burst of frames (images) is verified frame by frame until one
+       clearly matches, so one blurred frame does not fail the login */
+    const frames = Array.isArray(images) && images.length > 0 ? images : image ? [image] : [];
+    if (frames.length === 0) {
       return res.status(400).json({ error: "Image required" });
     }
 
-    const tempDir = path.join(__dirname, "..", "temp");
-    fs.mkdirSync(tempDir, { recursive: true });
+    /* Decode Base64 images; they are handed to Python in memory */
+    const base64Frames = frames.map((f) => f.replace(/^data:image\/\w+;base64,/, ""));
+    const buffers = base64Frames.map((f) => Buffer.from(f, "base64"));
+    console.log("received buffer sizes:", buffers.map((b) => b.length));
+
+    /* Optional debug dump of the login frames */
+    if (process.env.FACE_DEBUG_DUMP) {
+      const tempDir = path.join(__dirname, "..", "temp");
+      fs.mkdirSync(tempDir, { recursive: true });
+      const stamp = Date.now();
+      buffers.forEach((buffer, i) =>
+        fs.writeFileSync(path.join(tempDir, `${voterId}_${stamp}_${i}.jpg`), buffer));
+    }
 
-    const tempPath = path.join(tempDir, `${voterId}.jpg`);
+    const burst = base64Frames.length > 1;
 
-    /* Save Base64 image */
-    const buffer = Buffer.from(
-      image.replace(/^data:image\/\w+;base64,/, ""),
-      "base64"
-    );
-    fs.writeFileSync(tempPath, buffer);
-    console.log("received buffer size:", buffer.length);
+    /* Prefer the warm face_server; spawn the script only if it is down */
+    try {
+      const result = await requestFaceService(
+        burst ? { voterId, images: base64Frames } : { voterId, image: base64Frames[0] }
+      );
+      console.log("Face Server Result:", result);
+
+      // outcome is machine-readable, e.g. quality_blurred / quality_too_dark
+      // when the frame was rejected before encoding, so the client can
+      // ask for a better frame instead of retrying the same one
+      return res.json({
+        success: Boolean(result.success),
+        confidence: result.success ? 100 : 0,
+        outcome: result.outcome,
+        framesUsed: result.frames_used ?? 1,
+      });
+    } catch (err) {
+      console.log("⚠️ Face server unavailable, spawning Python:", err.message);
+    }
 
     const verifyScript = path.join(
       __dirname,
@@ -175,9 +255,14 @@ export const verifyFace = async (req, res) => {
 
     let output;
     try {
-      output = execSync(`py -3.10 "${verifyScript}" ${voterId}`, {
-        encoding: "utf8",
-      });
+      // A burst goes in as one base64 frame per line; exec's promise
+      // carries the child, so the frames are written to its stdin
+      const pending = execAsync(
+        `py -3.10 "${verifyScript}" ${voterId} ${burst ? "--stdin-burst" : "--stdin"}`,
+        { maxBuffer: 10 * 1024 * 1024 }
+      );
+      pending.child.stdin.end(burst ? base64Frames.join("\n") : buffers[0]);
+      ({ stdout: output } = await pending);
     } catch (err) {
       console.log("❌ Python Verification Error");
       return res.json({ success: false, confidence: 0 });
@@ -185,11 +270,23 @@ export const verifyFace = async (req, res) => {
 
     console.log("Python Output:", output);
 
-    if (output.includes("SUCCESS")) {
-      return res.json({ success: true, confidence: 100 });
-    } else {
+    // face_recog.py prints the same result object face_server returns
+    // as `RESULT <json>`
+    const line = output.split("\n").find((l) => l.startsWith("RESULT "));
+    let result;
+    try {
+      result = JSON.parse(line.slice("RESULT ".length));
+    } catch (err) {
+      console.log("❌ Python Verification Error: no RESULT line");
       return res.json({ success: false, confidence: 0 });
     }
+
+    return res.json({
+      success: Boolean(result.success),
+      confidence: result.success ? 100 : 0,
+      outcome: result.outcome,
+      framesUsed: result.frames_used ?? 1,
+    });
   } catch (err) {
     console.log("❌ Face Verify Error:", err);
     res.status(500).json({ error: "Face verification failed" });
@@ -2,6 +2,8 @@ import Election from "../models/election.js";
 import User from "../models/User.js";
 import Vote from "../models/vote.js";
 import { votingContract } from "../blockchain.js";
+import { addCandidatesBatched, registerVotersBatched } from "../txPipeline.js";
+import { requestTallyService } from "../faceService.js";
 /* -------------------------------------------------------
    CREATE ELECTION (NO BLOCKCHAIN)
 ------------------------------------------------------- */
@@ -40,33 +42,31 @@ export const createElection = async (req, res) => {
     }
 
     /* 🔥 1️⃣ Add candidates to Blockchain BEFORE saving DB */
-    for (const c of candidates) {
-      console.log("📤 Adding candidate to blockchain:", c.name);
+    // Batched and pipelined (see txPipeline.js); candidate ids follow the
+    // order of the list, as before
+    console.log("📤 Adding candidates to blockchain:", candidates.map((c) => c.name));
 
-      const tx = await votingContract.addCandidate(c.name);
-      await tx.wait(); // wait for blockchain confirmation
+    const added = await addCandidatesBatched(votingContract, candidates.map((c) => c.name));
+    if (added.failedEntries > 0) {
+      throw new Error(`Failed to add ${added.failedEntries} candidates: ${added.errors[0]}`);
     }
 
-    console.log("✅ All candidates added to blockchain");
+    console.log(`✅ All candidates added to blockchain (${added.transactions} tx)`);
 
 
-      const users = await User.find({}, "walletAddress");
+    const users = await User.find({}, "walletAddress");
+    const addresses = users.map((u) => u.walletAddress).filter(Boolean);
 
-    console.log(`👥 Registering ${users.length} voters on blockchain`);
+    console.log(`👥 Registering ${addresses.length} voters on blockchain`);
 
-    for (const user of users) {
-      if (!user.walletAddress) continue;
-
-      try {
-        const tx = await votingContract.registerVoter(user.walletAddress);
-        await tx.wait();
-        console.log(`   🟢 Registered: ${user.walletAddress}`);
-      } catch (err) {
-        console.log(`   🔴 Already registered or error: ${user.walletAddress}`);
-      }
+    const registered = await registerVotersBatched(votingContract, addresses);
+    if (registered.failedEntries > 0) {
+      console.log(`   🔴 ${registered.failedEntries} voters not registered:`, registered.errors);
     }
 
-    console.log("✅ All voters registered on blockchain");
+    console.log(
+      `✅ Voters registered on blockchain: ${registered.transactions} tx, gas ${registered.gasUsed}`
+    );
 
 
     /* 🔥 2️⃣ Start election on Blockchain */
@@ -265,4 +265,37 @@ export const fetchElectionResults = async (req, res) => {
     console.error("❌ All Results Fetch Error:", err);
     res.status(500).json({ error: "Failed to fetch all election results" });
   }
-};
\ No newline at end of file
+};
+
+
+/* -------------------------------------------------------
+   ON-CHAIN RESULTS (tally indexer)
+------------------------------------------------------- */
+// Served from python/tally_indexer.py's local store: tallies and
+// turnout as of its last indexed block, without a call to the chain.
+export const fetchChainResults = async (req, res) => {
+  try {
+    const reply = await requestTallyService({ op: "results" });
+    if (reply.error) {
+      return res.status(500).json({ error: reply.error });
+    }
+
+    const { candidates, registered, voted, turnout, block } = reply.results;
+    const winnerData = determineWinner(candidates);
+
+    return res.json({
+      success: true,
+      candidates,
+      registered,
+      voted,
+      turnout,
+      block,
+      winner: winnerData.name,
+      winningVotes: winnerData.votes,
+      status: winnerData.status
+    });
+  } catch (err) {
+    console.error("❌ Chain Results Error:", err.message);
+    res.status(503).json({ error: "Tally indexer unavailable" });
+  }
+};
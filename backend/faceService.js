@@ -0,0 +1,61 @@
+import net from "net";
+
+// Talks to the long-running python/face_server.py over its JSON-lines
+// TCP protocol. Callers fall back to spawning the script when the
+// service is not running.
+const FACE_SERVER_HOST = process.env.FACE_SERVER_HOST || "127.0.0.1";
+const FACE_SERVER_PORT = Number(process.env.FACE_SERVER_PORT || 5055);
+const FACE_SERVER_TIMEOUT_MS = Number(process.env.FACE_SERVER_TIMEOUT_MS || 15000);
+
+// python/enroll_queue.py serves the same protocol for enrollment jobs.
+const ENROLL_SERVER_HOST = process.env.ENROLL_SERVER_HOST || "127.0.0.1";
+const ENROLL_SERVER_PORT = Number(process.env.ENROLL_SERVER_PORT || 5056);
+const ENROLL_SERVER_TIMEOUT_MS = Number(process.env.ENROLL_SERVER_TIMEOUT_MS || 5000);
+
+// ...and python/tally_indexer.py for on-chain results.
+const TALLY_SERVER_HOST = process.env.TALLY_SERVER_HOST || "127.0.0.1";
+const TALLY_SERVER_PORT = Number(process.env.TALLY_SERVER_PORT || 5057);
+const TALLY_SERVER_TIMEOUT_MS = Number(process.env.TALLY_SERVER_TIMEOUT_MS || 2000);
+
+let nextRequestId = 1;
+
+const requestJsonLines = (host, port, timeoutMs, payload) =>
+  new Promise((resolve, reject) => {
+    const socket = net.createConnection({ host, port });
+    const request = { id: nextRequestId++, ...payload };
+    let buffer = "";
+
+    socket.setTimeout(timeoutMs);
+
+    socket.on("connect", () => {
+      socket.write(JSON.stringify(request) + "\n");
+    });
+
+    socket.on("data", (chunk) => {
+      buffer += chunk.toString("utf8");
+      const newline = buffer.indexOf("\n");
+      if (newline === -1) return;
+
+      socket.end();
+      try {
+        resolve(JSON.parse(buffer.slice(0, newline)));
+      } catch (err) {
+        reject(err);
+      }
+    });
+
+    socket.on("timeout", () => {
+      socket.destroy(new Error(`Service on ${host}:${port} timed out`));
+    });
+
+    socket.on("error", reject);
+  });
+
+export const requestFaceService = (payload) =>
+  requestJsonLines(FACE_SERVER_HOST, FACE_SERVER_PORT, FACE_SERVER_TIMEOUT_MS, payload);
+
+export const requestEnrollService = (payload) =>
+  requestJsonLines(ENROLL_SERVER_HOST, ENROLL_SERVER_PORT, ENROLL_SERVER_TIMEOUT_MS, payload);
+
+export const requestTallyService = (payload) =>
+  requestJsonLines(TALLY_SERVER_HOST, TALLY_SERVER_PORT, TALLY_SERVER_TIMEOUT_MS, payload);
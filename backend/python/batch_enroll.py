@@ -0,0 +1,198 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# -------------------------------------------------------------
+# BATCH ENROLLMENT
+#
+# Encodes many voters at once with a process pool sized to the
+# machine. Workers only compute; the parent process is the single
+# writer of the .npy files and the embedding store.
+#
+#   python python/batch_enroll.py --all
+#   python python/batch_enroll.py a@gmail.com b@gmail.com --workers 4
+# -------------------------------------------------------------
+
+_encoder = None
+
+
+def _init_worker():
+    # One RobustFaceEncoder (and one dlib model load) per worker process.
+    global _encoder
+    import feature_encoding
+    from lazy_imports import ensure_loaded
+    ensure_loaded(feature_encoding.face_recognition)
+    feature_encoding.get_backend().warm()
+    _encoder = feature_encoding.RobustFaceEncoder()
+
+
+def _encode_voter(voter_id):
+    from encoding_cache import EncodingCache
+    from feature_encoding import STAGES, encode_voter_images, list_voter_images
+
+    timings = dict.fromkeys(STAGES, 0.0)
+    try:
+        image_files = list_voter_images(voter_id)
+        if image_files is None:
+            raise FileNotFoundError(f"No dataset found for voter ID: {voter_id}")
+        if not image_files:
+            raise FileNotFoundError(f"No images found for voter ID: {voter_id}")
+
+        # Each voter has its own cache file, so workers never share one.
+        cache = EncodingCache(voter_id)
+        fr, robust, _ = encode_voter_images(
+            voter_id, image_files, _encoder, log=lambda *_: None, timings=timings,
+            cache=cache,
+        )
+        cache.save()
+        return {
+            "voter_id": voter_id,
+            "images": len(image_files),
+            "fr": np.array(fr),
+            "robust": np.array(robust),
+            "timings": timings,
+            "error": None,
+        }
+    except Exception as e:
+        return {"voter_id": voter_id, "images": 0, "timings": timings,
+                "error": f"{type(e).__name__}: {e}"}
+
+
+def discover_voters(dataset_dir="dataset"):
+    return sorted(
+        d for d in os.listdir(dataset_dir)
+        if os.path.isdir(os.path.join(dataset_dir, d))
+    )
+
+
+def enroll_batch(voter_ids, workers=None, prototypes=False):
+    """
+    Encodes and saves every voter in voter_ids. A failure for one voter
+    is recorded and the batch carries on.
+
+    Returns a report dict with per-voter errors and per-stage throughput.
+    """
+    from face_metrics import record, to_ms
+    from feature_encoding import STAGES, save_encodings
+
+    workers = workers or os.cpu_count() or 1
+    stage_time = dict.fromkeys(STAGES, 0.0)
+    stage_time["save"] = 0.0
+    images = 0
+    enrolled = []
+    failed = {}
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(_encode_voter, v): v for v in voter_ids}
+
+        for future in as_completed(futures):
+            voter_id = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. dlib crash); keep going.
+                failed[voter_id] = f"{type(e).__name__}: {e}"
+                print(f"❌ {voter_id}: {failed[voter_id]}")
+                continue
+
+            for stage, seconds in result["timings"].items():
+                stage_time[stage] += seconds
+
+            if result["error"]:
+                failed[voter_id] = result["error"]
+                record("encode", {"voter_id": voter_id, "images": 0, "outcome": "error",
+                                  "error": result["error"]}, to_ms(result["timings"]))
+                print(f"❌ {voter_id}: {result['error']}")
+                continue
+
+            images += result["images"]
+
+            t = time.perf_counter()
+            try:
+                saved = save_encodings(voter_id, result["fr"], result["robust"],
+                                       prototypes=prototypes)
+            except Exception as e:
+                failed[voter_id] = f"save failed: {e}"
+                print(f"❌ {voter_id}: {failed[voter_id]}")
+                continue
+            finally:
+                stage_time["save"] += time.perf_counter() - t
+
+            record("encode", {"voter_id": voter_id, "images": result["images"],
+                              "success_count": len(result["fr"]),
+                              "outcome": "success" if saved else "no_encodings"},
+                   to_ms(result["timings"]))
+
+            if not saved:
+                failed[voter_id] = "No encodings generated"
+                print(f"⚠️ {voter_id}: no face found in any image")
+                continue
+
+            enrolled.append(voter_id)
+            print(f"✅ {voter_id}: {len(result['fr'])} FR / {len(result['robust'])} robust "
+                  f"from {result['images']} images")
+
+    wall = time.perf_counter() - start
+
+    # Stage times are summed over all workers, so images / stage time is
+    # the per-worker rate and multiplying by the worker count gives the
+    # aggregate the pool can sustain for that stage.
+    throughput = {
+        stage: round(images / seconds, 2) if seconds else None
+        for stage, seconds in stage_time.items()
+    }
+
+    return {
+        "workers": workers,
+        "voters": len(voter_ids),
+        "enrolled": len(enrolled),
+        "failed": failed,
+        "images": images,
+        "wall_s": round(wall, 2),
+        "images_per_s": round(images / wall, 2) if wall else None,
+        "stage_seconds": {k: round(v, 2) for k, v in stage_time.items()},
+        "stage_images_per_s_per_worker": throughput,
+    }
+
+
+def print_report(report):
+    print("\n=== BATCH SUMMARY ===")
+    print(f"Workers            : {report['workers']}")
+    print(f"Voters             : {report['voters']}")
+    print(f"Enrolled           : {report['enrolled']}")
+    print(f"Failed             : {len(report['failed'])}")
+    print(f"Images encoded     : {report['images']}")
+    print(f"Wall time          : {report['wall_s']} s")
+    print(f"Throughput         : {report['images_per_s']} images/s")
+    print("Per-stage (images/s per worker):")
+    for stage, rate in report["stage_images_per_s_per_worker"].items():
+        print(f"  {stage:<15}: {rate}  ({report['stage_seconds'][stage]} s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk voter enrollment")
+    parser.add_argument("voter_ids", nargs="*")
+    parser.add_argument("--all", action="store_true",
+                        help="Enroll every voter folder under dataset/")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("--prototypes", action="store_true",
+                        help="Also save compressed prototype templates")
+    args = parser.parse_args()
+
+    voter_ids = discover_voters() if args.all else args.voter_ids
+    if not voter_ids:
+        parser.error("give voter ids or --all")
+
+    report = enroll_batch(voter_ids, args.workers, args.prototypes)
+    print_report(report)
+    sys.exit(1 if report["failed"] and not report["enrolled"] else 0)
+
+
+if __name__ == "__main__":
+    main()
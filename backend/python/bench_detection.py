@@ -0,0 +1,98 @@
+import argparse
+import glob
+import json
+import os
+import time
+import cv2
+import face_recognition
+import numpy as np
+
+from face_recog import CASCADES, encode_login_face, load_stored_encodings
+
+# -------------------------------------------------------------
+# DETECTION CASCADE: ACCURACY vs LATENCY
+#
+# Every image under dataset/<voter>/ is treated as a login frame. For
+# each detector configuration we record detect+encode latency, how many
+# frames produced an encoding, how far the encoding moved from the
+# full-resolution baseline, and the genuine (own voter) and impostor
+# (closest other voter) distances that verify_voter would see. The
+# frames were also used for enrollment, so genuine distances are
+# optimistic in absolute terms; compare them between detectors.
+#
+#   python python/bench_detection.py --detectors full hog_small mediapipe
+# -------------------------------------------------------------
+
+
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 2) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detection cascade benchmark")
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--detectors", nargs="+", default=list(CASCADES))
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    args = parser.parse_args()
+
+    frames = []
+    for path in sorted(glob.glob(os.path.join(args.dataset, "*", "*.jpg"))):
+        img = cv2.imread(path)
+        if img is not None:
+            voter = os.path.basename(os.path.dirname(path))
+            frames.append((voter, cv2.cvtColor(img, cv2.COLOR_BGR2RGB)))
+
+    voters = sorted({v for v, _ in frames})
+    stored = {v: load_stored_encodings(v) for v in voters}
+    stored = {v: e for v, e in stored.items() if e is not None}
+
+    baseline = {}
+    report = {"frames": len(frames), "voters": len(stored), "detectors": {}}
+
+    for detector in ["full"] + [d for d in args.detectors if d != "full"]:
+        latencies, drift, genuine, impostor = [], [], [], []
+        encoded = accepted = false_accepts = 0
+
+        for i, (voter, rgb) in enumerate(frames):
+            timings = {}
+            t = time.perf_counter()
+            enc = encode_login_face(rgb, detector, timings)
+            latencies.append((time.perf_counter() - t) * 1000)
+            if enc is None:
+                continue
+            encoded += 1
+
+            if detector == "full":
+                baseline[i] = enc
+            elif i in baseline:
+                drift.append(float(np.linalg.norm(enc - baseline[i])))
+
+            if voter in stored:
+                g = float(face_recognition.face_distance(stored[voter], enc).min())
+                genuine.append(g)
+                accepted += g < args.tolerance
+
+            others = [float(face_recognition.face_distance(e, enc).min())
+                      for v, e in stored.items() if v != voter]
+            if others:
+                impostor.append(min(others))
+                false_accepts += min(others) < args.tolerance
+
+        report["detectors"][detector] = {
+            "cascade": CASCADES[detector],
+            "encoded": encoded,
+            "genuine_accept_rate": round(accepted / max(1, len(genuine)), 4),
+            "false_accepts": false_accepts,
+            "p50_ms": _percentile(latencies, 50),
+            "p99_ms": _percentile(latencies, 99),
+            "mean_ms": round(float(np.mean(latencies)), 2) if latencies else None,
+            "mean_genuine_distance": round(float(np.mean(genuine)), 4) if genuine else None,
+            "mean_impostor_distance": round(float(np.mean(impostor)), 4) if impostor else None,
+            "max_drift_vs_full": round(max(drift), 4) if drift else None,
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
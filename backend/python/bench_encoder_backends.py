@@ -0,0 +1,94 @@
+import argparse
+import glob
+import json
+import os
+import time
+import cv2
+import numpy as np
+
+from encoder_backends import BACKENDS, get_backend
+
+# -------------------------------------------------------------
+# ENCODER BACKEND THROUGHPUT
+#
+# Encodes the same set of face crops with every backend at every batch
+# size through the common encode(images, boxes) contract and reports
+# images/s, ms per image and per-call latency, plus the embedding size.
+# Crops come from dataset/<voter>/*.jpg (the whole image is the face
+# box), padded with noise up to --images so every configuration sees
+# the same work. Detection is not included.
+#
+# A backend whose dependency or model is missing (dlib not installed,
+# no FACE_ONNX_MODEL file) is reported as skipped with the reason.
+#
+#   python python/bench_encoder_backends.py --backends dlib robust onnx --batch-sizes 1 8 32
+# -------------------------------------------------------------
+
+
+def load_images(dataset_dir, count, size):
+    images = []
+    for path in sorted(glob.glob(os.path.join(dataset_dir, "*", "*.jpg"))):
+        img = cv2.imread(path)
+        if img is not None:
+            images.append(cv2.cvtColor(cv2.resize(img, (size, size)), cv2.COLOR_BGR2RGB))
+
+    rng = np.random.default_rng(0)
+    while len(images) < count:
+        images.append(rng.integers(0, 256, (size, size, 3), dtype=np.uint8))
+
+    return images[:count]
+
+
+def run(name, batch_size, images, repeat):
+    backend = get_backend(name, batch_size)
+    backend.warm()
+    backend.encode(images[:batch_size])  # first call may build kernels / caches
+
+    best, calls = float("inf"), []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(0, len(images), batch_size):
+            t = time.perf_counter()
+            out = backend.encode(images[i:i + batch_size])
+            calls.append((time.perf_counter() - t) * 1000)
+        best = min(best, time.perf_counter() - start)
+
+    return {
+        "dim": int(out.shape[1]),
+        "dtype": str(out.dtype),
+        "images_per_s": round(len(images) / best, 1),
+        "ms_per_image": round(best / len(images) * 1000, 3),
+        "call_ms_p50": round(float(np.percentile(calls, 50)), 3),
+        "call_ms_p99": round(float(np.percentile(calls, 99)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face encoder backend throughput")
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--images", type=int, default=256)
+    parser.add_argument("--size", type=int, default=160, help="Side of the square face crops")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    images = load_images(args.dataset, args.images, args.size)
+    report = {"images": len(images), "size": args.size, "backends": {}}
+
+    for name in args.backends:
+        results = {}
+        for batch_size in args.batch_sizes:
+            try:
+                results[str(batch_size)] = run(name, batch_size, images, args.repeat)
+            except (ImportError, FileNotFoundError) as e:
+                results = {"skipped": str(e)}
+                break
+            print(f"[INFO] {name} batch {batch_size}: {results[str(batch_size)]}")
+        report["backends"][name] = results
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import argparse
+import json
+import time
+import numpy as np
+
+from face_index import IVFIndex, _sq_distances, default_nlist, train_centroids
+
+# -------------------------------------------------------------
+# IVF RECALL vs LATENCY
+#
+# Builds a synthetic roll of voters (a random identity centre per voter
+# plus per-photo noise, scaled like dlib 128-d embeddings), then queries
+# with fresh noisy photos of random voters and compares the IVF top-k
+# against exact brute-force search.
+#
+#   python python/bench_face_index.py --voters 100000 --per-voter 10
+# -------------------------------------------------------------
+
+
+def synthetic_roll(voters, per_voter, dim=128, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0, 0.09, (voters, dim)).astype(np.float32)
+    noise = rng.normal(0, 0.02, (voters, per_voter, dim)).astype(np.float32)
+    return centres, centres[:, None, :] + noise
+
+
+def exact_top_voters(query, vectors, codes, k, vec_sq):
+    dist = np.sqrt(_sq_distances(query[None], vectors, vec_sq)[0])
+    best = np.full(codes.max() + 1, np.inf, dtype=np.float32)
+    np.minimum.at(best, codes, dist)
+    top = np.argpartition(best, k)[:k]
+    return top[np.argsort(best[top])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF recall/latency benchmark")
+    parser.add_argument("--voters", type=int, default=100000)
+    parser.add_argument("--per-voter", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    centres, roll = synthetic_roll(args.voters, args.per_voter)
+    vectors = roll.reshape(-1, roll.shape[-1])
+    codes = np.repeat(np.arange(args.voters), args.per_voter)
+    n = len(vectors)
+    nlist = args.nlist or default_nlist(n)
+
+    t = time.perf_counter()
+    index = IVFIndex(train_centroids(vectors, nlist))
+    train_s = time.perf_counter() - t
+
+    t = time.perf_counter()
+    index.add_many([(str(v), roll[v], None) for v in range(args.voters)])
+    add_s = time.perf_counter() - t
+
+    rng = np.random.default_rng(1)
+    targets = rng.integers(0, args.voters, args.queries)
+    queries = (centres[targets] + rng.normal(0, 0.02, (args.queries, roll.shape[-1]))).astype(np.float32)
+
+    vec_sq = np.einsum("ij,ij->i", vectors, vectors)
+    exact, exact_ms = [], []
+    for q in queries:
+        t = time.perf_counter()
+        exact.append({str(c) for c in exact_top_voters(q, vectors, codes, args.k, vec_sq)})
+        exact_ms.append((time.perf_counter() - t) * 1000)
+
+    report = {
+        "embeddings": n,
+        "voters": args.voters,
+        "nlist": index.nlist,
+        "train_s": round(train_s, 2),
+        "insert_s": round(add_s, 2),
+        "exact": {"p50_ms": round(float(np.percentile(exact_ms, 50)), 3),
+                  "p99_ms": round(float(np.percentile(exact_ms, 99)), 3)},
+        "ivf": [],
+    }
+
+    for nprobe in args.nprobe:
+        recalls, top1, ms = [], 0, []
+        for q, truth, target in zip(queries, exact, targets):
+            t = time.perf_counter()
+            found = index.search(q, k=args.k, nprobe=nprobe)
+            ms.append((time.perf_counter() - t) * 1000)
+            ids = [v for v, _ in found]
+            recalls.append(len(truth.intersection(ids)) / args.k)
+            top1 += bool(ids) and ids[0] == str(target)
+
+        report["ivf"].append({
+            "nprobe": nprobe,
+            f"recall@{args.k}": round(float(np.mean(recalls)), 4),
+            "top1_identity": round(top1 / len(queries), 4),
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        })
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# -------------------------------------------------------------
+# WARM vs COLD VERIFICATION LATENCY
+#
+# Cold: one `face_recog.py <voterId>` process per login (what
+#       verifyFace did before face_server existed).
+# Warm: the same verification sent to a running face_server.
+#
+# Run from the backend/ directory so that encodings/ and temp/ resolve:
+#   python python/bench_face_server.py sa@gmail.com --runs 10
+# -------------------------------------------------------------
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _summary(samples):
+    samples = sorted(samples)
+    p99_index = min(len(samples) - 1, int(round(0.99 * (len(samples) - 1))))
+    return {
+        "runs": len(samples),
+        "mean_ms": round(statistics.mean(samples) * 1000, 2),
+        "p50_ms": round(statistics.median(samples) * 1000, 2),
+        "p99_ms": round(samples[p99_index] * 1000, 2),
+    }
+
+
+def bench_cold(voter_id, runs):
+    script = os.path.join(HERE, "face_recog.py")
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script, voter_id],
+                       stdout=subprocess.DEVNULL, check=False)
+        samples.append(time.perf_counter() - start)
+    return _summary(samples)
+
+
+def _request(port, payload):
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+        buf = b""
+        while not buf.endswith(b"\n"):
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            buf += chunk
+    return json.loads(buf)
+
+
+def _wait_for_server(port, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if _request(port, {"op": "ping"}).get("ok"):
+                return
+        except OSError:
+            time.sleep(0.25)
+    raise RuntimeError("face_server did not come up")
+
+
+def bench_warm(voter_id, runs, port, workers, concurrency):
+    script = os.path.join(HERE, "face_server.py")
+    cmd = [sys.executable, script, "--port", str(port)]
+    if workers:
+        cmd += ["--workers", str(workers)]
+
+    startup = time.perf_counter()
+    server = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    try:
+        _wait_for_server(port)
+        startup = time.perf_counter() - startup
+
+        def one(i):
+            start = time.perf_counter()
+            _request(port, {"id": i, "voterId": voter_id})
+            return time.perf_counter() - start
+
+        sequential = [one(i) for i in range(runs)]
+
+        wall = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as ex:
+            concurrent = list(ex.map(one, range(runs * concurrency)))
+        wall = time.perf_counter() - wall
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        "startup_s": round(startup, 2),
+        "sequential": _summary(sequential),
+        "concurrent": dict(_summary(concurrent),
+                           concurrency=concurrency,
+                           throughput_per_s=round(len(concurrent) / wall, 2)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm vs cold face verification benchmark")
+    parser.add_argument("voter_id")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--port", type=int, default=5056)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    results = {
+        "voter_id": args.voter_id,
+        "cold": bench_cold(args.voter_id, args.runs),
+        "warm": bench_warm(args.voter_id, args.runs, args.port,
+                           args.workers, args.concurrency),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
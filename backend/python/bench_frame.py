@@ -0,0 +1,126 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+import tracemalloc
+import cv2
+import numpy as np
+
+from frame import Frame
+
+# -------------------------------------------------------------
+# DECODE / ALLOCATION COST PER ENROLLED VOTER
+#
+# For every voter folder in dataset/, the inputs both encoders need
+# (RGB for dlib, grayscale for the robust encoder, plus the content
+# hash for the encoding cache) are produced in each of these ways:
+#
+#   legacy_backend  file_sha256 read + cv2.imread (BGR) + cvtColor RGB
+#                   copy + astype copy, gray from BGR
+#   legacy_kiosk    face_recognition/feature_encoding.py before: PIL
+#                   decode for dlib, cv2.imread again for the robust
+#                   encoder (skipped if Pillow is not installed)
+#   single          one read, one decode straight to RGB (frame.py),
+#                   BGR as a view, gray once
+#   single_reduced  as single, plus a 1/2-size decode for detection
+#
+# Reported per voter: wall time, bytes read from disk and bytes
+# allocated, summed over its images (tracemalloc sees NumPy buffers;
+# timings include tracemalloc's own overhead, equally for all methods).
+#
+#   python python/bench_frame.py --runs 5
+# -------------------------------------------------------------
+
+
+def _legacy_backend(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        data = f.read()
+    digest.update(data)
+    bgr = cv2.imread(path)
+    rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB).astype(np.uint8)
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    return 2 * len(data), (rgb, gray, digest.hexdigest())
+
+
+def _legacy_kiosk(path):
+    from PIL import Image
+
+    rgb = np.array(Image.open(path).convert("RGB"))
+    bgr = cv2.imread(path)
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    return 2 * os.path.getsize(path), (rgb, gray)
+
+
+def _single(path, reduction=1):
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    frame = Frame.from_bytes(data)
+    small = frame.reduced(reduction)[0] if reduction > 1 else None
+    return len(data), (frame.rgb, frame.bgr, frame.gray, small, digest)
+
+
+METHODS = {
+    "legacy_backend": _legacy_backend,
+    "legacy_kiosk": _legacy_kiosk,
+    "single": _single,
+    "single_reduced": lambda path: _single(path, 2),
+}
+
+
+def measure(method, voters, runs):
+    times, read, allocated = [], [], []
+    tracemalloc.start()
+    for _ in range(runs):
+        for paths in voters.values():
+            elapsed = total_read = total_alloc = 0
+            for path in paths:
+                base = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                t = time.perf_counter()
+                n, outputs = method(path)
+                elapsed += time.perf_counter() - t
+                # Peak above the baseline = buffers alive at once for
+                # this image (decoded frames, copies, conversions)
+                total_alloc += tracemalloc.get_traced_memory()[1] - base
+                total_read += n
+                del outputs
+            times.append(elapsed)
+            read.append(total_read)
+            allocated.append(total_alloc)
+    tracemalloc.stop()
+
+    return {
+        "ms_per_voter_p50": round(float(np.percentile(times, 50)) * 1000, 2),
+        "ms_per_voter_p99": round(float(np.percentile(times, 99)) * 1000, 2),
+        "bytes_read_per_voter": int(np.mean(read)),
+        "alloc_bytes_per_voter": int(np.mean(allocated)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-decode frame benchmark")
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    voters = {}
+    for path in sorted(glob.glob(os.path.join(args.dataset, "*", "*.jpg"))):
+        voters.setdefault(os.path.basename(os.path.dirname(path)), []).append(path)
+
+    report = {"voters": len(voters),
+              "images": sum(len(p) for p in voters.values()), "methods": {}}
+    for name, method in METHODS.items():
+        try:
+            report["methods"][name] = measure(method, voters, args.runs)
+        except ImportError as e:
+            report["methods"][name] = {"skipped": str(e)}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import glob
+import json
+import os
+import time
+import numpy as np
+
+from face_templates import compress_template, decide
+
+# -------------------------------------------------------------
+# PROTOTYPE TEMPLATES vs FULL TEMPLATE
+#
+# Leave-one-out over the enrolled encodings in encodings/: each stored
+# encoding in turn is the "login" face, its voter's remaining encodings
+# are the template, and it is checked against its own voter (genuine)
+# and every other voter (impostor). For each pair we compare the
+# full-scan decision and distance with the prototype decision, and time
+# both. --synthetic adds a seeded random roll so there are enough pairs
+# for stable latency figures.
+#
+# Run from the backend/ directory:
+#   python python/bench_prototypes.py
+#   python python/bench_prototypes.py --synthetic 2000
+# -------------------------------------------------------------
+
+
+def _load_enrolled(enc_dir):
+    voters = {}
+    for path in sorted(glob.glob(os.path.join(enc_dir, "*_face_recognition.npy"))):
+        voter = os.path.basename(path)[:-len("_face_recognition.npy")]
+        voters[voter] = np.atleast_2d(np.load(path))
+    return voters
+
+
+def _synthetic(voters, per_voter, seed):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0, 0.09, (voters, 128))
+    noise = rng.normal(0, 0.02, (voters, per_voter, 128))
+    return {f"synthetic{i}": centres[i] + noise[i] for i in range(voters)}
+
+
+def _full_scan(template, login):
+    return float(np.linalg.norm(template - login, axis=1).min())
+
+
+def run(voters, tolerance, max_impostors):
+    names = sorted(voters)
+    pairs = []
+    for v in names:
+        for i in range(len(voters[v])):
+            login = voters[v][i]
+            rest = np.delete(voters[v], i, axis=0)
+            if len(rest) == 0:
+                continue
+            pairs.append((login, rest, True))
+            for other in [n for n in names if n != v][:max_impostors]:
+                pairs.append((login, voters[other], False))
+
+    # Templates are compressed once per distinct array, as at enrollment
+    t = time.perf_counter()
+    protos = {id(tpl): compress_template(tpl) for _, tpl, _ in pairs}
+    compress_ms = (time.perf_counter() - t) * 1000 / max(1, len(protos))
+
+    full_s, proto_s = [], []
+    agree = early = 0
+    drift = []
+    tp = fp = 0
+    sizes = [len(p) for p in protos.values()]
+    rows = [len(tpl) for _, tpl, _ in pairs]
+
+    for login, tpl, genuine in pairs:
+        t = time.perf_counter()
+        full = _full_scan(tpl, login)
+        full_s.append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        decision, dist = decide(protos[id(tpl)], login, tolerance)
+        if decision is None:
+            dist = _full_scan(tpl, login)
+        else:
+            early += 1
+        proto_s.append(time.perf_counter() - t)
+
+        accepted = dist < tolerance
+        agree += accepted == (full < tolerance)
+        drift.append(dist - full)
+        tp += accepted and genuine
+        fp += accepted and not genuine
+
+    genuine_pairs = sum(g for *_, g in pairs)
+
+    def ms(samples, q):
+        return round(float(np.percentile(samples, q)) * 1000, 4)
+
+    return {
+        "voters": len(names),
+        "pairs": len(pairs),
+        "mean_template_rows": round(float(np.mean(rows)), 2),
+        "mean_prototypes": round(float(np.mean(sizes)), 2),
+        "compress_ms_per_template": round(compress_ms, 3),
+        "decision_agreement": round(agree / len(pairs), 4),
+        "early_decision_rate": round(early / len(pairs), 4),
+        "genuine_accept_rate": round(tp / max(1, genuine_pairs), 4),
+        "false_accepts": int(fp),
+        "max_distance_drift": round(float(np.max(drift)), 4),
+        "full": {"p50_ms": ms(full_s, 50), "p99_ms": ms(full_s, 99)},
+        "prototypes": {"p50_ms": ms(proto_s, 50), "p99_ms": ms(proto_s, 99)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prototype template benchmark")
+    parser.add_argument("--encodings", default="encodings")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--max-impostors", type=int, default=20,
+                        help="Impostor voters checked per login")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Also run on this many synthetic voters")
+    parser.add_argument("--per-voter", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report = {}
+    enrolled = _load_enrolled(args.encodings)
+    if enrolled:
+        report["enrolled"] = run(enrolled, args.tolerance, args.max_impostors)
+    if args.synthetic:
+        roll = _synthetic(args.synthetic, args.per_voter, args.seed)
+        report["synthetic"] = run(roll, args.tolerance, args.max_impostors)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+# -------------------------------------------------------------
+# ENROLLMENT / VERIFICATION BENCHMARK SUITE
+#
+# Offline and reproducible: every section works on the sample images
+# in dataset/ or on a synthetic roll generated from a fixed seed.
+#
+#   imports    cold import time of each heavy module (fresh interpreter)
+#   decode     load_clean_image per dataset image
+#   robust     RobustFaceEncoder.extract_face_features per image
+#   enroll     encode_voter_images per voter (what encode_faces runs),
+#              per-stage throughput, no encoding cache
+#   verify     match_voter with every dataset image as the login frame
+#   synthetic  thousands of voters with random embeddings in a scratch
+#              EmbeddingStore: append, cold / hot lookup and compare
+#
+# Each section reports p50/p99 latency and the process peak RSS once it
+# has finished. Results are written as JSON under bench_results/, named
+# after the current commit, and --compare prints the change against an
+# earlier result file.
+#
+# Run from the backend/ directory so that dataset/ and encodings/ resolve:
+#   python python/bench_suite.py
+#   python python/bench_suite.py --sections synthetic --voters 20000
+#   python python/bench_suite.py --compare bench_results/<old>.json
+# -------------------------------------------------------------
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SECTIONS = ("imports", "decode", "robust", "enroll", "verify", "synthetic")
+IMPORT_MODULES = ("numpy", "cv2", "sklearn", "face_recognition",
+                  "feature_encoding", "face_recog")
+
+
+def _latency(samples_s):
+    if not samples_s:
+        return {"runs": 0}
+    ms = np.asarray(samples_s) * 1000
+    return {
+        "runs": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, or None if unknown."""
+    try:
+        import resource
+    except ImportError:
+        # Windows: psutil reports the peak working set when installed
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return round(getattr(info, "peak_wset", info.rss) / 2 ** 20, 1)
+        except ImportError:
+            return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=HERE, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _dataset_images(dataset):
+    return sorted(p for ext in ("jpg", "jpeg", "png")
+                  for p in glob.glob(os.path.join(dataset, "*", f"*.{ext}")))
+
+
+# -------------------------------------------------------------
+# SECTIONS
+# -------------------------------------------------------------
+def bench_imports(args):
+    """Each module in a fresh interpreter, so nothing is already loaded."""
+    code = ("import sys, time; sys.path.insert(0, {here!r}); t = time.perf_counter(); "
+            "import {mod}; print(time.perf_counter() - t)")
+    report = {}
+    for mod in IMPORT_MODULES:
+        samples = []
+        for _ in range(args.import_runs):
+            proc = subprocess.run([sys.executable, "-c", code.format(here=HERE, mod=mod)],
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                report[mod] = {"error": proc.stderr.strip().splitlines()[-1]}
+                break
+            samples.append(float(proc.stdout.strip()))
+        else:
+            report[mod] = _latency(samples)
+    return report
+
+
+def bench_decode(args):
+    from feature_encoding import load_clean_image
+
+    samples = []
+    for path in _dataset_images(args.dataset):
+        t = time.perf_counter()
+        load_clean_image(path)
+        samples.append(time.perf_counter() - t)
+    report = _latency(samples)
+    report["images_per_s"] = round(len(samples) / sum(samples), 2) if samples else None
+    return report
+
+
+def bench_robust(args):
+    from feature_encoding import RobustFaceEncoder, load_clean_image
+
+    encoder = RobustFaceEncoder()
+    frames = [bgr for bgr, _ in map(load_clean_image, _dataset_images(args.dataset))
+              if bgr is not None]
+
+    samples, found = [], 0
+    for bgr in frames:
+        t = time.perf_counter()
+        feat = encoder.extract_face_features(bgr)
+        samples.append(time.perf_counter() - t)
+        found += feat is not None
+    report = _latency(samples)
+    report["faces_found"] = found
+    return report
+
+
+def bench_enroll(args):
+    from feature_encoding import (STAGES, RobustFaceEncoder, encode_voter_images,
+                                  list_voter_images)
+
+    encoder = RobustFaceEncoder()
+    stage_time = dict.fromkeys(STAGES, 0.0)
+    samples, images = [], 0
+
+    for voter_id in sorted(os.listdir(args.dataset)):
+        image_files = list_voter_images(voter_id)
+        if not image_files:
+            continue
+        t = time.perf_counter()
+        encode_voter_images(voter_id, image_files, encoder, log=lambda *_: None,
+                            timings=stage_time)
+        samples.append(time.perf_counter() - t)
+        images += len(image_files)
+
+    report = _latency(samples)
+    report["images"] = images
+    report["stage_seconds"] = {k: round(v, 3) for k, v in stage_time.items()}
+    report["stage_images_per_s"] = {
+        k: round(images / v, 2) if v else None for k, v in stage_time.items()
+    }
+    return report
+
+
+def bench_verify(args):
+    from face_recog import DETECTOR, match_voter
+
+    samples, stage_ms, outcomes = [], {}, {}
+    for path in _dataset_images(args.dataset):
+        voter_id = os.path.basename(os.path.dirname(path))
+        with open(path, "rb") as f:
+            data = f.read()
+
+        t = time.perf_counter()
+        result = match_voter(voter_id, args.tolerance, data, detector=args.detector or DETECTOR)
+        samples.append(time.perf_counter() - t)
+
+        outcomes[result["outcome"]] = outcomes.get(result["outcome"], 0) + 1
+        for name, ms in result["timings"].items():
+            stage_ms.setdefault(name, []).append(ms / 1000)
+
+    report = _latency(samples)
+    report["detector"] = args.detector or DETECTOR
+    report["outcomes"] = outcomes
+    report["stages"] = {name: _latency(s) for name, s in stage_ms.items()}
+    return report
+
+
+def bench_synthetic(args):
+    """
+    A scratch store with args.voters voters of args.per_voter random
+    128-d embeddings (scaled like dlib's), queried the way match_voter
+    does: look the voter up, then take the minimum distance.
+    """
+    from embedding_cache import EmbeddingCache
+    from embedding_store import EmbeddingStore
+
+    rng = np.random.default_rng(args.seed)
+    centres = rng.normal(0, 0.09, (args.voters, 128)).astype(np.float32)
+    noise = rng.normal(0, 0.02, (args.voters, args.per_voter, 128)).astype(np.float32)
+    roll = centres[:, None, :] + noise
+    voter_ids = [f"voter{i}@synthetic" for i in range(args.voters)]
+
+    queries = rng.integers(0, args.voters, args.queries)
+    logins = centres[queries] + rng.normal(0, 0.02, (args.queries, 128)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as root:
+        store = EmbeddingStore("face_recognition", root)
+
+        t = time.perf_counter()
+        for voter_id, vectors in zip(voter_ids, roll):
+            store.append(voter_id, vectors)
+        append_s = time.perf_counter() - t
+
+        cache = EmbeddingCache()
+
+        def lookup(i):
+            key = voter_ids[i]
+            stored = cache.get(key)
+            if stored is None:
+                stored = np.array(store.get(key))
+                cache.put(key, stored)
+            return stored
+
+        cold, hot, compare = [], [], []
+        for q in queries:
+            cache.clear()
+            t = time.perf_counter()
+            lookup(q)
+            cold.append(time.perf_counter() - t)
+
+        for q, login in zip(queries, logins):
+            lookup(q)
+            t = time.perf_counter()
+            stored = lookup(q)
+            hot.append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            float(np.linalg.norm(stored - login, axis=1).min())
+            compare.append(time.perf_counter() - t)
+
+        store.close()
+
+    return {
+        "voters": args.voters,
+        "per_voter": args.per_voter,
+        "append_voters_per_s": round(args.voters / append_s, 2),
+        "lookup_cold": _latency(cold),
+        "lookup_hot": _latency(hot),
+        "compare": _latency(compare),
+    }
+
+
+BENCHES = {
+    "imports": bench_imports,
+    "decode": bench_decode,
+    "robust": bench_robust,
+    "enroll": bench_enroll,
+    "verify": bench_verify,
+    "synthetic": bench_synthetic,
+}
+
+
+# -------------------------------------------------------------
+# COMPARISON
+# -------------------------------------------------------------
+def _flatten(node, prefix=""):
+    out = {}
+    for key, value in node.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(_flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[path] = value
+    return out
+
+
+def compare(old, new):
+    """Prints every p50/p99/throughput/RSS figure present in both runs."""
+    before = _flatten(old["sections"])
+    after = _flatten(new["sections"])
+    watched = ("p50_ms", "p99_ms", "_per_s", "peak_rss_mb")
+
+    print(f"\n=== {old['commit']} -> {new['commit']} ===")
+    for key in sorted(before.keys() & after.keys()):
+        if not key.endswith(watched) and "_per_s." not in key:
+            continue
+        a, b = before[key], after[key]
+        change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+        print(f"{key:<55} {a:>12} {b:>12} {change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enrollment / verification benchmark suite")
+    parser.add_argument("--sections", nargs="+", choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument("--dataset", default="dataset")
+    parser.add_argument("--detector", default=None, help="Cascade for the verify section")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--import-runs", type=int, default=3)
+    parser.add_argument("--voters", type=int, default=5000)
+    parser.add_argument("--per-voter", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_results")
+    parser.add_argument("--compare", default=None, help="Earlier result JSON to diff against")
+    args = parser.parse_args()
+
+    results = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": vars(args),
+        "sections": {},
+    }
+
+    for name in args.sections:
+        print(f"[INFO] Running {name} ...", flush=True)
+        t = time.perf_counter()
+        try:
+            report = BENCHES[name](args)
+        except ImportError as e:
+            # e.g. dlib missing on this machine; the other sections still run
+            report = {"skipped": str(e)}
+        report["wall_s"] = round(time.perf_counter() - t, 2)
+        report["peak_rss_mb"] = peak_rss_mb()
+        results["sections"][name] = report
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{results['commit']}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    print(json.dumps(results["sections"], indent=2))
+    print(f"\n[INFO] Results saved to {path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+import numpy as np
+
+from tally_indexer import (REORG_DEPTH, TOPIC_CANDIDATE_ADDED, TOPIC_VOTED,
+                           TOPIC_VOTER_REGISTERED, TallyIndexer, TallyStore)
+
+# -------------------------------------------------------------
+# TALLY INDEXER CATCH-UP BENCHMARK
+#
+# Replays a synthetic election through the real indexer code path
+# (eth_getLogs-shaped hex logs -> decode -> SQLite apply/checkpoint)
+# against an in-process fake chain, so no node is needed:
+#
+#   block 1          CandidateAdded x --candidates
+#   next blocks      VoterRegistered for the roll (~3% repeats)
+#   remaining        Voted, one per voter, random candidate
+#
+# Reported: catch-up time and events/s, store size, results() latency
+# p50/p99. Then a reorg replaces the last --reorg-depth blocks with a
+# fork whose votes differ; the indexer must roll back and re-apply,
+# and the tallies are checked against a recount of the canonical chain.
+#
+#   python python/bench_tally.py --events 1000000
+# -------------------------------------------------------------
+
+CONTRACT = "0x" + "5a" * 20
+
+
+def _word(n):
+    return n.to_bytes(32, "big").hex()
+
+
+class FakeChain:
+    def __init__(self, events, candidates, per_block, seed):
+        rng = random.Random(seed)
+        voters = max(1, (events - candidates) // 2)
+        roll = [rng.getrandbits(160).to_bytes(20, "big") for _ in range(voters)]
+        # A few repeat registrations, as re-running createElection produces
+        repeats = [rng.choice(roll) for _ in range(voters // 33)]
+
+        stream = [("candidate", None, i + 1) for i in range(candidates)]
+        stream += [("register", v, None) for v in roll + repeats]
+        stream += [("vote", v, rng.randint(1, candidates)) for v in roll]
+        stream = stream[:events]
+
+        self.blocks = [stream[:candidates]]
+        rest = stream[candidates:]
+        self.blocks += [rest[s:s + per_block] for s in range(0, len(rest), per_block)]
+        self.candidates = candidates
+        self.fork = 0  # salt of the current canonical chain above fork_from
+        self.fork_from = len(self.blocks)
+
+    def reorg(self, depth, seed):
+        """Replaces the last `depth` blocks: same voters, different choices."""
+        rng = random.Random(seed)
+        self.fork_from = len(self.blocks) - depth
+        self.fork += 1
+        for b in range(self.fork_from, len(self.blocks)):
+            self.blocks[b] = [(k, v, rng.randint(1, self.candidates) if k == "vote" else c)
+                              for k, v, c in self.blocks[b]]
+
+    # JSON-RPC surface used by TallyIndexer
+    def block_number(self):
+        return len(self.blocks) - 1
+
+    def block_hash(self, number):
+        if number >= len(self.blocks):
+            return None
+        salt = self.fork if number >= self.fork_from else 0
+        return "0x" + hashlib.sha256(f"{number}:{salt}".encode()).hexdigest()
+
+    def get_logs(self, address, from_block, to_block):
+        logs = []
+        for number in range(from_block, min(to_block, len(self.blocks) - 1) + 1):
+            for index, (kind, voter, candidate) in enumerate(self.blocks[number]):
+                if kind == "candidate":
+                    name = f"Candidate {candidate}".encode()
+                    data = _word(candidate) + _word(64) + _word(len(name)) + name.ljust(32, b"\0").hex()
+                    topic = TOPIC_CANDIDATE_ADDED
+                elif kind == "register":
+                    data, topic = voter.rjust(32, b"\0").hex(), TOPIC_VOTER_REGISTERED
+                else:
+                    data, topic = voter.rjust(32, b"\0").hex() + _word(candidate), TOPIC_VOTED
+                logs.append({"blockNumber": hex(number), "logIndex": hex(index),
+                             "topics": [topic], "data": "0x" + data})
+        return logs
+
+    def recount(self):
+        votes = {c: 0 for c in range(1, self.candidates + 1)}
+        registered, voted = set(), 0
+        for block in self.blocks:
+            for kind, voter, candidate in block:
+                if kind == "register":
+                    registered.add(voter)
+                elif kind == "vote":
+                    votes[candidate] += 1
+                    voted += 1
+        return votes, len(registered), voted
+
+
+def _matches(results, truth):
+    votes, registered, voted = truth
+    return ({c["id"]: c["votes"] for c in results["candidates"]} == votes
+            and results["registered"] == registered and results["voted"] == voted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tally indexer catch-up benchmark")
+    parser.add_argument("--events", type=int, default=1_000_000)
+    parser.add_argument("--candidates", type=int, default=8)
+    parser.add_argument("--per-block", type=int, default=200, help="Events per block")
+    parser.add_argument("--block-range", type=int, default=2000)
+    parser.add_argument("--reorg-depth", type=int, default=12)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    chain = FakeChain(args.events, args.candidates, args.per_block, args.seed)
+    report = {"events": args.events, "blocks": len(chain.blocks)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tally.sqlite")
+        store = TallyStore(path)
+        indexer = TallyIndexer(store, chain, CONTRACT, block_range=args.block_range)
+
+        start = time.perf_counter()
+        while indexer.sync_once():
+            pass
+        elapsed = time.perf_counter() - start
+        report["catch_up_s"] = round(elapsed, 2)
+        report["events_per_s"] = int(args.events / elapsed)
+        report["store_bytes"] = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp))
+        report["tallies_correct"] = _matches(store.results(), chain.recount())
+
+        samples = []
+        for _ in range(args.queries):
+            t = time.perf_counter()
+            store.results()
+            samples.append(time.perf_counter() - t)
+        report["results_ms"] = {"p50": round(float(np.percentile(samples, 50)) * 1000, 4),
+                                "p99": round(float(np.percentile(samples, 99)) * 1000, 4)}
+
+        depth = min(args.reorg_depth, REORG_DEPTH, len(chain.blocks) - 1)
+        chain.reorg(depth, args.seed + 1)
+        start = time.perf_counter()
+        while indexer.sync_once():
+            pass
+        report["reorg"] = {"depth": depth,
+                           "recover_ms": round((time.perf_counter() - start) * 1000, 2),
+                           "tallies_correct": _matches(store.results(), chain.recount())}
+        store._db.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import os
+
+# One BLAS thread per worker process; the parallelism comes from the pool
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
+import argparse
+import glob
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from embedding_store import DEFAULT_ROOT, ENCODERS, get_store, store_exists
+
+# -------------------------------------------------------------
+# THRESHOLD CALIBRATION (FAR / FRR / ROC)
+#
+# Every pair of enrolled embeddings is either genuine (same voter) or
+# impostor (different voters). Their distance distributions are
+# accumulated as fixed-width histograms, never as lists of distances:
+#
+#   - the live rows of the embedding store (or the legacy .npy files)
+#     are cut into blocks of --block rows
+#   - each task takes a batch of (i, j) block pairs, j >= i, and
+#     computes the block's distances as one matrix product,
+#     |a|^2 + |b|^2 - 2 a.b, then bins them with np.bincount
+#   - a voter's rows are contiguous, so genuine pairs can only occur in
+#     block pairs whose voter ranges overlap; all other pairs are
+#     impostors without looking at labels
+#   - tasks run on a process pool; workers memory-map the store, so the
+#     memory per worker is a few block-sized buffers
+#
+# From the histograms: FAR(t) = impostor pairs with d < t / impostors,
+# FRR(t) = genuine pairs with d >= t / genuine, the ROC curve, the EER,
+# and a recommended threshold (the largest t with FAR <= --target-far).
+#
+# For very large rolls, --sample p keeps only a random fraction p of
+# the impostor-only block pairs; genuine pairs are always complete.
+#
+#   python python/calibrate.py                      -> face_recognition
+#   python python/calibrate.py --encoder robust
+#   python python/calibrate.py --synthetic 100000   -> timing run
+# -------------------------------------------------------------
+
+NUM_BINS = 4000
+CURVE_POINTS = 400
+
+
+# -------------------------------------------------------------
+# CORPUS
+# -------------------------------------------------------------
+def load_corpus(encoder, enc_dir="encodings", root=DEFAULT_ROOT):
+    """
+    Returns (source, rows, labels, voters): `source` is the store's data
+    path or an in-memory matrix, `rows` the live row numbers in it, and
+    `labels` the voter index of each live row (non-decreasing).
+    """
+    if store_exists(encoder, root):
+        store = get_store(encoder, root)
+        rows, labels, voters = [], [], []
+        for voter_id, start, count in store.ranges():
+            rows.append(np.arange(start, start + count))
+            labels.append(np.full(count, len(voters)))
+            voters.append(voter_id)
+        if not voters:
+            return None
+        return ((store.data_path, store.rows, store.dim), np.concatenate(rows),
+                np.concatenate(labels), voters)
+
+    suffix = f"_{encoder}.npy"
+    blocks, labels, voters = [], [], []
+    for path in sorted(glob.glob(os.path.join(enc_dir, f"*{suffix}"))):
+        enc = np.atleast_2d(np.load(path)).astype(np.float32)
+        blocks.append(enc)
+        labels.append(np.full(len(enc), len(voters)))
+        voters.append(os.path.basename(path)[:-len(suffix)])
+    if not voters:
+        return None
+    matrix = np.concatenate(blocks)
+    return matrix, np.arange(len(matrix)), np.concatenate(labels), voters
+
+
+def synthetic_corpus(voters, per_voter, dim=128, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0, 0.09, (voters, dim)).astype(np.float32)
+    matrix = np.repeat(centres, per_voter, axis=0)
+    matrix += rng.normal(0, 0.02, matrix.shape).astype(np.float32)
+    labels = np.repeat(np.arange(voters), per_voter)
+    return matrix, np.arange(len(matrix)), labels, [f"synthetic{i}" for i in range(voters)]
+
+
+# -------------------------------------------------------------
+# WORKERS
+# -------------------------------------------------------------
+_w = {}
+
+
+def _init_worker(source, rows, labels, block, bin_width):
+    if isinstance(source, tuple):
+        path, total, dim = source
+        source = np.memmap(path, dtype=np.float32, mode="r", shape=(total, dim))
+    _w.update(matrix=source, rows=rows, labels=labels, block=block,
+              inv_width=np.float32(1.0 / bin_width))
+
+
+def _block(i):
+    # Scaled to bin units, so sqrt(d2) is the bin number as it stands
+    s = slice(i * _w["block"], (i + 1) * _w["block"])
+    vectors = np.asarray(_w["matrix"][_w["rows"][s]], dtype=np.float32) * _w["inv_width"]
+    return vectors, np.einsum("ij,ij->i", vectors, vectors), _w["labels"][s]
+
+
+def _bins(a, a2, b, b2):
+    """Bin number of every distance between the rows of a and b."""
+    d2 = a @ (b.T * np.float32(-2.0))
+    d2 += a2[:, None]
+    d2 += b2[None, :]
+    np.clip(d2, 0, float(NUM_BINS - 1) ** 2, out=d2)
+    np.sqrt(d2, out=d2)
+    return d2.astype(np.intp)
+
+
+def _run_pairs(pairs):
+    """Genuine and impostor histograms for a batch of block pairs."""
+    genuine = np.zeros(NUM_BINS, dtype=np.int64)
+    total = np.zeros(NUM_BINS, dtype=np.int64)
+    cached = {}
+
+    for i, j in pairs:
+        if i not in cached:
+            cached = {i: _block(i)}
+        a, a2, la = cached[i]
+        b, b2, lb = (a, a2, la) if i == j else _block(j)
+
+        bins = _bins(a, a2, b, b2)
+
+        if i == j:
+            upper = np.triu(np.ones((len(a), len(b)), dtype=bool), k=1)
+            same = (la[:, None] == lb[None, :]) & upper
+            total += np.bincount(bins[upper], minlength=NUM_BINS)
+        else:
+            total += np.bincount(bins.ravel(), minlength=NUM_BINS)
+            # Labels are sorted, so only the overlapping edge can be genuine
+            same = (la[:, None] == lb[None, :]) if la[-1] >= lb[0] else None
+
+        if same is not None and same.any():
+            genuine += np.bincount(bins[same], minlength=NUM_BINS)
+
+    return genuine, total - genuine
+
+
+def _block_pairs(labels, block, sample, seed):
+    n_blocks = (len(labels) + block - 1) // block
+    first = labels[::block]
+    last = labels[np.minimum(np.arange(1, n_blocks + 1) * block, len(labels)) - 1]
+    rng = random.Random(seed)
+
+    pairs = []
+    for i in range(n_blocks):
+        for j in range(i, n_blocks):
+            # Pairs that can hold genuine comparisons are always kept
+            if i == j or last[i] >= first[j] or sample >= 1.0 or rng.random() < sample:
+                pairs.append((i, j))
+    return pairs
+
+
+def distance_histograms(source, rows, labels, block=2048, workers=None,
+                        sample=1.0, seed=0, max_distance=None):
+    """
+    Returns (genuine, impostor, bin_width): int64 histograms over
+    [0, max_distance) in NUM_BINS bins. max_distance defaults to twice
+    the largest row norm, which bounds every pairwise distance.
+    """
+    if max_distance is None:
+        matrix = source
+        if isinstance(source, tuple):
+            path, total, dim = source
+            matrix = np.memmap(path, dtype=np.float32, mode="r", shape=(total, dim))
+        max_norm = 0.0
+        for s in range(0, len(rows), 65536):
+            chunk = np.asarray(matrix[rows[s:s + 65536]], dtype=np.float32)
+            max_norm = max(max_norm, float(np.sqrt(np.einsum("ij,ij->i", chunk, chunk).max())))
+        max_distance = 2.0 * max_norm or 1.0
+    bin_width = max_distance / NUM_BINS
+
+    pairs = _block_pairs(labels, block, sample, seed)
+    workers = workers or os.cpu_count() or 1
+    # Consecutive pairs mostly share their first block; batches stay
+    # small enough to balance across the pool
+    size = max(1, min(64, len(pairs) // (workers * 8) or 1))
+    batches = [pairs[s:s + size] for s in range(0, len(pairs), size)]
+
+    genuine = np.zeros(NUM_BINS, dtype=np.int64)
+    impostor = np.zeros(NUM_BINS, dtype=np.int64)
+    initargs = (source, rows, labels, block, bin_width)
+    if workers == 1:
+        _init_worker(*initargs)
+        results = map(_run_pairs, batches)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=initargs)
+        results = pool.map(_run_pairs, batches)
+    for g, imp in results:
+        genuine += g
+        impostor += imp
+    if workers != 1:
+        pool.shutdown()
+
+    return genuine, impostor, bin_width
+
+
+# -------------------------------------------------------------
+# ANALYSIS
+# -------------------------------------------------------------
+def analyse(genuine, impostor, bin_width, target_far=1e-3, current=0.5):
+    thresholds = np.arange(1, NUM_BINS + 1) * bin_width  # upper bin edges
+    g_total, i_total = int(genuine.sum()), int(impostor.sum())
+    far = np.cumsum(impostor) / max(1, i_total)
+    frr = 1.0 - np.cumsum(genuine) / max(1, g_total)
+
+    eer_at = int(np.argmin(np.abs(far - frr)))
+    ok = np.nonzero(far <= target_far)[0]
+    rec_at = int(ok[-1]) if len(ok) else 0
+    cur_at = min(NUM_BINS - 1, max(0, int(round(current / bin_width)) - 1))
+
+    def point(k):
+        return {"threshold": round(float(thresholds[k]), 4),
+                "far": float(far[k]), "frr": float(frr[k])}
+
+    # Keep every point where the curve moves, thinned to CURVE_POINTS
+    moving = np.nonzero((np.diff(far, prepend=-1) != 0) | (np.diff(frr, prepend=2) != 0))[0]
+    keep = moving[np.linspace(0, len(moving) - 1, min(len(moving), CURVE_POINTS)).astype(int)]
+
+    return {
+        "genuine_pairs": g_total,
+        "impostor_pairs": i_total,
+        "bin_width": round(bin_width, 6),
+        "eer": round(float((far[eer_at] + frr[eer_at]) / 2), 6),
+        "eer_point": point(eer_at),
+        "target_far": target_far,
+        # Fewer impostor pairs than 1 / target_far cannot resolve it
+        "target_far_resolvable": i_total * target_far >= 1,
+        "recommended": point(rec_at),
+        "current": point(cur_at),
+        "roc": [[round(float(thresholds[k]), 4), float(far[k]), float(1 - frr[k])]
+                for k in keep],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face threshold calibration")
+    parser.add_argument("--encoder", default="face_recognition", choices=ENCODERS)
+    parser.add_argument("--encodings", default="encodings")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Calibrate on this many synthetic voters instead")
+    parser.add_argument("--per-voter", type=int, default=10)
+    parser.add_argument("--block", type=int, default=2048)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--sample", type=float, default=1.0,
+                        help="Fraction of impostor-only block pairs to compute")
+    parser.add_argument("--target-far", type=float, default=1e-3)
+    parser.add_argument("--current", type=float, default=0.5,
+                        help="Threshold in use, reported for comparison")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Write the full report (JSON) here")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        corpus = synthetic_corpus(args.synthetic, args.per_voter, seed=args.seed)
+    else:
+        corpus = load_corpus(args.encoder, args.encodings)
+    if corpus is None:
+        print(f"❌ No {args.encoder} embeddings found")
+        sys.exit(1)
+    source, rows, labels, voters = corpus
+
+    start = time.perf_counter()
+    genuine, impostor, bin_width = distance_histograms(
+        source, rows, labels, args.block, args.workers, args.sample, args.seed)
+    elapsed = time.perf_counter() - start
+
+    report = {"encoder": args.encoder, "voters": len(voters), "embeddings": len(rows),
+              "seconds": round(elapsed, 2), "sample": args.sample}
+    report.update(analyse(genuine, impostor, bin_width, args.target_far, args.current))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print("Saved", args.out)
+
+    summary = {k: v for k, v in report.items() if k != "roc"}
+    print(json.dumps(summary, indent=2))
+    rec = report["recommended"]
+    print(f"Recommended threshold: {rec['threshold']} "
+          f"(FAR {rec['far']:.2e}, FRR {rec['frr']:.2%})")
+
+
+if __name__ == "__main__":
+    main()
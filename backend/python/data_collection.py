@@ -1,14 +1,274 @@
 import cv2
 import os
+import queue
 import sys
+import threading
+import time
+from concurrent.futures import Future
 import numpy as np
 
 DATASET_DIR = "dataset"
 
+# -------------------------------------------------------------
+# FRAME QUALITY (auto-capture)
+#
+# Cheap enough to run on every preview frame: Laplacian variance for
+# blur, mean grey level for exposure, and the same HOG detector that
+# encode_faces uses, run on a downscaled frame, for face presence and
+# size. Frames failing these checks would be rejected later by
+# encode_faces anyway.
+# -------------------------------------------------------------
+MIN_SHARPNESS = 40.0         # variance of the Laplacian over the face crop
+BRIGHTNESS_RANGE = (60, 200)  # mean grey level of the face crop
+MIN_FACE_FRACTION = 0.15     # face width / frame width
+DETECT_WIDTH = 320
+MIN_DIVERSITY = 0.08         # mean abs difference of 16x16 face thumbnails
+
+
+def _face_boxes(small_bgr):
+    """(x, y, w, h) of every face in a downscaled BGR frame."""
+    # Imported here so manual capture does not need dlib loaded
+    import face_recognition
+    rgb = np.ascontiguousarray(small_bgr[:, :, ::-1])
+    return [(left, top, right - left, bottom - top)
+            for top, right, bottom, left in face_recognition.face_locations(rgb, model="hog")]
+
+
+def score_frame(frame):
+    """
+    Returns a dict with ``ok``, a rejection ``reason`` (None if ok), the
+    measured ``sharpness`` / ``brightness`` / ``face_fraction``, a
+    ``score`` for ranking accepted frames and a small face ``thumb`` used
+    to keep the selected frames diverse.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape
+    scale = min(1.0, DETECT_WIDTH / w)
+    small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    faces = _face_boxes(small)
+    if len(faces) == 0:
+        return {"ok": False, "reason": "no face"}
+    if len(faces) > 1:
+        return {"ok": False, "reason": "multiple faces"}
+
+    x, y, fw, fh = (int(v / scale) for v in faces[0])
+    x, y = max(0, x), max(0, y)
+    crop = gray[y:y + fh, x:x + fw]
+
+    result = {
+        "face_fraction": fw / w,
+        "sharpness": float(cv2.Laplacian(crop, cv2.CV_64F).var()),
+        "brightness": float(crop.mean()),
+        "box": (x, y, fw, fh),
+    }
+
+    if result["face_fraction"] < MIN_FACE_FRACTION:
+        result.update(ok=False, reason="face too small")
+    elif result["sharpness"] < MIN_SHARPNESS:
+        result.update(ok=False, reason="blurred")
+    elif not BRIGHTNESS_RANGE[0] <= result["brightness"] <= BRIGHTNESS_RANGE[1]:
+        result.update(ok=False, reason="too dark" if result["brightness"] < BRIGHTNESS_RANGE[0]
+                      else "too bright")
+    else:
+        thumb = cv2.resize(crop, (16, 16), interpolation=cv2.INTER_AREA).astype(np.float32)
+        result.update(ok=True, reason=None, thumb=thumb / 255.0,
+                      # Sharper and larger is better; exposure is already gated
+                      score=np.log1p(result["sharpness"]) * result["face_fraction"])
+    return result
+
+
+# -------------------------------------------------------------
+# BACKGROUND WRITER
+# -------------------------------------------------------------
+class ImageWriter:
+    """Single thread doing JPEG encoding and disk writes, in FIFO order."""
+
+    def __init__(self, quality=95):
+        self.quality = quality
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, path, frame):
+        """Queues a write; the returned Future resolves to whether it succeeded."""
+        done = Future()
+        self._queue.put((path, frame, done))
+        return done
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            path, frame, done = item
+            # Ensure proper 8-bit format before saving
+            if frame.dtype != np.uint8:
+                frame = frame.astype(np.uint8)
+            # Save directly in BGR format (OpenCV's native format)
+            success = cv2.imwrite(path, frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if success:
+                self.written += 1
+            else:
+                self.failed += 1
+                print(f"❌ Failed to save {path}")
+            done.set_result(success)
+
+    def close(self):
+        """Waits for every queued write to finish."""
+        self._queue.put(None)
+        self._thread.join()
+
+
+# -------------------------------------------------------------
+# BEST-N DIVERSE SELECTION
+# -------------------------------------------------------------
+class FrameSelector:
+    """
+    Keeps up to `num_samples` accepted frames. A new frame that looks
+    like an already kept one (thumbnail difference below MIN_DIVERSITY)
+    only replaces it when it scores higher; otherwise it takes a free
+    slot or replaces the weakest kept frame. Every change is written to
+    the slot's file through the writer, so nothing is encoded on the
+    scoring thread.
+    """
+
+    def __init__(self, voter_dir, num_samples, writer):
+        self.voter_dir = voter_dir
+        self.num_samples = num_samples
+        self.writer = writer
+        self.slots = []  # [score, thumb] per dataset/<voter>/<slot>.jpg
+        self.lock = threading.Lock()
+
+    def offer(self, frame, quality):
+        thumb, score = quality["thumb"], quality["score"]
+        with self.lock:
+            diffs = [float(np.abs(thumb - t).mean()) for _, t in self.slots]
+            similar = [i for i, d in enumerate(diffs) if d < MIN_DIVERSITY]
+
+            if similar:
+                slot = min(similar, key=lambda i: self.slots[i][0])
+                if score <= self.slots[slot][0]:
+                    return False
+            elif len(self.slots) < self.num_samples:
+                slot = len(self.slots)
+                self.slots.append(None)
+            else:
+                slot = min(range(len(self.slots)), key=lambda i: self.slots[i][0])
+                if score <= self.slots[slot][0]:
+                    return False
+
+            self.slots[slot] = [score, thumb]
+
+        self.writer.submit(os.path.join(self.voter_dir, f"{slot}.jpg"), frame)
+        return True
+
+    @property
+    def count(self):
+        with self.lock:
+            return len(self.slots)
+
+
+def auto_collect_images(voter_id, num_samples=20, duration=30.0, min_duration=5.0):
+    """
+    Auto-capture: every preview frame is handed to a scoring thread
+    (newest frame wins if it is still busy), good frames are kept by
+    FrameSelector and written by ImageWriter. Stops once `num_samples`
+    frames are kept and at least `min_duration` seconds have passed (so
+    early frames can still be replaced by better ones), after `duration`
+    seconds, or on 'q'.
+    """
+    voter_dir = os.path.join(DATASET_DIR, voter_id)
+    os.makedirs(voter_dir, exist_ok=True)
+
+    cap = cv2.VideoCapture(0)
+    if not cap.isOpened():
+        print("❌ Error: Could not open webcam.")
+        return
+
+    writer = ImageWriter()
+    selector = FrameSelector(voter_dir, num_samples, writer)
+    pending = queue.Queue(maxsize=1)
+    stop = threading.Event()
+    status = {"reason": "", "scored": 0, "rejected": {}}
+
+    def score_worker():
+        while not stop.is_set():
+            try:
+                frame = pending.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            quality = score_frame(frame)
+            status["scored"] += 1
+            if quality["ok"]:
+                status["reason"] = "kept" if selector.offer(frame, quality) else "similar"
+            else:
+                status["reason"] = quality["reason"]
+                status["rejected"][quality["reason"]] = status["rejected"].get(quality["reason"], 0) + 1
+
+    scorer = threading.Thread(target=score_worker, daemon=True)
+    scorer.start()
+
+    print(f"[INFO] Auto-capturing images for Voter ID: {voter_id}")
+    print(f"Look at the camera and turn your head slightly. 'q' to quit. Target: {num_samples} images.")
+
+    window = "Auto Capture - Press 'q' to Quit"
+    cv2.namedWindow(window, cv2.WINDOW_NORMAL)
+    cv2.resizeWindow(window, 640, 480)
+
+    start = time.perf_counter()
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            print("❌ Failed to read from webcam")
+            break
+
+        # Hand the frame over without waiting: replace a frame the scorer
+        # has not picked up yet instead of queueing behind it
+        try:
+            pending.put_nowait(frame)
+        except queue.Full:
+            try:
+                pending.get_nowait()
+            except queue.Empty:
+                pass
+            pending.put_nowait(frame)
+
+        elapsed = time.perf_counter() - start
+        preview = frame.copy()
+        cv2.putText(preview, f"Captured: {selector.count}/{num_samples}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        cv2.putText(preview, status["reason"], (10, 65),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 200, 255), 2)
+        cv2.imshow(window, preview)
+
+        if cv2.waitKey(1) & 0xFF == ord("q"):
+            print("[INFO] Capture aborted by user.")
+            break
+        if selector.count >= num_samples and elapsed >= min_duration:
+            print("[INFO] Target number of images reached.")
+            break
+        if elapsed >= duration:
+            print("[INFO] Capture time limit reached.")
+            break
+
+    stop.set()
+    scorer.join()
+    cap.release()
+    cv2.destroyAllWindows()
+    writer.close()
+
+    print(f"[INFO] Frames scored: {status['scored']} | rejected: {status['rejected']}")
+    print(f"[INFO] Finished collecting {selector.count} images for {voter_id} "
+          f"({writer.written} writes, {writer.failed} failed)")
+
+
 def collect_images(voter_id, num_samples=20):
     """
     Collects a specified number of images for a given voter ID using the webcam.
-    
+
     Args:
         voter_id (str): The unique identifier for the voter.
         num_samples (int): The target number of images to capture.
@@ -20,8 +280,12 @@ def collect_images(voter_id, num_samples=20):
     if not cap.isOpened():
         print("❌ Error: Could not open webcam.")
         return
-        
-    count = 0
+
+    # JPEG encoding and disk writes happen off the preview loop
+    writer = ImageWriter()
+    shots = 0      # captures submitted, also the next file name
+    pending = []   # writes not confirmed yet
+    count = 0      # images confirmed written
 
     print(f"[INFO] Collecting images for Voter ID: {voter_id}")
     print(f"Press 'c' to capture an image, 'q' to quit. Target: {num_samples} images.")
@@ -35,6 +299,19 @@ def collect_images(voter_id, num_samples=20):
             print("❌ Failed to read from webcam")
             break
 
+        for done in [d for d in pending if d.done()]:
+            pending.remove(done)
+            if done.result():
+                count += 1
+                print(f"[INFO] Captured image {count}/{num_samples}")
+
+        if count >= num_samples:
+            print("[INFO] Target number of images reached.")
+            break
+
+        # Keep the clean frame for saving; the overlay goes on the preview
+        clean = frame.copy()
+
         # Show capture progress on the screen
         cv2.putText(frame, f"Captured: {count}/{num_samples}", (10, 30),
                     cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
@@ -42,36 +319,24 @@ def collect_images(voter_id, num_samples=20):
         cv2.imshow("Capture - Press 'c' to Capture, 'q' to Quit", frame)
         key = cv2.waitKey(50) & 0xFF
 
-        if key == ord("c") and count < num_samples:
-            img_path = os.path.join(voter_dir, f"{count}.jpg")
-            
-            # Ensure proper 8-bit format before saving
-            if frame.dtype != np.uint8:
-                frame = frame.astype(np.uint8)
-            
-            # Save directly in BGR format (OpenCV's native format)
-            success = cv2.imwrite(img_path, frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
-            
-            if success:
-                count += 1
-                print(f"[INFO] Captured image {count}/{num_samples}")
-            else:
-                print(f"❌ Failed to save image {count}")
+        if key == ord("c") and count + len(pending) < num_samples:
+            # A failed write is reported by the writer and not counted
+            pending.append(writer.submit(os.path.join(voter_dir, f"{shots}.jpg"), clean))
+            shots += 1
 
         elif key == ord("q"):
             print("[INFO] Capture aborted by user.")
             break
 
-        if count >= num_samples:
-            print("[INFO] Target number of images reached.")
-            break
-
     cap.release()
     cv2.destroyAllWindows()
-    print(f"[INFO] Finished collecting {count} images for {voter_id}")
+    writer.close()
+    print(f"[INFO] Finished collecting {writer.written} images for {voter_id}")
 
 if __name__ == "__main__":
-    voter_id = sys.argv[1] 
-    collect_images(voter_id)
-
-
+    voter_id = sys.argv[1]
+    # --auto: quality-scored auto-capture instead of pressing 'c'
+    if "--auto" in sys.argv[2:]:
+        auto_collect_images(voter_id)
+    else:
+        collect_images(voter_id)
@@ -0,0 +1,126 @@
+import collections
+import os
+import threading
+import time
+import numpy as np
+
+# -------------------------------------------------------------
+# HOT-VOTER EMBEDDING CACHE
+#
+# LRU of decoded voter embeddings, bounded by total bytes rather than
+# entry count and with a TTL per entry. Entries are validated against a
+# cheap "version" of the voter's source (the .npy file's mtime/size, or
+# the store's row range), so a re-enrollment written by another process
+# is picked up on the next hit without waiting for the TTL.
+# -------------------------------------------------------------
+
+DEFAULT_MAX_BYTES = int(os.environ.get("EMBEDDING_CACHE_BYTES", str(64 * 1024 * 1024)))
+DEFAULT_TTL_S = float(os.environ.get("EMBEDDING_CACHE_TTL", "900"))
+
+
+class EmbeddingCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL_S, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = collections.OrderedDict()  # key -> (array, version, expires)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def bytes(self):
+        return self._bytes
+
+    def _drop(self, key):
+        array, _, _ = self._entries.pop(key)
+        self._bytes -= array.nbytes
+
+    def get(self, key, version=None):
+        """
+        Returns the cached array, or None on a miss. An entry whose
+        version differs from `version` (when given) or whose TTL has
+        passed counts as a miss and is dropped.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            array, cached_version, expires = entry
+            if self._clock() >= expires:
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if version is not None and version != cached_version:
+                self._drop(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return array
+
+    def put(self, key, array, version=None):
+        array = np.asarray(array)
+        if array.nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+            self._entries[key] = (array, version, self._clock() + self.ttl)
+            self._bytes += array.nbytes
+
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+def file_version(path):
+    """(mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
@@ -0,0 +1,419 @@
+import os
+import sqlite3
+import sys
+import numpy as np
+
+from embedding_cache import EmbeddingCache, file_version
+
+# -------------------------------------------------------------
+# CONSOLIDATED EMBEDDING STORE
+#
+# All embeddings of one encoder live in a single float32 matrix on
+# disk (<root>/<name>.f32) that is memory-mapped for reads. A small
+# SQLite index (<root>/<name>.idx) maps voter id -> (start row, count),
+# so a lookup is one indexed query plus a slice of the memmap, and no
+# per-voter file has to be opened.
+#
+# Re-enrolling a voter appends new rows and repoints the index; the old
+# rows become garbage until compact() is run.
+#
+# compact() never rewrites a file other processes may have mapped (which
+# Windows refuses): it writes the live rows to the next generation's
+# file (<root>/<name>.g<N>.f32) and records the new generation in the
+# index in the same transaction. Readers see the generation change on
+# their next lookup and remap; files of older generations are deleted
+# once nothing holds them open.
+# -------------------------------------------------------------
+
+DEFAULT_ROOT = os.path.join("encodings", "store")
+# "onnx" holds embeddings from encoder_backends.OnnxBackend
+ENCODERS = ("face_recognition", "robust", "onnx")
+
+
+class EmbeddingStore:
+    def __init__(self, name, root=DEFAULT_ROOT):
+        self.name = name
+        self.root = root
+        self.index_path = os.path.join(root, f"{name}.idx")
+
+        os.makedirs(root, exist_ok=True)
+        self._db = sqlite3.connect(self.index_path, timeout=30,
+                                   isolation_level=None,
+                                   check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key   TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS voters (
+                voter_id TEXT PRIMARY KEY,
+                start    INTEGER NOT NULL,
+                count    INTEGER NOT NULL
+            );
+        """)
+
+        self._map = None
+        self._mapped_rows = 0
+        self._mapped_generation = 0
+
+        if not os.path.exists(self.data_path):
+            open(self.data_path, "ab").close()
+
+    def path_for(self, generation):
+        """Data file of a generation; generation 0 keeps the original name."""
+        suffix = f"g{generation}.f32" if generation else "f32"
+        return os.path.join(self.root, f"{self.name}.{suffix}")
+
+    @property
+    def data_path(self):
+        return self.path_for(self.generation)
+
+    # ---------------------------------------------------------
+    # METADATA
+    # ---------------------------------------------------------
+    def _meta(self, key, default=0):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self._db.execute(
+            "INSERT INTO meta(key, value) VALUES(?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, int(value)),
+        )
+
+    @property
+    def dim(self):
+        return self._meta("dim")
+
+    @property
+    def rows(self):
+        return self._meta("rows")
+
+    @property
+    def generation(self):
+        return self._meta("generation")
+
+    def snapshot(self):
+        """(rows, generation), read together so they always match."""
+        meta = dict(self._db.execute(
+            "SELECT key, value FROM meta WHERE key IN ('rows', 'generation')"))
+        return meta.get("rows", 0), meta.get("generation", 0)
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM voters").fetchone()[0]
+
+    def __contains__(self, voter_id):
+        return self._lookup(voter_id) is not None
+
+    def voter_ids(self):
+        return [r[0] for r in self._db.execute("SELECT voter_id FROM voters ORDER BY start")]
+
+    # ---------------------------------------------------------
+    # READ PATH
+    # ---------------------------------------------------------
+    def _lookup(self, voter_id):
+        return self._db.execute(
+            "SELECT start, count FROM voters WHERE voter_id = ?", (voter_id,)
+        ).fetchone()
+
+    def _matrix(self, needed_rows, generation=None):
+        # Remap only when another writer has grown the file past what we
+        # currently have mapped, or a different generation is asked for.
+        # A generation's file is append-only, so its size bounds the rows
+        # any index entry of that generation can point at.
+        if generation is None:
+            generation = self._meta("generation")
+        if (self._map is None or needed_rows > self._mapped_rows
+                or generation != self._mapped_generation):
+            dim = self.dim
+            try:
+                rows = os.path.getsize(self.path_for(generation)) // (dim * 4) if dim else 0
+            except OSError:
+                return None  # an older generation already removed by compact()
+            if rows == 0 or rows < needed_rows:
+                return None
+            self._map = np.memmap(self.path_for(generation), dtype=np.float32,
+                                  mode="r", shape=(rows, dim))
+            self._mapped_rows = rows
+            self._mapped_generation = generation
+        return self._map
+
+    def entry(self, voter_id):
+        """(start, count) of the voter's rows, or None."""
+        return self._lookup(voter_id)
+
+    def locate(self, voter_id):
+        """
+        (start, count, generation) of the voter's rows, or None. Read in
+        one statement, so the row range always belongs to the generation
+        it is returned with, even while compact() runs.
+        """
+        return self._db.execute(
+            "SELECT start, count, "
+            "COALESCE((SELECT value FROM meta WHERE key = 'generation'), 0) "
+            "FROM voters WHERE voter_id = ?", (voter_id,)
+        ).fetchone()
+
+    def get(self, voter_id, entry=None):
+        """
+        Returns the voter's embeddings as a read-only (count, dim) view
+        into the memory map, or None if the voter is not in the store.
+
+        `entry` is a (start, count) from entry() or a (start, count,
+        generation) from locate(); the latter is read from that
+        generation's file. Without an entry the voter is located
+        atomically, retrying if compact() removes the generation's file
+        between the lookup and the read.
+        """
+        if entry is not None:
+            return self._read(entry)
+
+        for _ in range(3):
+            hit = self.locate(voter_id)
+            if hit is None:
+                return None
+            rows = self._read(hit)
+            if rows is not None:
+                return rows
+        return None
+
+    def _read(self, entry):
+        start, count = entry[0], entry[1]
+        generation = entry[2] if len(entry) > 2 else None
+        matrix = self._matrix(start + count, generation)
+        if matrix is None:
+            return None
+        return matrix[start:start + count]
+
+    def matrix(self):
+        """Returns the whole (rows, dim) matrix, including garbage rows."""
+        rows = self.rows
+        matrix = self._matrix(rows)
+        return None if matrix is None else matrix[:rows]
+
+    def ranges(self):
+        """Yields (voter_id, start, count) for every live voter."""
+        yield from self._db.execute("SELECT voter_id, start, count FROM voters ORDER BY start")
+
+    # ---------------------------------------------------------
+    # WRITE PATH
+    # ---------------------------------------------------------
+    def append(self, voter_id, vectors):
+        vectors = np.ascontiguousarray(np.atleast_2d(vectors), dtype=np.float32)
+        if vectors.shape[0] == 0:
+            return
+
+        # BEGIN IMMEDIATE takes the SQLite write lock, which also
+        # serialises concurrent writers of the data file.
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            dim = self.dim
+            if dim == 0:
+                dim = vectors.shape[1]
+                self._set_meta("dim", dim)
+            elif vectors.shape[1] != dim:
+                raise ValueError(f"{self.name}: expected dim {dim}, got {vectors.shape[1]}")
+
+            start = self.rows
+            with open(self.data_path, "r+b") as f:
+                f.seek(start * dim * 4)
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._db.execute(
+                "INSERT INTO voters(voter_id, start, count) VALUES(?, ?, ?) "
+                "ON CONFLICT(voter_id) DO UPDATE SET start = excluded.start, count = excluded.count",
+                (voter_id, start, vectors.shape[0]),
+            )
+            self._set_meta("rows", start + vectors.shape[0])
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def remove(self, voter_id):
+        self._db.execute("DELETE FROM voters WHERE voter_id = ?", (voter_id,))
+
+    def compact(self):
+        """Writes the rows that are still indexed to a new generation's file."""
+        dim = self.dim
+        if dim == 0:
+            return
+
+        self._db.execute("BEGIN IMMEDIATE")
+        generation = self.generation
+        new_path = self.path_for(generation + 1)
+        try:
+            matrix = self._matrix(self.rows)
+            new_ranges = []
+            offset = 0
+            with open(new_path, "wb") as out:
+                for voter_id, start, count in self.ranges():
+                    out.write(np.ascontiguousarray(matrix[start:start + count]).tobytes())
+                    new_ranges.append((offset, voter_id))
+                    offset += count
+                out.flush()
+                os.fsync(out.fileno())
+
+            self._db.executemany("UPDATE voters SET start = ? WHERE voter_id = ?", new_ranges)
+            self._set_meta("rows", offset)
+            self._set_meta("generation", generation + 1)
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            if os.path.exists(new_path):
+                os.remove(new_path)
+            raise
+
+        del matrix
+        self._map = None
+        self._mapped_rows = 0
+        self.remove_stale_files()
+
+    def remove_stale_files(self):
+        """
+        Deletes data files of older generations. On Windows a file that
+        another process still has mapped cannot be deleted; it is left
+        for the next call.
+        """
+        current = self.generation
+        removed = []
+        for generation in range(current):
+            path = self.path_for(generation)
+            if not os.path.exists(path):
+                continue
+            try:
+                os.remove(path)
+                removed.append(path)
+            except OSError:
+                pass
+        return removed
+
+    def close(self):
+        self._map = None
+        self._db.close()
+
+
+# -------------------------------------------------------------
+# SHARED INSTANCES
+# -------------------------------------------------------------
+_stores = {}
+
+
+def get_store(name, root=DEFAULT_ROOT):
+    """Returns a process-wide store instance, opening it on first use."""
+    key = (name, root)
+    if key not in _stores:
+        _stores[key] = EmbeddingStore(name, root)
+    return _stores[key]
+
+
+def store_exists(name, root=DEFAULT_ROOT):
+    return os.path.exists(os.path.join(root, f"{name}.idx"))
+
+
+# Decoded embeddings of recently verified voters, shared by every lookup
+# in this process. See embedding_cache.py for sizing knobs.
+embedding_cache = EmbeddingCache()
+
+
+def load_voter_embeddings(voter_id, name="face_recognition", enc_dir="encodings",
+                          root=None):
+    """
+    A voter's embeddings from the store (`root`, default <enc_dir>/store),
+    falling back to the legacy <voter>_<name>.npy file. Returns None if
+    neither exists.
+
+    Results go through embedding_cache. The cache entry is tagged with
+    the store row range and generation, or the .npy file's mtime and
+    size, so a re-enrollment by another process invalidates it. Store
+    rows are copied out of the memory map once, when they are cached.
+    """
+    key = (name, voter_id)
+    root = root or os.path.join(enc_dir, "store")
+
+    if store_exists(name, root):
+        store = get_store(name, root)
+        # The row range and generation come from one read, and the rows
+        # from that generation's file, so a concurrent compact() can
+        # never pair one generation's offsets with another's data
+        for _ in range(3):
+            entry = store.locate(voter_id)
+            if entry is None:
+                break
+            version = ("store",) + tuple(entry)
+            cached = embedding_cache.get(key, version)
+            if cached is not None:
+                return cached
+
+            stored = store.get(voter_id, entry)
+            if stored is not None:
+                # Copy out of the memmap so hot voters stay resident
+                # regardless of page-cache pressure, and an old
+                # generation's file is not held open by the cache.
+                stored = np.array(stored)
+                stored.flags.writeable = False
+                embedding_cache.put(key, stored, version)
+                return stored
+            # The generation's file was removed by a compaction; re-read
+
+    path = os.path.join(enc_dir, f"{voter_id}_{name}.npy")
+    version = file_version(path)
+    if version is None:
+        embedding_cache.invalidate(key)
+        return None
+
+    cached = embedding_cache.get(key, ("npy",) + version)
+    if cached is not None:
+        return cached
+
+    loaded = np.load(path)
+    loaded.flags.writeable = False
+    embedding_cache.put(key, loaded, ("npy",) + version)
+    return loaded
+
+
+def invalidate_voter(voter_id):
+    """Drops a voter's cached embeddings after their files were rewritten."""
+    for name in ENCODERS:
+        embedding_cache.invalidate((name, voter_id))
+
+
+# -------------------------------------------------------------
+# MIGRATION FROM PER-VOTER .npy FILES
+# -------------------------------------------------------------
+def migrate_encodings(enc_dir="encodings", root=DEFAULT_ROOT):
+    """
+    One-shot import of every <voter>_<encoder>.npy file in enc_dir into
+    the consolidated stores. Safe to re-run: voters are repointed to the
+    freshly appended rows and compact() drops the old ones.
+    """
+    counts = {}
+    for name in ENCODERS:
+        suffix = f"_{name}.npy"
+        files = sorted(f for f in os.listdir(enc_dir) if f.endswith(suffix))
+        if not files:
+            continue
+
+        store = get_store(name, root)
+        for file in files:
+            voter_id = file[:-len(suffix)]
+            try:
+                store.append(voter_id, np.load(os.path.join(enc_dir, file)))
+            except Exception as e:
+                print(f"⚠️ Skipping {file}: {e}")
+                continue
+            counts[name] = counts.get(name, 0) + 1
+
+        store.compact()
+        print(f"[INFO] {name}: {counts.get(name, 0)} voters, "
+              f"{store.rows} rows x {store.dim} dims")
+
+    return counts
+
+
+if __name__ == "__main__":
+    enc_dir = sys.argv[1] if len(sys.argv) > 1 else "encodings"
+    migrate_encodings(enc_dir)
@@ -0,0 +1,197 @@
+import os
+import cv2
+import numpy as np
+
+from lazy_imports import ensure_loaded, lazy
+
+# -------------------------------------------------------------
+# FACE ENCODER BACKENDS
+#
+# One batch contract for every face encoder:
+#
+#   backend.encode(images, boxes=None) -> (N, dim) ndarray
+#
+# `images` are RGB uint8 frames, `boxes` one (top, right, bottom, left)
+# face box per frame (None: the whole frame is the face). Row i is the
+# embedding of face i; every backend returns one row per image.
+#
+#   dlib    face_recognition.face_encodings (128-d, float64). dlib has
+#           no batched CPU path, so a batch is a loop; it is the
+#           reference the stored templates were built with.
+#   robust  RobustFaceEncoder's HOG/LBP/stats features (836-d, float32,
+#           L2-normalised). Vectorised per image; a batch costs about
+#           the same per image as single calls.
+#   onnx    any embedding model exported to ONNX and supplied locally
+#           (FACE_ONNX_MODEL), run with ONNX Runtime on the CPU in
+#           batches of FACE_ENCODER_BATCH. Output rows are L2-normalised
+#           float32.
+#
+# FACE_ENCODER picks the backend verification and enrollment use for
+# the primary (dlib-slot) embedding. Each backend writes to its own
+# embedding store (`kind`), so switching backends never mixes vector
+# spaces; a non-dlib backend needs its voters re-enrolled and its own
+# tolerance, measured with calibrate.py --encoder <kind>.
+#
+# Throughput comparison: python python/bench_encoder_backends.py
+# -------------------------------------------------------------
+
+ENCODER = os.environ.get("FACE_ENCODER", "dlib")
+BATCH_SIZE = int(os.environ.get("FACE_ENCODER_BATCH", "16"))
+
+ONNX_MODEL = os.environ.get("FACE_ONNX_MODEL", os.path.join("models", "face_embedding.onnx"))
+ONNX_THREADS = int(os.environ.get("FACE_ONNX_THREADS", "0"))  # 0: ONNX Runtime default
+# Input normalisation, (pixel - mean) / std; 127.5 / 127.5 suits ArcFace-style models
+ONNX_MEAN = float(os.environ.get("FACE_ONNX_MEAN", "127.5"))
+ONNX_STD = float(os.environ.get("FACE_ONNX_STD", "127.5"))
+
+face_recognition = lazy("face_recognition")
+onnxruntime = lazy("onnxruntime")
+
+
+def _full_boxes(images):
+    return [(0, img.shape[1], img.shape[0], 0) for img in images]
+
+
+def _crop(image, box):
+    top, right, bottom, left = box
+    h, w = image.shape[:2]
+    return image[max(0, top):min(h, bottom), max(0, left):min(w, right)]
+
+
+def _l2_rows(matrix):
+    norms = np.sqrt(np.einsum("ij,ij->i", matrix, matrix))
+    norms[norms == 0] = 1.0
+    return matrix / norms[:, None]
+
+
+class EncoderBackend:
+    """Base class: subclasses implement _encode_batch for one chunk."""
+
+    name = None
+    kind = None  # embedding store / .npy suffix the vectors are saved under
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = max(1, batch_size)
+
+    def warm(self):
+        """Loads models now (worker start-up) instead of on the first encode."""
+
+    def encode(self, images, boxes=None):
+        images = list(images)
+        boxes = _full_boxes(images) if boxes is None else list(boxes)
+        if len(boxes) != len(images):
+            raise ValueError(f"{len(images)} images but {len(boxes)} boxes")
+        if not images:
+            return np.empty((0, 0), dtype=np.float32)
+
+        chunks = [self._encode_batch(images[i:i + self.batch_size], boxes[i:i + self.batch_size])
+                  for i in range(0, len(images), self.batch_size)]
+        return np.concatenate(chunks)
+
+    def _encode_batch(self, images, boxes):
+        raise NotImplementedError
+
+
+class DlibBackend(EncoderBackend):
+    name = "dlib"
+    kind = "face_recognition"
+
+    def warm(self):
+        ensure_loaded(face_recognition)
+
+    def _encode_batch(self, images, boxes):
+        return np.array([face_recognition.face_encodings(img, [box])[0]
+                         for img, box in zip(images, boxes)])
+
+
+class RobustBackend(EncoderBackend):
+    name = "robust"
+    kind = "robust"
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        super().__init__(batch_size)
+        from feature_encoding import RobustFaceEncoder
+        self.encoder = RobustFaceEncoder()
+
+    def _encode_batch(self, images, boxes):
+        # Same resize as RobustFaceEncoder.extract_from_gray, on the face box
+        stack = np.stack([cv2.resize(cv2.cvtColor(_crop(img, box), cv2.COLOR_RGB2GRAY), (128, 128))
+                          for img, box in zip(images, boxes)])
+        return _l2_rows(self.encoder.extract_batch(stack))
+
+
+class OnnxBackend(EncoderBackend):
+    name = "onnx"
+    kind = "onnx"
+
+    def __init__(self, batch_size=BATCH_SIZE, model_path=ONNX_MODEL):
+        super().__init__(batch_size)
+        self.model_path = model_path
+        self._session = None
+
+    def warm(self):
+        self._load()
+
+    def _load(self):
+        if self._session is not None:
+            return self._session
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"ONNX face model not found: {self.model_path} "
+                                    "(set FACE_ONNX_MODEL)")
+
+        options = onnxruntime.SessionOptions()
+        if ONNX_THREADS > 0:
+            options.intra_op_num_threads = ONNX_THREADS
+        session = onnxruntime.InferenceSession(self.model_path, options,
+                                               providers=["CPUExecutionProvider"])
+
+        # (N, 3, H, W) or (N, H, W, 3); a fixed N of 1 means no batching
+        spec = session.get_inputs()[0]
+        shape = spec.shape
+        self._input = spec.name
+        self._nchw = shape[1] == 3
+        self._size = (shape[3], shape[2]) if self._nchw else (shape[2], shape[1])
+        if not all(isinstance(s, int) for s in self._size):
+            self._size = (112, 112)
+        self._fixed_batch = shape[0] if isinstance(shape[0], int) else None
+        self._session = session
+        return session
+
+    def _run(self, batch):
+        out = self._session.run(None, {self._input: batch})[0]
+        return out.reshape(len(batch), -1)
+
+    def _encode_batch(self, images, boxes):
+        self._load()
+        faces = [cv2.resize(_crop(img, box), self._size, interpolation=cv2.INTER_LINEAR)
+                 for img, box in zip(images, boxes)]
+        batch = (np.stack(faces).astype(np.float32) - ONNX_MEAN) / ONNX_STD
+        if self._nchw:
+            batch = np.ascontiguousarray(batch.transpose(0, 3, 1, 2))
+
+        if self._fixed_batch == 1:
+            out = np.concatenate([self._run(batch[i:i + 1]) for i in range(len(batch))])
+        else:
+            out = self._run(batch)
+        return _l2_rows(out.astype(np.float32, copy=False))
+
+
+BACKENDS = {
+    "dlib": DlibBackend,
+    "robust": RobustBackend,
+    "onnx": OnnxBackend,
+}
+
+_backends = {}
+
+
+def get_backend(name=None, batch_size=None):
+    """The process-wide backend `name` (default FACE_ENCODER)."""
+    name = name or ENCODER
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown face encoder {name!r}; choose from {sorted(BACKENDS)}")
+
+    key = (name, batch_size or BATCH_SIZE)
+    if key not in _backends:
+        _backends[key] = BACKENDS[name](batch_size or BATCH_SIZE)
+    return _backends[key]
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import numpy as np
+
+# -------------------------------------------------------------
+# PER-IMAGE ENCODING CACHE
+#
+# encodings/cache/<voter>.npz remembers, for every image that has been
+# encoded, the SHA-256 of its bytes and the two vectors it produced.
+# Re-enrollment only encodes images whose hash is not in the cache;
+# entries whose image was deleted from dataset/<voter>/ are dropped.
+#
+# Bump ENCODER_VERSION whenever either encoder changes its output, so
+# old entries are treated as misses and re-encoded. Settings that change
+# the vectors without a code change (FACE_ENROLL_DETECT_REDUCTION) are
+# appended to it by cache_version().
+# -------------------------------------------------------------
+
+ENCODER_VERSION = "dlib-hog-1/robust-1"
+CACHE_DIR = os.path.join("encodings", "cache")
+FR_DIM = 128
+
+
+def cache_version():
+    """
+    The version a cache file must carry to be used: ENCODER_VERSION plus
+    the enrollment settings that change the cached vectors. Detection on
+    a reduced decode finds slightly different boxes, so it changes the
+    dlib encodings.
+    """
+    from feature_encoding import DETECT_REDUCTION
+    return f"{ENCODER_VERSION}/detect-reduction-{DETECT_REDUCTION}"
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class EncodingCache:
+    """
+    Cached vectors for one voter, keyed by image content hash.
+
+    Each entry holds an optional dlib vector and an optional robust
+    vector; None means the encoder ran and found no face, which is
+    cached too so hopeless images are not retried on every run.
+    """
+
+    def __init__(self, voter_id, cache_dir=CACHE_DIR):
+        self.voter_id = voter_id
+        self.path = os.path.join(cache_dir, f"{voter_id}.npz")
+        self.version = cache_version()
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data["version"]) != self.version:
+                    return
+                hashes = data["hashes"]
+                fr, fr_mask = data["fr"], data["fr_mask"]
+                robust, robust_mask = data["robust"], data["robust_mask"]
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable encoding cache {self.path}: {e}")
+            return
+
+        for i, h in enumerate(hashes):
+            self.entries[str(h)] = (
+                fr[i] if fr_mask[i] else None,
+                robust[i] if robust_mask[i] else None,
+            )
+
+    def get(self, digest):
+        return self.entries.get(digest)
+
+    def put(self, digest, fr_vec, robust_vec):
+        self.entries[digest] = (fr_vec, robust_vec)
+
+    def retain(self, digests):
+        """Drops entries for images that are no longer in the dataset."""
+        keep = set(digests)
+        stale = [h for h in self.entries if h not in keep]
+        for h in stale:
+            del self.entries[h]
+        return len(stale)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        hashes = list(self.entries)
+        fr_mask = np.array([self.entries[h][0] is not None for h in hashes], dtype=bool)
+        robust_mask = np.array([self.entries[h][1] is not None for h in hashes], dtype=bool)
+
+        robust_dim = next((len(self.entries[h][1]) for h in hashes
+                           if self.entries[h][1] is not None), 0)
+        fr = np.zeros((len(hashes), FR_DIM))
+        robust = np.zeros((len(hashes), robust_dim))
+        for i, h in enumerate(hashes):
+            fr_vec, robust_vec = self.entries[h]
+            if fr_vec is not None:
+                fr[i] = fr_vec
+            if robust_vec is not None:
+                robust[i] = robust_vec
+
+        # Write next to the target and rename so a crash never leaves a
+        # half-written cache behind.
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, version=np.array(self.version),
+                 hashes=np.array(hashes, dtype="U64"),
+                 fr=fr, fr_mask=fr_mask, robust=robust, robust_mask=robust_mask)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,442 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socketserver
+import sqlite3
+import threading
+import time
+
+# -------------------------------------------------------------
+# ENROLLMENT JOB QUEUE
+#
+# Registrations no longer encode inside the HTTP request: Node submits a
+# job and answers immediately, and a pool of worker processes picks jobs
+# up from a durable SQLite queue (encodings/enroll_jobs.sqlite), so
+# queued work survives a restart.
+#
+# Job lifecycle: queued -> running -> done | failed
+#   - progress (images encoded / total) is written while a job runs and
+#     doubles as the worker's heartbeat; a running job whose heartbeat is
+#     older than LEASE_S (worker hung) is put back in the queue; a worker
+#     process that exits is restarted and its job released at once
+#   - a job is failed once its attempts are used up, including attempts
+#     that ended with the worker dying
+#   - transient errors are retried with exponential backoff up to
+#     max_attempts; permanent ones (no dataset, no face) fail at once
+#
+# Service protocol (JSON lines over TCP, like face_server.py):
+#   {"id": 1, "op": "submit", "voterId": "a@b.com"}   -> {"id": 1, "job": {...}}
+#   {"id": 2, "op": "status", "voterId": "a@b.com"}   -> latest job of the voter
+#   {"id": 3, "op": "status", "jobId": 7}
+#   {"id": 4, "op": "metrics"}                        -> depth, throughput, durations
+#
+#   python python/enroll_queue.py serve --workers 4
+#   python python/enroll_queue.py submit a@b.com
+#   python python/enroll_queue.py status a@b.com
+#   python python/enroll_queue.py metrics
+# -------------------------------------------------------------
+
+QUEUE_PATH = os.environ.get("ENROLL_QUEUE_PATH", os.path.join("encodings", "enroll_jobs.sqlite"))
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = int(os.environ.get("ENROLL_SERVER_PORT", "5056"))
+MAX_ATTEMPTS = 3
+BACKOFF_S = 5.0
+LEASE_S = 300.0
+POLL_S = 0.5
+SUPERVISE_S = 2.0
+
+
+class PermanentError(Exception):
+    """A job failure that retrying cannot fix."""
+
+
+class JobQueue:
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS jobs (
+                id           INTEGER PRIMARY KEY AUTOINCREMENT,
+                voter_id     TEXT NOT NULL,
+                status       TEXT NOT NULL,
+                options      TEXT NOT NULL DEFAULT '{}',
+                attempts     INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                done         INTEGER NOT NULL DEFAULT 0,
+                total        INTEGER NOT NULL DEFAULT 0,
+                message      TEXT,
+                result       TEXT,
+                worker       TEXT,
+                created      REAL NOT NULL,
+                run_after    REAL NOT NULL,
+                started      REAL,
+                heartbeat    REAL,
+                finished     REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_pending ON jobs(status, run_after);
+            CREATE INDEX IF NOT EXISTS jobs_voter ON jobs(voter_id, id);
+        """)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params)
+
+    def _transaction(self, fn):
+        # BEGIN IMMEDIATE: claims are atomic across worker processes
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn(self._db)
+                self._db.execute("COMMIT")
+                return out
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _as_dict(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["options"] = json.loads(job["options"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["progress"] = round(job["done"] / job["total"], 3) if job["total"] else 0.0
+        return job
+
+    # ---------------------------------------------------------
+    # PRODUCER SIDE
+    # ---------------------------------------------------------
+    def submit(self, voter_id, options=None, max_attempts=MAX_ATTEMPTS):
+        """
+        Queues an enrollment. A voter that already has a queued or
+        running job gets that job back instead of a duplicate.
+        """
+        def insert(db):
+            row = db.execute(
+                "SELECT * FROM jobs WHERE voter_id = ? AND status IN ('queued', 'running') "
+                "ORDER BY id DESC LIMIT 1", (voter_id,)).fetchone()
+            if row is not None:
+                return row["id"]
+            now = time.time()
+            return db.execute(
+                "INSERT INTO jobs(voter_id, status, options, max_attempts, created, run_after) "
+                "VALUES(?, 'queued', ?, ?, ?, ?)",
+                (voter_id, json.dumps(options or {}), max_attempts, now, now)).lastrowid
+
+        return self.get(self._transaction(insert))
+
+    def get(self, job_id):
+        return self._as_dict(self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def latest(self, voter_id):
+        return self._as_dict(self._execute(
+            "SELECT * FROM jobs WHERE voter_id = ? ORDER BY id DESC LIMIT 1", (voter_id,)).fetchone())
+
+    # ---------------------------------------------------------
+    # WORKER SIDE
+    # ---------------------------------------------------------
+    @staticmethod
+    def _release(db, where, params, message, now=None):
+        """
+        Takes running jobs matching `where` away from their worker: back
+        to the queue, or failed once their attempts are used up. A job
+        that kills its worker every time is never retried forever.
+        """
+        now = now or time.time()
+        db.execute(f"UPDATE jobs SET status = 'failed', message = ?, finished = ? "
+                   f"WHERE status = 'running' AND attempts >= max_attempts AND {where}",
+                   (f"{message}, attempts exhausted", now) + params)
+        db.execute(f"UPDATE jobs SET status = 'queued', run_after = ?, message = ? "
+                   f"WHERE status = 'running' AND {where}", (now, message) + params)
+
+    def release_worker(self, worker):
+        """Releases the jobs of a worker process that died."""
+        self._transaction(lambda db: self._release(db, "worker = ?", (worker,), "worker died"))
+
+    def claim(self, worker):
+        def take(db):
+            now = time.time()
+            # Requeue jobs whose worker stopped sending heartbeats
+            self._release(db, "heartbeat < ?", (now - LEASE_S,), "lease expired", now)
+            row = db.execute("SELECT * FROM jobs WHERE status = 'queued' AND run_after <= ? "
+                             "ORDER BY run_after, id LIMIT 1", (now,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, "
+                       "started = ?, heartbeat = ?, done = 0, total = 0, message = NULL "
+                       "WHERE id = ?", (worker, now, now, row["id"]))
+            return row["id"]
+
+        job_id = self._transaction(take)
+        return None if job_id is None else self.get(job_id)
+
+    # The updates below only apply while `worker` still holds the job: a
+    # worker whose lease expired must not touch it once it was requeued
+    # or claimed by another worker. Each returns whether it applied.
+    _OWNED = "id = ? AND worker = ? AND status = 'running'"
+
+    def progress(self, job_id, worker, done, total):
+        return self._execute(
+            f"UPDATE jobs SET done = ?, total = ?, heartbeat = ? WHERE {self._OWNED}",
+            (done, total, time.time(), job_id, worker)).rowcount == 1
+
+    def finish(self, job_id, worker, result):
+        now = time.time()
+        return self._execute(
+            f"UPDATE jobs SET status = 'done', result = ?, finished = ?, heartbeat = ? "
+            f"WHERE {self._OWNED}", (json.dumps(result), now, now, job_id, worker)).rowcount == 1
+
+    def fail(self, job_id, worker, message, permanent=False):
+        """
+        Requeues with backoff while attempts remain, else marks failed.
+        Returns the new status, or None if the worker lost the job.
+        """
+        def update(db):
+            row = db.execute(f"SELECT attempts, max_attempts FROM jobs WHERE {self._OWNED}",
+                             (job_id, worker)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if permanent or row["attempts"] >= row["max_attempts"]:
+                db.execute("UPDATE jobs SET status = 'failed', message = ?, finished = ? "
+                           "WHERE id = ?", (message, now, job_id))
+                return "failed"
+            delay = BACKOFF_S * 2 ** (row["attempts"] - 1)
+            db.execute("UPDATE jobs SET status = 'queued', message = ?, run_after = ? "
+                       "WHERE id = ?", (message, now + delay, job_id))
+            return "queued"
+
+        return self._transaction(update)
+
+    # ---------------------------------------------------------
+    # METRICS
+    # ---------------------------------------------------------
+    def metrics(self, window_s=900):
+        now = time.time()
+        depth = {r[0]: r[1] for r in self._execute(
+            "SELECT status, COUNT(*) FROM jobs GROUP BY status")}
+        durations = sorted(r[0] for r in self._execute(
+            "SELECT finished - started FROM jobs WHERE status = 'done' AND finished >= ?",
+            (now - window_s,)))
+        waits = [r[0] for r in self._execute(
+            "SELECT started - created FROM jobs WHERE started IS NOT NULL AND started >= ?",
+            (now - window_s,))]
+        failed = self._execute("SELECT COUNT(*) FROM jobs WHERE status = 'failed' AND finished >= ?",
+                               (now - window_s,)).fetchone()[0]
+
+        def pct(values, q):
+            if not values:
+                return None
+            return round(values[min(len(values) - 1, int(q * len(values)))], 2)
+
+        return {
+            "depth": {s: depth.get(s, 0) for s in ("queued", "running", "done", "failed")},
+            "window_s": window_s,
+            "completed": len(durations),
+            "failed": failed,
+            "jobs_per_min": round(len(durations) / (window_s / 60.0), 3),
+            "duration_p50_s": pct(durations, 0.50),
+            "duration_p99_s": pct(durations, 0.99),
+            "mean_wait_s": round(sum(waits) / len(waits), 2) if waits else None,
+        }
+
+
+# -------------------------------------------------------------
+# WORKER PROCESSES
+# -------------------------------------------------------------
+def run_job(queue, job, encoder):
+    from encoding_cache import EncodingCache
+    from feature_encoding import encode_voter_images, list_voter_images, save_encodings
+
+    voter_id = job["voter_id"]
+    image_files = list_voter_images(voter_id)
+    if not image_files:
+        raise PermanentError(f"No images found for voter ID: {voter_id}")
+
+    total = len(image_files)
+    queue.progress(job["id"], job["worker"], 0, total)
+    seen = [0]
+
+    def log(message):
+        # encode_voter_images logs one "--- Processing" line per image
+        if message.lstrip().startswith("--- Processing"):
+            queue.progress(job["id"], job["worker"], seen[0], total)
+            seen[0] += 1
+
+    cache = EncodingCache(voter_id)
+    fr, robust, success = encode_voter_images(voter_id, image_files, encoder, log=log,
+                                              cache=cache)
+    cache.save()
+    queue.progress(job["id"], job["worker"], total, total)
+
+    saved = save_encodings(voter_id, fr, robust,
+                           prototypes=bool(job["options"].get("prototypes")))
+    if not saved:
+        raise PermanentError("No face found in any image")
+    return {"images": total, "success": success, "fr": len(fr), "robust": len(robust),
+            "saved": saved}
+
+
+def worker_loop(path, name, stop):
+    import feature_encoding
+    from lazy_imports import ensure_loaded
+
+    # The dlib models load once per worker, not on its first job
+    ensure_loaded(feature_encoding.face_recognition)
+    feature_encoding.get_backend().warm()
+    queue = JobQueue(path)
+    encoder = feature_encoding.RobustFaceEncoder()
+    while not stop.is_set():
+        job = queue.claim(name)
+        if job is None:
+            stop.wait(POLL_S)
+            continue
+
+        print(f"[INFO] {name}: job {job['id']} ({job['voter_id']}) attempt {job['attempts']}",
+              flush=True)
+        try:
+            result = run_job(queue, job, encoder)
+        except PermanentError as e:
+            state = queue.fail(job["id"], name, str(e), permanent=True)
+            print(f"❌ {name}: job {job['id']} failed ({state or 'lease lost'}): {e}", flush=True)
+        except Exception as e:
+            state = queue.fail(job["id"], name, f"{type(e).__name__}: {e}")
+            print(f"⚠️ {name}: job {job['id']} error ({state or 'lease lost'}): {e}", flush=True)
+        else:
+            if queue.finish(job["id"], name, result):
+                print(f"✅ {name}: job {job['id']} done {result['fr']} FR / "
+                      f"{result['robust']} robust", flush=True)
+            else:
+                print(f"⚠️ {name}: job {job['id']} finished after its lease expired; "
+                      f"result dropped", flush=True)
+
+
+# -------------------------------------------------------------
+# SERVICE (TCP, JSON lines)
+# -------------------------------------------------------------
+def handle(queue, request):
+    req_id = request.get("id")
+    op = request.get("op")
+    try:
+        if op == "ping":
+            return {"id": req_id, "ok": True}
+        if op == "submit":
+            if not request.get("voterId"):
+                return {"id": req_id, "error": "voterId required"}
+            options = {"prototypes": bool(request.get("prototypes"))}
+            return {"id": req_id, "job": queue.submit(request["voterId"], options)}
+        if op == "status":
+            job = (queue.get(int(request["jobId"])) if request.get("jobId") is not None
+                   else queue.latest(request.get("voterId")))
+            return {"id": req_id, "job": job}
+        if op == "metrics":
+            return {"id": req_id, "metrics": queue.metrics()}
+    except (KeyError, ValueError, sqlite3.Error) as e:
+        return {"id": req_id, "error": str(e)}
+    return {"id": req_id, "error": f"Unknown op: {op}"}
+
+
+class _LineHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode("utf-8").strip()
+            if not line:
+                continue
+            try:
+                response = handle(self.server.queue, json.loads(line))
+            except ValueError:
+                response = {"id": None, "error": "Invalid JSON"}
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _ThreadedServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _spawn(path, name, stop):
+    proc = multiprocessing.Process(target=worker_loop, args=(path, name, stop), daemon=True)
+    proc.start()
+    return proc
+
+
+def supervise(queue, procs, path, stop, interval=SUPERVISE_S):
+    """
+    Respawns worker processes that died (e.g. a native crash in dlib).
+    The dead worker's job is released at once rather than after LEASE_S,
+    and counts as a failed attempt.
+    """
+    while not stop.wait(interval):
+        for name, proc in list(procs.items()):
+            if proc.is_alive():
+                continue
+            print(f"⚠️ {name} exited with code {proc.exitcode}, restarting", flush=True)
+            queue.release_worker(name)
+            procs[name] = _spawn(path, name, stop)
+
+
+def serve(workers, host=DEFAULT_HOST, port=DEFAULT_PORT, path=QUEUE_PATH):
+    queue = JobQueue(path)
+    stop = multiprocessing.Event()
+    procs = {f"worker-{i}": None for i in range(workers)}
+    for name in procs:
+        procs[name] = _spawn(path, name, stop)
+    threading.Thread(target=supervise, args=(queue, procs, path, stop), daemon=True).start()
+
+    with _ThreadedServer((host, port), _LineHandler) as server:
+        server.queue = queue
+        print(f"[INFO] Enrollment queue listening on {host}:{port} with {workers} workers",
+              flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("[INFO] Enrollment queue stopped.")
+        finally:
+            # Running jobs finish; queued ones stay in the database
+            stop.set()
+            for p in list(procs.values()):
+                p.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enrollment job queue")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("serve")
+    p.add_argument("--host", default=DEFAULT_HOST)
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+
+    p = sub.add_parser("submit")
+    p.add_argument("voter_ids", nargs="+")
+    p.add_argument("--prototypes", action="store_true")
+
+    p = sub.add_parser("status")
+    p.add_argument("voter_id")
+
+    sub.add_parser("metrics")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.workers, args.host, args.port)
+        return
+
+    queue = JobQueue()
+    if args.command == "submit":
+        for voter_id in args.voter_ids:
+            print(json.dumps(queue.submit(voter_id, {"prototypes": args.prototypes})))
+    elif args.command == "status":
+        print(json.dumps(queue.latest(args.voter_id), indent=2))
+    else:
+        print(json.dumps(queue.metrics(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+import argparse
+import json
+import os
+import sys
+import numpy as np
+
+from embedding_store import get_store
+
+# -------------------------------------------------------------
+# 1:N FACE IDENTIFICATION (IVF APPROXIMATE NEAREST NEIGHBOUR)
+#
+# Embeddings are bucketed by their nearest k-means centroid ("inverted
+# lists"). A query only scans the `nprobe` closest lists, so its cost
+# grows with N / nlist * nprobe instead of N.
+#
+# The index is built from the face_recognition embedding store and can
+# be brought up to date incrementally with sync_from_store(), which
+# appends voters enrolled (or re-enrolled) since the last sync, drops
+# removed ones, and refills the index after the store was compacted.
+#
+#   python python/face_index.py build
+#   python python/face_index.py dedup someone@gmail.com
+# -------------------------------------------------------------
+
+INDEX_PATH = os.path.join("encodings", "store", "face_recognition.ivf.npz")
+DUPLICATE_TOLERANCE = 0.5
+
+
+def _sq_distances(a, b, b_sq=None):
+    """Squared L2 distances between the rows of a and b."""
+    if b_sq is None:
+        b_sq = np.einsum("ij,ij->i", b, b)
+    a_sq = np.einsum("ij,ij->i", a, a)
+    d = a_sq[:, None] + b_sq[None, :] - 2.0 * (a @ b.T)
+    np.maximum(d, 0, out=d)
+    return d
+
+
+def _nearest(vectors, centroids, block=65536):
+    """Index of the closest centroid for every row, in bounded-memory blocks."""
+    c_sq = np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(len(vectors), dtype=np.int64)
+    for s in range(0, len(vectors), block):
+        out[s:s + block] = _sq_distances(vectors[s:s + block], centroids, c_sq).argmin(axis=1)
+    return out
+
+
+def train_centroids(vectors, nlist, iters=10, sample=None, seed=0):
+    """Plain Lloyd k-means on (a sample of) the vectors."""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    sample = sample or min(len(vectors), nlist * 64)
+    if sample < len(vectors):
+        vectors = vectors[rng.choice(len(vectors), sample, replace=False)]
+
+    nlist = min(nlist, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+
+    for _ in range(iters):
+        assign = _nearest(vectors, centroids)
+        sums = np.zeros_like(centroids, dtype=np.float64)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=nlist)
+
+        filled = counts > 0
+        centroids[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+        # Re-seed empty lists from random points so no list is wasted.
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+
+    return centroids
+
+
+class IVFIndex:
+    def __init__(self, centroids, nprobe=8):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.dim = self.centroids.shape[1]
+        self.nprobe = nprobe
+
+        self.clear()
+
+    def clear(self):
+        """Drops every inserted row, keeping the trained centroids."""
+        nlist = len(self.centroids)
+        self._vecs = [np.empty((0, self.dim), dtype=np.float32) for _ in range(nlist)]
+        self._codes = [np.empty(0, dtype=np.int64) for _ in range(nlist)]
+        self._sizes = np.zeros(nlist, dtype=np.int64)
+
+        # Voter codes: position in self.voters. A re-enrolled voter gets a
+        # new code and the old one is marked dead instead of being
+        # removed from the lists.
+        self.voters = []
+        self._alive = np.zeros(0, dtype=bool)
+        self.voter_code = {}
+        self.voter_start = {}
+        # Store generation the row starts refer to; compact() renumbers them
+        self.store_generation = None
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    @property
+    def alive(self):
+        return self._alive[:len(self.voters)]
+
+    def __len__(self):
+        return int(self._sizes.sum())
+
+    # ---------------------------------------------------------
+    # INSERTS
+    # ---------------------------------------------------------
+    def _new_code(self, voter_id):
+        old = self.voter_code.get(voter_id)
+        if old is not None:
+            self._alive[old] = False
+
+        code = len(self.voters)
+        if code >= len(self._alive):
+            grown = np.zeros(max(16, 2 * len(self._alive)), dtype=bool)
+            grown[:len(self._alive)] = self._alive
+            self._alive = grown
+
+        self.voters.append(voter_id)
+        self._alive[code] = True
+        self.voter_code[voter_id] = code
+        return code
+
+    def add(self, voter_id, vectors, start=None):
+        self.add_many([(voter_id, vectors, start)])
+
+    def add_many(self, items):
+        """Inserts (voter_id, vectors, store_start) items in one assignment pass."""
+        all_vecs, all_codes = [], []
+        for voter_id, vectors, start in items:
+            vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+            code = self._new_code(voter_id)
+            if start is not None:
+                self.voter_start[voter_id] = start
+            all_vecs.append(vectors)
+            all_codes.append(np.full(len(vectors), code, dtype=np.int64))
+
+        if all_vecs:
+            self._add_rows(np.concatenate(all_vecs), np.concatenate(all_codes))
+
+    def _add_rows(self, vectors, codes):
+        lists = _nearest(vectors, self.centroids)
+        order = np.argsort(lists, kind="stable")
+        lists, vectors, codes = lists[order], vectors[order], codes[order]
+        bounds = np.flatnonzero(np.diff(lists)) + 1
+
+        for chunk in np.split(np.arange(len(lists)), bounds):
+            if not len(chunk):
+                continue
+            l = lists[chunk[0]]
+            size, need = self._sizes[l], self._sizes[l] + len(chunk)
+
+            # Grow the list's buffers geometrically so incremental inserts
+            # stay amortised O(1) per row.
+            if need > len(self._vecs[l]):
+                cap = max(need, 2 * len(self._vecs[l]), 16)
+                vecs = np.empty((cap, self.dim), dtype=np.float32)
+                vecs[:size] = self._vecs[l][:size]
+                codes_buf = np.empty(cap, dtype=np.int64)
+                codes_buf[:size] = self._codes[l][:size]
+                self._vecs[l], self._codes[l] = vecs, codes_buf
+
+            self._vecs[l][size:need] = vectors[chunk]
+            self._codes[l][size:need] = codes[chunk]
+            self._sizes[l] = need
+
+    def sync_from_store(self, store):
+        """
+        Adds voters that were enrolled or re-enrolled since the last sync
+        and drops voters no longer in the store. After a compact() (new
+        generation, rows renumbered) the index is cleared and refilled.
+        Returns the number of voters added or dropped.
+        """
+        generation = store.generation
+        if generation != self.store_generation:
+            self.clear()
+            self.store_generation = generation
+
+        ranges = list(store.ranges())
+        changed = 0
+        current = {voter_id for voter_id, _, _ in ranges}
+        for voter_id in [v for v in self.voter_code if v not in current]:
+            self._alive[self.voter_code.pop(voter_id)] = False
+            self.voter_start.pop(voter_id, None)
+            changed += 1
+
+        matrix = store.matrix()
+        items = [
+            (voter_id, matrix[start:start + count], start)
+            for voter_id, start, count in ranges
+            if not (voter_id in self.voter_code and self.voter_start.get(voter_id) == start)
+        ]
+        self.add_many(items)
+        return changed + len(items)
+
+    # ---------------------------------------------------------
+    # SEARCH
+    # ---------------------------------------------------------
+    def search(self, query, k=5, nprobe=None):
+        """
+        Returns up to k (voter_id, distance) pairs, closest first. A
+        voter's distance is the minimum over all of their embeddings.
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(1, -1)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+
+        to_centroids = _sq_distances(query, self.centroids)[0]
+        probe = np.argpartition(to_centroids, nprobe - 1)[:nprobe]
+
+        vecs = [self._vecs[l][:self._sizes[l]] for l in probe if self._sizes[l]]
+        if not vecs:
+            return []
+        vecs = np.concatenate(vecs)
+        codes = np.concatenate([self._codes[l][:self._sizes[l]] for l in probe if self._sizes[l]])
+
+        live = self.alive[codes]
+        vecs, codes = vecs[live], codes[live]
+        if not len(codes):
+            return []
+
+        dist = np.sqrt(_sq_distances(query, vecs)[0])
+        return self._top_voters(dist, codes, k)
+
+    def _top_voters(self, dist, codes, k):
+        order = np.argsort(dist, kind="stable")
+        results, seen = [], set()
+        for i in order:
+            code = codes[i]
+            if code in seen:
+                continue
+            seen.add(code)
+            results.append((self.voters[code], float(dist[i])))
+            if len(results) == k:
+                break
+        return results
+
+    # ---------------------------------------------------------
+    # PERSISTENCE
+    # ---------------------------------------------------------
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        vecs = np.concatenate([self._vecs[l][:self._sizes[l]] for l in range(self.nlist)])
+        codes = np.concatenate([self._codes[l][:self._sizes[l]] for l in range(self.nlist)])
+        starts = np.array([self.voter_start.get(v, -1) for v in self.voters], dtype=np.int64)
+
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, nprobe=self.nprobe,
+                 vecs=vecs, codes=codes, sizes=self._sizes,
+                 voters=np.array(self.voters, dtype=str), alive=self.alive, starts=starts,
+                 generation=-1 if self.store_generation is None else self.store_generation)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(data["centroids"], int(data["nprobe"]))
+            vecs, codes, sizes = data["vecs"], data["codes"], data["sizes"]
+            voters, alive, starts = data["voters"].tolist(), data["alive"], data["starts"]
+            # Indexes saved before generations were recorded resync in full
+            generation = int(data["generation"]) if "generation" in data.files else -1
+
+        offset = 0
+        for l, size in enumerate(sizes):
+            index._vecs[l] = vecs[offset:offset + size].copy()
+            index._codes[l] = codes[offset:offset + size].copy()
+            offset += size
+        index._sizes = sizes.astype(np.int64)
+
+        index.voters = voters
+        index._alive = alive.astype(bool)
+        for code, voter_id in enumerate(voters):
+            if index._alive[code]:
+                index.voter_code[voter_id] = code
+                if starts[code] >= 0:
+                    index.voter_start[voter_id] = int(starts[code])
+        index.store_generation = None if generation < 0 else generation
+        return index
+
+
+# -------------------------------------------------------------
+# BUILD / QUERY HELPERS
+# -------------------------------------------------------------
+def default_nlist(n):
+    # ~sqrt(N) lists keeps both the centroid scan and the list scans small.
+    return int(max(1, min(4096, round(np.sqrt(n)))))
+
+
+def build_index(store=None, nlist=None, nprobe=8):
+    store = store or get_store("face_recognition")
+    ranges = list(store.ranges())
+    if not ranges:
+        raise ValueError("Embedding store is empty; enroll voters first")
+
+    matrix = store.matrix()
+    live = np.concatenate([matrix[s:s + c] for _, s, c in ranges])
+    index = IVFIndex(train_centroids(live, nlist or default_nlist(len(live))), nprobe)
+    index.sync_from_store(store)
+    return index
+
+
+def load_or_build_index(path=INDEX_PATH):
+    """Loads the saved index and catches it up with the store."""
+    store = get_store("face_recognition")
+    if os.path.exists(path):
+        index = IVFIndex.load(path)
+        if index.sync_from_store(store):
+            index.save(path)
+        return index
+
+    index = build_index(store)
+    index.save(path)
+    return index
+
+
+def identify(index, embedding, k=5, nprobe=None):
+    return index.search(embedding, k=k, nprobe=nprobe)
+
+
+def find_duplicates(index, voter_id, tolerance=DUPLICATE_TOLERANCE, k=5, store=None):
+    """
+    Other voters whose face is within `tolerance` of any of voter_id's
+    enrolled embeddings, i.e. likely duplicate registrations.
+    """
+    store = store or get_store("face_recognition")
+    embeddings = store.get(voter_id)
+    if embeddings is None:
+        raise KeyError(f"{voter_id} is not enrolled")
+
+    best = {}
+    for emb in embeddings:
+        for other, dist in index.search(emb, k=k + 1):
+            if other != voter_id and dist < best.get(other, np.inf):
+                best[other] = dist
+
+    return sorted(((v, d) for v, d in best.items() if d < tolerance), key=lambda x: x[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="1:N face identification index")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="(Re)build the index from the embedding store")
+    b.add_argument("--nlist", type=int, default=None)
+    b.add_argument("--nprobe", type=int, default=8)
+
+    d = sub.add_parser("dedup", help="List voters that look like the given voter")
+    d.add_argument("voter_id")
+    d.add_argument("--tolerance", type=float, default=DUPLICATE_TOLERANCE)
+    d.add_argument("-k", type=int, default=5)
+
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        index = build_index(nlist=args.nlist, nprobe=args.nprobe)
+        index.save()
+        print(f"[INFO] Indexed {len(index)} embeddings in {index.nlist} lists")
+        return
+
+    index = load_or_build_index()
+    try:
+        dups = find_duplicates(index, args.voter_id, args.tolerance, args.k)
+    except KeyError as e:
+        print(json.dumps({"voterId": args.voter_id, "error": str(e)}))
+        sys.exit(1)
+
+    print(json.dumps({
+        "voterId": args.voter_id,
+        "duplicates": [{"voterId": v, "distance": round(d, 4)} for v, d in dups],
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import collections
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+# -------------------------------------------------------------
+# FACE PIPELINE INSTRUMENTATION
+#
+# stage()      : monotonic timer that adds a stage's seconds to a dict
+# incr()       : named counters (detection failures, threshold rejects...)
+# record()     : one structured record per verify / encode call; kept in
+#                in-process histograms and, when FACE_METRICS_JSONL is
+#                set, appended to that file as one JSON line
+# prometheus_text() / prometheus_from_jsonl() render the histograms and
+# counters in the Prometheus text exposition format.
+# -------------------------------------------------------------
+
+METRICS_JSONL = os.environ.get("FACE_METRICS_JSONL")
+
+# Latency buckets in milliseconds
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Machine-readable outcome for every reason match_voter can return
+OUTCOMES = {
+    "Match": "success",
+    "Encoding file NOT FOUND": "not_enrolled",
+    "Login image NOT FOUND": "image_missing",
+    "Login image unreadable": "image_unreadable",
+    "No face detected in login image": "no_face",
+    "Distance >= tolerance": "threshold_reject",
+    # quality_gate.py rejections
+    "Login image too small": "quality_too_small",
+    "Login image too dark": "quality_too_dark",
+    "Login image too bright": "quality_too_bright",
+    "Login image has no contrast": "quality_low_contrast",
+    "Login image too blurred": "quality_blurred",
+    "Face too small in login image": "quality_face_too_small",
+}
+
+
+def outcome_for(reason):
+    return OUTCOMES.get(reason, "error")
+
+
+_lock = threading.Lock()
+_counters = collections.Counter()
+_histograms = {}  # (call, stage) -> [bucket counts..., +Inf count, sum_ms]
+
+
+@contextlib.contextmanager
+def stage(timings, name):
+    """Adds the seconds spent inside the block to timings[name]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def to_ms(timings):
+    return {k: round(v * 1000, 3) for k, v in timings.items()}
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def _observe(histograms, call, stage_name, ms):
+    hist = histograms.get((call, stage_name))
+    if hist is None:
+        hist = histograms[(call, stage_name)] = [0] * (len(BUCKETS_MS) + 1) + [0.0]
+    for i, bound in enumerate(BUCKETS_MS):
+        if ms <= bound:
+            hist[i] += 1
+    hist[len(BUCKETS_MS)] += 1
+    hist[-1] += ms
+
+
+def _aggregate(counters, histograms, rec):
+    call = rec["call"]
+    counters[f"{call}_total"] += 1
+    if rec.get("outcome"):
+        counters[f"{call}_{rec['outcome']}"] += 1
+    for stage_name, ms in rec["timings_ms"].items():
+        _observe(histograms, call, stage_name, ms)
+    _observe(histograms, call, "total", rec["total_ms"])
+
+
+def record(call, fields, timings_ms):
+    """
+    Registers one call. `fields` is the structured result (voter id,
+    outcome, distance, ...), `timings_ms` the per-stage timings in ms.
+    Returns the full record.
+    """
+    rec = {"ts": round(time.time(), 3), "call": call}
+    rec.update(fields)
+    rec["timings_ms"] = timings_ms
+    rec["total_ms"] = round(sum(timings_ms.values()), 3)
+
+    with _lock:
+        _aggregate(_counters, _histograms, rec)
+
+    if METRICS_JSONL:
+        try:
+            with open(METRICS_JSONL, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec) + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not write metrics to {METRICS_JSONL}: {e}", file=sys.stderr)
+
+    return rec
+
+
+def snapshot():
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "histograms": {f"{c}/{s}": list(h) for (c, s), h in _histograms.items()},
+        }
+
+
+# -------------------------------------------------------------
+# PROMETHEUS TEXT EXPORT
+# -------------------------------------------------------------
+def _render(counters, histograms):
+    lines = ["# TYPE face_pipeline_events_total counter"]
+    for name, value in sorted(counters.items()):
+        lines.append(f'face_pipeline_events_total{{event="{name}"}} {value}')
+
+    lines.append("# TYPE face_pipeline_stage_ms histogram")
+    for (call, stage_name), hist in sorted(histograms.items()):
+        labels = f'call="{call}",stage="{stage_name}"'
+        for bound, count in zip(BUCKETS_MS, hist):
+            lines.append(f'face_pipeline_stage_ms_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'face_pipeline_stage_ms_bucket{{{labels},le="+Inf"}} {hist[len(BUCKETS_MS)]}')
+        lines.append(f"face_pipeline_stage_ms_sum{{{labels}}} {round(hist[-1], 3)}")
+        lines.append(f"face_pipeline_stage_ms_count{{{labels}}} {hist[len(BUCKETS_MS)]}")
+
+    return "\n".join(lines) + "\n"
+
+
+def prometheus_text():
+    """Metrics recorded by this process."""
+    with _lock:
+        return _render(dict(_counters), {k: list(v) for k, v in _histograms.items()})
+
+
+def prometheus_from_jsonl(path):
+    """
+    Aggregates a FACE_METRICS_JSONL file, e.g. one written by many
+    short-lived CLI runs, into Prometheus text.
+    """
+    counters, histograms = collections.Counter(), {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                _aggregate(counters, histograms, json.loads(line))
+    return _render(counters, histograms)
+
+
+if __name__ == "__main__":
+    # python face_metrics.py <metrics.jsonl>  -> Prometheus text on stdout
+    path = sys.argv[1] if len(sys.argv) > 1 else METRICS_JSONL
+    if not path:
+        print("usage: face_metrics.py <metrics.jsonl>")
+        sys.exit(1)
+    sys.stdout.write(prometheus_from_jsonl(path))
@@ -118,65 +118,513 @@
 #     verify_voter(voter_id)
 
 import cv2
-import face_recognition
 import numpy as np
+import argparse
+import base64
+import json
 import os
 import sys
-
-def verify_voter(voter_id, tolerance=0.5):
-    encodings_dir = "encodings"
-    temp_dir = "temp"
-
-    face_rec_file = os.path.join(encodings_dir, f"{voter_id}_face_recognition.npy")
-    temp_image_file = os.path.join(temp_dir, f"{voter_id}.jpg")
-
-    print("DEBUG | Looking for encoding:", face_rec_file)
-    print("DEBUG | Looking for login image:", temp_image_file)
-
-    # 1. Check encoding file
-    if not os.path.exists(face_rec_file):
-        print("FAILED | Encoding file NOT FOUND")
-        return False
-
-    stored_encodings = np.load(face_rec_file)
-    print("DEBUG | Encoding loaded. Shape:", stored_encodings.shape)
-
-    # 2. Check login image
-    if not os.path.exists(temp_image_file):
-        print("FAILED | Login image NOT FOUND")
-        return False
-
-    img = cv2.imread(temp_image_file)
-    if img is None:
-        print("FAILED | Login image unreadable")
-        return False
-
-    rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
-    # 3. Detect face
-    face_encodings = face_recognition.face_encodings(rgb)
-
-    if len(face_encodings) == 0:
-        print("FAILED | No face detected in login image")
-        return False
-
-    login_face = face_encodings[0]
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from embedding_store import load_voter_embeddings
+from encoder_backends import get_backend
+from face_metrics import incr, outcome_for, record, stage, to_ms
+from face_templates import decide, load_prototypes
+from frame import decode_rgb
+from lazy_imports import lazy
+from quality_gate import ENABLED as QUALITY_GATE, REASONS, check_face, check_frame
+from quantized_store import load_voter_quantized, verify_distance
+
+# dlib and its models load on the first detection, so a call that ends
+# at "Encoding file NOT FOUND" never imports them
+face_recognition = lazy("face_recognition")
+
+ENCODINGS_DIR = "encodings"
+TEMP_DIR = "temp"
+
+# The login face is encoded by the FACE_ENCODER backend and compared
+# with the embeddings that backend enrolled (see encoder_backends.py)
+ENCODER = get_backend()
+
+
+def load_stored_encodings(voter_id):
+    """
+    Returns the voter's dlib encodings, or None if they were never enrolled.
+
+    The memory-mapped embedding store is tried first; voters enrolled
+    before it existed still have a per-voter .npy file.
+    """
+    return load_voter_embeddings(voter_id, "face_recognition", ENCODINGS_DIR)
+
+
+# -------------------------------------------------------------
+# DETECTION CASCADE
+#
+# "full"      : HOG over the full-resolution frame (original behaviour)
+# "hog_small" : HOG on a copy downscaled to DETECT_MAX_SIDE, box mapped
+#               back to full resolution
+# "mediapipe" : MediaPipe short-range detector on the downscaled copy
+#
+# The cheap detectors fall through to the next stage when they find
+# nothing, so a hard frame still gets a full-resolution HOG pass. Only
+# landmarks and the 128-d encoding run at full resolution, inside the
+# detected box.
+# -------------------------------------------------------------
+DETECTOR = os.environ.get("FACE_DETECTOR", "hog_small")
+DETECT_MAX_SIDE = int(os.environ.get("FACE_DETECT_MAX_SIDE", "320"))
+CASCADES = {
+    "full": ("full",),
+    "hog_small": ("hog_small", "full"),
+    "mediapipe": ("mediapipe", "hog_small", "full"),
+}
+
+_mp_detector = None
+
+
+def _largest(boxes):
+    # (top, right, bottom, left) boxes; the voter is the biggest face
+    return max(boxes, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]))
+
+
+def _downscale(rgb, max_side):
+    h, w = rgb.shape[:2]
+    scale = min(1.0, max_side / float(max(h, w)))
+    if scale == 1.0:
+        return rgb, 1.0
+    small = cv2.resize(rgb, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    return small, scale
+
+
+def _detect_hog_small(rgb, max_side):
+    small, scale = _downscale(rgb, max_side)
+    boxes = face_recognition.face_locations(small, model="hog")
+    if not boxes:
+        return None
+
+    h, w = rgb.shape[:2]
+    top, right, bottom, left = _largest(boxes)
+    return (max(0, int(top / scale)), min(w, int(right / scale)),
+            min(h, int(bottom / scale)), max(0, int(left / scale)))
+
+
+def _detect_mediapipe(rgb, max_side):
+    global _mp_detector
+    if _mp_detector is None:
+        try:
+            import mediapipe as mp
+            _mp_detector = mp.solutions.face_detection.FaceDetection(
+                model_selection=0, min_detection_confidence=0.5
+            )
+        except Exception:
+            _mp_detector = False
+    if _mp_detector is False:
+        return None
+
+    small, _ = _downscale(rgb, max_side)
+    results = _mp_detector.process(small)
+    if not results.detections:
+        return None
+
+    h, w = rgb.shape[:2]
+    boxes = []
+    for det in results.detections:
+        bb = det.location_data.relative_bounding_box
+        left, top = int(bb.xmin * w), int(bb.ymin * h)
+        right, bottom = left + int(bb.width * w), top + int(bb.height * h)
+        boxes.append((max(0, top), min(w, right), min(h, bottom), max(0, left)))
+    return _largest(boxes)
+
+
+def locate_face(rgb, detector=DETECTOR, max_side=DETECT_MAX_SIDE, timings=None):
+    """
+    Runs the detection cascade for `detector` and returns the largest
+    face as a (top, right, bottom, left) box at full resolution, or None.
+    Seconds spent per cascade stage are added to `timings`.
+    """
+    if timings is None:
+        timings = {}
+
+    for step in CASCADES.get(detector, CASCADES["full"]):
+        with stage(timings, f"detect_{step}"):
+            if step == "full":
+                boxes = face_recognition.face_locations(rgb, model="hog")
+                box = _largest(boxes) if boxes else None
+            elif step == "hog_small":
+                box = _detect_hog_small(rgb, max_side)
+            else:
+                box = _detect_mediapipe(rgb, max_side)
+
+        if box is not None and box[2] > box[0] and box[1] > box[3]:
+            return box
+        incr(f"detect_miss_{step}")
+
+    return None
+
+
+def encode_login_face(rgb, detector=DETECTOR, timings=None):
+    """Detects via the cascade and returns the full-resolution 128-d encoding, or None."""
+    if timings is None:
+        timings = {}
+
+    box = locate_face(rgb, detector, timings=timings)
+    if box is None:
+        return None
+
+    return _encode_box(rgb, box, timings)
+
+
+def _encode_box(rgb, box, timings):
+    with stage(timings, "encode"):
+        encodings = ENCODER.encode([rgb], [box])
+
+    return encodings[0] if len(encodings) else None
+
+
+def decode_login_frame(voter_id, image_bytes=None, timings=None):
+    """
+    Decodes the login frame and runs the quality gate.
+
+    Returns (rgb, None) or (None, reason).
+    """
+    if timings is None:
+        timings = {}
+
+    # One decode, straight to the RGB buffer dlib uses (see frame.py)
+    with stage(timings, "decode"):
+        if image_bytes is None:
+            temp_image_file = os.path.join(TEMP_DIR, f"{voter_id}.jpg")
+            if not os.path.exists(temp_image_file):
+                return None, "Login image NOT FOUND"
+            with open(temp_image_file, "rb") as f:
+                image_bytes = f.read()
+
+        rgb = decode_rgb(image_bytes)
+        if rgb is None:
+            return None, "Login image unreadable"
+
+    # Hopeless frames are rejected before detection (see quality_gate.py)
+    if QUALITY_GATE:
+        with stage(timings, "quality"):
+            code, _ = check_frame(rgb)
+        if code is not None:
+            return None, REASONS[code]
+
+    return rgb, None
+
+
+def encode_login_frame(rgb, detector=DETECTOR, timings=None):
+    """Detects and encodes a decoded login frame. Returns (encoding, None) or (None, reason)."""
+    if timings is None:
+        timings = {}
+
+    box = locate_face(rgb, detector, timings=timings)
+    if box is None:
+        return None, "No face detected in login image"
+
+    if QUALITY_GATE and check_face(box) is not None:
+        return None, REASONS["face_too_small"]
+
+    login_face = _encode_box(rgb, box, timings)
+    if login_face is None:
+        return None, "No face detected in login image"
+
+    return login_face, None
+
+
+def login_encoding(voter_id, image_bytes=None, detector=DETECTOR, timings=None):
+    """
+    Decodes the login frame and encodes its face.
+
+    Returns (encoding, None) on success or (None, reason) on failure.
+    """
+    if timings is None:
+        timings = {}
+
+    rgb, reason = decode_login_frame(voter_id, image_bytes, timings)
+    if rgb is None:
+        return None, reason
+
+    return encode_login_frame(rgb, detector, timings)
+
+
+def encode_logins(items, detector=DETECTOR):
+    """
+    Batch form of login_encoding for (voter_id, image_bytes) pairs, used
+    by the verification scheduler's worker processes. Returns a list of
+    (encoding or None, reason, timings in ms).
+    """
+    out = []
+    for voter_id, image_bytes in items:
+        timings = {}
+        enc, reason = login_encoding(voter_id, image_bytes, detector, timings)
+        out.append((enc, reason, to_ms(timings)))
+    return out
+
+
+def verification_result(success, distance, reason, timings_ms, **extra):
+    """Builds the result dict for one verification."""
+    result = {"success": success, "distance": distance, "reason": reason,
+              "outcome": outcome_for(reason), "timings": timings_ms}
+    result.update(extra)
+    return result
+
+
+def record_verification(voter_id, result):
+    """
+    Registers a match_voter result with face_metrics. Called by whoever
+    owns the result (the CLI, or the face server's parent process) so the
+    metrics end up in the process that exports them.
+    """
+    fields = {"voter_id": voter_id, "success": result["success"],
+              "outcome": result["outcome"], "distance": result["distance"]}
+    fields.update({k: v for k, v in result.items()
+                   if k not in ("success", "distance", "reason", "outcome", "timings")})
+    if "frames_used" in result:
+        # Frames consumed per burst, against verify_success: the cost of a login
+        incr("verify_burst_total")
+        incr("verify_burst_frames", result["frames_used"])
+    return record("verify", fields, result["timings"])
+
+
+def load_references(voter_id):
+    """
+    What a login is compared against: the prototype template if the
+    voter was enrolled with one, else the compact rows when
+    EMBEDDING_QUANT is set, else the stored encodings (store first,
+    legacy .npy second). Returns a dict, or None if never enrolled.
+    """
+    if ENCODER.kind != "face_recognition":
+        # Prototypes and compact rows exist for the dlib template only
+        stored = load_voter_embeddings(voter_id, ENCODER.kind, ENCODINGS_DIR)
+        return None if stored is None else {"template": None, "quantized": None,
+                                            "stored": stored}
+
+    refs = {"template": load_prototypes(voter_id, ENCODINGS_DIR),
+            "quantized": None, "stored": None}
+    if refs["template"] is None:
+        refs["quantized"] = load_voter_quantized(voter_id)
+    if refs["template"] is None and refs["quantized"] is None:
+        refs["stored"] = load_stored_encodings(voter_id)
+        if refs["stored"] is None:
+            return None
+    return refs
+
+
+def best_distance(voter_id, refs, login_face, tolerance, extra):
+    """
+    Distance of `login_face` to the voter. Prototypes first (see
+    face_templates.py), full scan only when they cannot decide; the
+    stored encodings are then loaded into `refs` for later frames.
+    """
+    if refs["quantized"] is not None:
+        # Scored on the compact rows, best few re-scored in float32 (None
+        # if the voter was removed since the rows were loaded)
+        rows, entry = refs["quantized"]
+        return verify_distance(voter_id, rows, login_face, entry=entry)
+
+    if refs["template"] is not None:
+        decision, best = decide(refs["template"], login_face, tolerance)
+        extra["early_decision"] = decision is not None
+        if decision is not None:
+            return best
+        if refs["stored"] is None:
+            refs["stored"] = load_stored_encodings(voter_id)
+        if refs["stored"] is None:
+            return best
+
+    # face_recognition.face_distance, without importing dlib for it
+    distances = np.linalg.norm(np.atleast_2d(refs["stored"]) - login_face, axis=1)
+    return float(np.min(distances))
+
+
+def match_voter(voter_id, tolerance=0.5, image_bytes=None, detector=DETECTOR):
+    """
+    Runs the 1:1 verification for a voter without printing anything.
+
+    The login frame is taken from `image_bytes` when given; otherwise it
+    is read from temp/<voterId>.jpg as before.
+
+    Returns a dict with ``success``, ``distance`` (None when no comparison
+    could be made), a short ``reason``, its machine-readable ``outcome``
+    and per-stage ``timings`` in milliseconds, so that both the CLI below
+    and the long-running face_server can report the outcome. Nothing is
+    recorded here: the owner of the result passes it to
+    record_verification.
+    """
+    timings = {}
+    extra = {"detector": detector}
+
+    def result(success, distance, reason):
+        return verification_result(success, distance, reason, to_ms(timings), **extra)
+
+    # 1. Load what the login is compared against
+    with stage(timings, "load"):
+        refs = load_references(voter_id)
+    if refs is None:
+        return result(False, None, "Encoding file NOT FOUND")
+
+    # 2-3. Decode login image, detect (cascade) and encode at full resolution
+    login_face, reason = login_encoding(voter_id, image_bytes, detector, timings)
+
+    if login_face is None:
+        return result(False, None, reason)
 
     # 4. Compare
-    distances = face_recognition.face_distance(stored_encodings, login_face)
-    best = np.min(distances)
-
-    print("DEBUG | Best distance:", best)
+    with stage(timings, "compare"):
+        best = best_distance(voter_id, refs, login_face, tolerance, extra)
+    if best is None:
+        return result(False, None, "Encoding file NOT FOUND")
 
     if best < tolerance:
+        return result(True, best, "Match")
+
+    return result(False, best, "Distance >= tolerance")
+
+
+# -------------------------------------------------------------
+# BURST VERIFICATION
+#
+# The browser can send a short burst of frames instead of one, so a
+# single blurred or half-blinked frame does not fail the login. Frames
+# are processed as a two-stage pipeline: a helper thread decodes (and
+# quality-gates) frame i+1 while frame i is detected and encoded; cv2
+# releases the GIL, so the decode is hidden behind the encode.
+#
+# The burst stops at the first frame whose distance is below
+# tolerance - BURST_MARGIN, so a clear match costs one frame. A match
+# that only just clears the tolerance keeps looking for a better frame
+# and is accepted once the burst is exhausted.
+# -------------------------------------------------------------
+BURST_MARGIN = float(os.environ.get("FACE_BURST_MARGIN", "0.05"))
+BURST_MAX_FRAMES = int(os.environ.get("FACE_BURST_MAX_FRAMES", "5"))
+
+
+def match_voter_burst(voter_id, frames, tolerance=0.5, detector=DETECTOR,
+                      margin=BURST_MARGIN):
+    """
+    match_voter over a burst of encoded frames (at most BURST_MAX_FRAMES
+    are used). The result also carries ``frames_used``, ``frames_total``,
+    ``best_frame`` and the ``frame_outcomes`` of the frames consumed;
+    ``distance`` is the best distance over those frames.
+    """
+    frames = list(frames)[:BURST_MAX_FRAMES]
+    timings = {}
+    extra = {"detector": detector, "frames_total": len(frames), "frames_used": 0,
+             "best_frame": None, "frame_outcomes": []}
+
+    def result(success, distance, reason):
+        return verification_result(success, distance, reason, to_ms(timings), **extra)
+
+    if not frames:
+        return result(False, None, "Login image NOT FOUND")
+
+    with stage(timings, "load"):
+        refs = load_references(voter_id)
+    if refs is None:
+        return result(False, None, "Encoding file NOT FOUND")
+
+    # Set once the burst is decided; a decode that has not started yet
+    # returns at once instead of decoding a frame nobody will look at
+    stop = threading.Event()
+
+    def decode(data):
+        # Own timings dict: this runs concurrently with the encode stage
+        frame_timings = {}
+        if stop.is_set():
+            return None, None, frame_timings
+        rgb, reason = decode_login_frame(voter_id, data, frame_timings)
+        return rgb, reason, frame_timings
+
+    best, reason = None, "Login image unreadable"
+    decoder = ThreadPoolExecutor(max_workers=1)
+    try:
+        pending = decoder.submit(decode, frames[0])
+        for i in range(len(frames)):
+            rgb, reason, frame_timings = pending.result()
+            pending = decoder.submit(decode, frames[i + 1]) if i + 1 < len(frames) else None
+            for name, seconds in frame_timings.items():
+                timings[name] = timings.get(name, 0.0) + seconds
+            extra["frames_used"] = i + 1
+
+            distance = None
+            if rgb is not None:
+                login_face, reason = encode_login_frame(rgb, detector, timings)
+                if login_face is not None:
+                    with stage(timings, "compare"):
+                        distance = best_distance(voter_id, refs, login_face, tolerance, extra)
+                    if distance is None:
+                        reason = "Encoding file NOT FOUND"
+                    else:
+                        reason = "Match" if distance < tolerance else "Distance >= tolerance"
+            extra["frame_outcomes"].append(outcome_for(reason))
+            if reason == "Encoding file NOT FOUND":
+                break
+
+            if distance is not None and (best is None or distance < best):
+                best, extra["best_frame"] = distance, i
+            if distance is not None and distance < tolerance - margin:
+                break
+    finally:
+        # A decode already running cannot be interrupted; it is not waited for
+        stop.set()
+        decoder.shutdown(wait=False)
+
+    if best is None:
+        # No frame got as far as a comparison; report the last reason
+        return result(False, None, reason)
+    if best < tolerance:
+        return result(True, best, "Match")
+    return result(False, best, "Distance >= tolerance")
+
+
+def verify_voter(voter_id, tolerance=0.5, image_bytes=None, frames=None):
+    print("DEBUG | Looking for encoding:",
+          os.path.join(ENCODINGS_DIR, f"{voter_id}_face_recognition.npy"))
+    if frames is not None:
+        print("DEBUG | Login burst from stdin:", len(frames), "frames")
+    elif image_bytes is None:
+        print("DEBUG | Looking for login image:",
+              os.path.join(TEMP_DIR, f"{voter_id}.jpg"))
+    else:
+        print("DEBUG | Login image from stdin:", len(image_bytes), "bytes")
+
+    if frames is not None:
+        result = match_voter_burst(voter_id, frames, tolerance)
+    else:
+        result = match_voter(voter_id, tolerance, image_bytes)
+    record_verification(voter_id, result)
+
+    if result["distance"] is not None:
+        print("DEBUG | Best distance:", result["distance"])
+    if frames is not None:
+        print("DEBUG | Frames used:", result["frames_used"], "of", result["frames_total"])
+    print("DEBUG | Stage timings (ms):", result["timings"])
+
+    # Structured record for callers; the SUCCESS / FAILED line below is
+    # kept for older callers that only search the output for it.
+    print("RESULT", json.dumps(result))
+
+    if result["success"]:
         print("SUCCESS")
-        sys.exit(0)
         return True
 
-    print("FAILED | Distance >= tolerance")
+    print("FAILED |", result["reason"])
     return False
 
 
 if __name__ == "__main__":
-    voter_id = sys.argv[1]
-    verify_voter(voter_id)
+    parser = argparse.ArgumentParser(description="1:1 face verification for a voter")
+    parser.add_argument("voter_id")
+    source = parser.add_mutually_exclusive_group()
+    # --stdin: the encoded login image is piped in instead of saved to temp/
+    source.add_argument("--stdin", action="store_true")
+    # --stdin-burst: a burst of frames, one base64 image per line
+    source.add_argument("--stdin-burst", action="store_true")
+    args = parser.parse_args()
+
+    image_bytes = sys.stdin.buffer.read() if args.stdin else None
+    frames = None
+    if args.stdin_burst:
+        frames = [base64.b64decode(line) for line in sys.stdin.buffer.read().split()]
+    verify_voter(args.voter_id, image_bytes=image_bytes, frames=frames)
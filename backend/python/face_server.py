@@ -0,0 +1,301 @@
+import argparse
+import base64
+import json
+import os
+import socketserver
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# -------------------------------------------------------------
+# LONG-LIVED FACE VERIFICATION SERVICE
+#
+# Each worker process imports face_recog (and therefore dlib and its
+# models) exactly once, so a verification only pays for detection,
+# encoding and the distance computation.
+#
+# Protocol: one JSON object per line in, one JSON object per line out.
+#   request  -> {"id": 1, "voterId": "a@b.com", "image": "<base64 jpeg>",
+#                "tolerance": 0.5}
+#   response -> {"id": 1, "success": true, "distance": 0.31, "reason": "Match"}
+# Without "image" the login frame is read from temp/<voterId>.jpg.
+# "images": [<base64 jpeg>, ...] instead of "image" verifies a burst of
+# frames, stopping at the first clear match (see match_voter_burst); the
+# response then also carries frames_used / frames_total.
+# "op": "ping" can be sent to check that the workers are warm,
+# "op": "dedup" with a voterId lists other voters with a matching face,
+# "op": "metrics" returns the batching scheduler's counters, the
+# embedding cache hit/miss/eviction counters and the per-stage timing
+# histograms, and "op": "prometheus" returns the verification histograms
+# and counters as Prometheus text ({"id": 1, "text": "..."}).
+#
+# With --batch-window-ms > 0, verifications go through the
+# micro-batching VerificationScheduler instead of one pool task each.
+# -------------------------------------------------------------
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = int(os.environ.get("FACE_SERVER_PORT", "5055"))
+DEFAULT_TOLERANCE = 0.5
+
+
+def _warm_worker():
+    # Loads cv2, face_recognition and the dlib models once per worker
+    # process instead of once per login. face_recog binds
+    # face_recognition lazily, so it is forced here, along with the
+    # FACE_ENCODER backend's model.
+    import face_recog
+    from lazy_imports import ensure_loaded
+    ensure_loaded(face_recog.face_recognition)
+    face_recog.ENCODER.warm()
+
+
+def _worker_stats():
+    import face_metrics
+    from embedding_store import embedding_cache
+    return os.getpid(), embedding_cache.stats(), face_metrics.snapshot()["counters"]
+
+
+def _run_verification(voter_id, tolerance, image_bytes=None):
+    import face_recog
+    return face_recog.match_voter(voter_id, tolerance, image_bytes)
+
+
+def _run_burst(voter_id, tolerance, frames):
+    import face_recog
+    return face_recog.match_voter_burst(voter_id, frames, tolerance)
+
+
+class FaceService:
+    def __init__(self, workers=None, batch_window_ms=0, max_batch=32):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                        initializer=_warm_worker)
+        self.scheduler = None
+        if batch_window_ms > 0:
+            from verify_scheduler import VerificationScheduler
+            self.scheduler = VerificationScheduler(self.pool, self.workers,
+                                                   batch_window_ms, max_batch)
+        self._index = None
+        self._index_rows = None
+        self._index_lock = threading.Lock()
+
+    def warm_up(self):
+        # Force every worker to start and import the models before we
+        # accept traffic, so the first logins are not cold.
+        futures = [self.pool.submit(_warm_worker) for _ in range(self.workers)]
+        for f in futures:
+            f.result()
+
+    def handle(self, request):
+        req_id = request.get("id")
+        op = request.get("op", "verify")
+
+        if op == "ping":
+            return {"id": req_id, "ok": True, "workers": self.workers}
+
+        if op == "dedup":
+            return self._dedup(request)
+
+        if op == "metrics":
+            return {"id": req_id, "metrics": self.metrics()}
+
+        if op == "prometheus":
+            import face_metrics
+            return {"id": req_id, "text": face_metrics.prometheus_text()}
+
+        if op != "verify":
+            return {"id": req_id, "success": False, "distance": None,
+                    "reason": f"Unknown op: {op}"}
+
+        voter_id = request.get("voterId")
+        if not voter_id:
+            return {"id": req_id, "success": False, "distance": None,
+                    "reason": "voterId required"}
+
+        tolerance = float(request.get("tolerance", DEFAULT_TOLERANCE))
+
+        image_bytes = frames = None
+        try:
+            if request.get("images"):
+                frames = [base64.b64decode(image, validate=True)
+                          for image in request["images"]]
+            elif request.get("image"):
+                image_bytes = base64.b64decode(request["image"], validate=True)
+        except (TypeError, ValueError):
+            return {"id": req_id, "success": False, "distance": None,
+                    "reason": "Invalid base64 image"}
+
+        try:
+            if frames is not None:
+                # A burst is one pool task: its frames are pipelined inside
+                # the worker and the burst stops early, which the batching
+                # scheduler's one-frame tasks cannot express
+                import face_recog
+                result = self.pool.submit(_run_burst, voter_id, tolerance, frames).result()
+                face_recog.record_verification(voter_id, result)
+            elif self.scheduler:
+                result = self.scheduler.submit(voter_id, image_bytes, tolerance).result()
+            else:
+                import face_recog
+                result = self.pool.submit(_run_verification, voter_id, tolerance,
+                                          image_bytes).result()
+                # Recorded here rather than in the worker so the histograms
+                # live in the process that serves "metrics" / "prometheus".
+                face_recog.record_verification(voter_id, result)
+        except Exception as e:
+            result = {"success": False, "distance": None, "reason": f"Worker error: {e}"}
+
+        result["id"] = req_id
+        return result
+
+    def metrics(self):
+        import face_metrics
+        from embedding_store import embedding_cache
+
+        # Each worker has its own embedding cache and its own counters
+        # (e.g. detection misses). Sample as many tasks as there are
+        # workers and keep one report per pid; a busy worker may be
+        # missed, so worker figures are best effort.
+        samples = [self.pool.submit(_worker_stats) for _ in range(self.workers)]
+        workers = {str(pid): (cache, counters)
+                   for pid, cache, counters in (f.result() for f in samples)}
+
+        return {
+            "scheduler": self.scheduler.metrics() if self.scheduler else None,
+            "embedding_cache": {
+                "server": embedding_cache.stats(),
+                "workers": {pid: cache for pid, (cache, _) in workers.items()},
+            },
+            "pipeline": face_metrics.snapshot(),
+            "worker_counters": {pid: counters for pid, (_, counters) in workers.items()},
+        }
+
+    def _dedup(self, request):
+        from embedding_store import get_store
+        from face_index import DUPLICATE_TOLERANCE, find_duplicates, load_or_build_index
+
+        req_id = request.get("id")
+        voter_id = request.get("voterId")
+        tolerance = float(request.get("tolerance", DUPLICATE_TOLERANCE))
+
+        with self._index_lock:
+            try:
+                store = get_store("face_recognition")
+                # Only re-sync when enrollments, removals or a compaction
+                # changed the store; a sync walks the whole voter table.
+                state = (store.rows, store.generation, len(store))
+                if self._index is None:
+                    self._index = load_or_build_index()
+                    self._index_rows = state
+                elif state != self._index_rows:
+                    self._index.sync_from_store(store)
+                    self._index_rows = state
+
+                dups = find_duplicates(self._index, voter_id, tolerance, store=store)
+            except (KeyError, ValueError) as e:
+                return {"id": req_id, "duplicates": [], "error": str(e)}
+
+        return {
+            "id": req_id,
+            "duplicates": [{"voterId": v, "distance": d} for v, d in dups],
+        }
+
+    def handle_line(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {"id": None, "success": False, "distance": None,
+                    "reason": "Invalid JSON"}
+        return self.handle(request)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+
+
+# -------------------------------------------------------------
+# TCP TRANSPORT
+# -------------------------------------------------------------
+class _LineHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode("utf-8").strip()
+            if not line:
+                continue
+            response = self.server.service.handle_line(line)
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _ThreadedServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve_tcp(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    with _ThreadedServer((host, port), _LineHandler) as server:
+        server.service = service
+        print(f"[INFO] Face server listening on {host}:{port} "
+              f"with {service.workers} workers", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("[INFO] Face server stopped.")
+
+
+# -------------------------------------------------------------
+# STDIN / STDOUT TRANSPORT
+# -------------------------------------------------------------
+def serve_stdio(service):
+    write_lock = threading.Lock()
+
+    def respond(line):
+        response = service.handle_line(line)
+        with write_lock:
+            sys.stdout.write(json.dumps(response) + "\n")
+            sys.stdout.flush()
+
+    # Requests are answered as soon as they finish, so callers must match
+    # responses by "id" rather than by order.
+    threads = []
+    for raw in sys.stdin:
+        line = raw.strip()
+        if not line:
+            continue
+        t = threading.Thread(target=respond, args=(line,), daemon=True)
+        t.start()
+        threads.append(t)
+
+    for t in threads:
+        t.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Persistent face verification service")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("--batch-window-ms", type=float, default=0,
+                        help="Micro-batch verifications over this window (0 = off)")
+    parser.add_argument("--max-batch", type=int, default=32,
+                        help="Dispatch a batch early once this many requests wait")
+    parser.add_argument("--stdio", action="store_true",
+                        help="Serve JSON lines on stdin/stdout instead of TCP")
+    args = parser.parse_args(argv)
+
+    service = FaceService(workers=args.workers,
+                          batch_window_ms=args.batch_window_ms,
+                          max_batch=args.max_batch)
+    service.warm_up()
+
+    try:
+        if args.stdio:
+            serve_stdio(service)
+        else:
+            serve_tcp(service, args.host, args.port)
+    finally:
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
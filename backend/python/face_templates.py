@@ -0,0 +1,149 @@
+import os
+import numpy as np
+
+from embedding_cache import file_version
+from embedding_store import embedding_cache
+
+# -------------------------------------------------------------
+# PROTOTYPE TEMPLATES
+#
+# A voter's 10-20 dlib encodings are mostly near-duplicates. At
+# enrollment they can be compressed into k <= MAX_PROTOTYPES medoids
+# (actual enrolled encodings), each with the radius of the encodings it
+# stands for, saved next to the full template as
+#
+#   encodings/<voter>_face_recognition_proto.npy   (k, dim + 2) float32
+#       [:, :dim]  medoid encodings
+#       [:, dim]   radius: max distance from the medoid to its members
+#       [:, dim+1] number of enrolled encodings the medoid stands for
+#
+# By the triangle inequality every member of a cluster lies within
+# [d - r, d + r] of the login face, where d is the login's distance to
+# the medoid. So with only k distances:
+#   accept  if some medoid is closer than tolerance (it is a real row,
+#           so the full scan would have accepted too)
+#   reject  if d - r >= tolerance for every cluster
+# and only faces that land in between fall back to the full scan. The
+# accept/reject decision is therefore always the full-scan decision; on
+# an early accept the reported distance is the medoid's, which is an
+# upper bound of the full-scan minimum.
+# -------------------------------------------------------------
+
+MAX_PROTOTYPES = 3
+# Clusters are added until every encoding is this close to its medoid
+COVER_RADIUS = 0.25
+PROTO_SUFFIX = "face_recognition_proto"
+
+
+def _pairwise(vectors):
+    sq = np.einsum("ij,ij->i", vectors, vectors)
+    d2 = sq[:, None] + sq[None, :] - 2.0 * vectors @ vectors.T
+    return np.sqrt(np.maximum(d2, 0.0))
+
+
+def k_medoids(vectors, k, iters=10):
+    """
+    Small PAM-style k-medoids on an (n, dim) array. Returns
+    (medoid_indices, labels). Seeds with farthest-point selection so the
+    result is deterministic.
+    """
+    dist = _pairwise(vectors.astype(np.float64))
+    n = len(vectors)
+    k = min(k, n)
+
+    medoids = [int(np.argmin(dist.sum(axis=1)))]
+    while len(medoids) < k:
+        medoids.append(int(np.argmax(dist[:, medoids].min(axis=1))))
+    medoids = np.array(medoids)
+
+    for _ in range(iters):
+        labels = np.argmin(dist[:, medoids], axis=1)
+        updated = medoids.copy()
+        for c in range(k):
+            members = np.flatnonzero(labels == c)
+            within = dist[np.ix_(members, members)].sum(axis=1)
+            updated[c] = members[np.argmin(within)]
+        if np.array_equal(updated, medoids):
+            break
+        medoids = updated
+
+    return medoids, np.argmin(dist[:, medoids], axis=1)
+
+
+def compress_template(vectors, max_k=MAX_PROTOTYPES, cover=COVER_RADIUS):
+    """
+    Compresses an (n, dim) template into a (k, dim + 2) prototype array
+    (see the layout above), using the smallest k <= max_k whose clusters
+    all fit within `cover`, or max_k if none does.
+    """
+    vectors = np.asarray(vectors, dtype=np.float64)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+
+    for k in range(1, min(max_k, len(vectors)) + 1):
+        medoids, labels = k_medoids(vectors, k)
+        radii = np.array([
+            np.linalg.norm(vectors[labels == c] - vectors[m], axis=1).max()
+            for c, m in enumerate(medoids)
+        ])
+        if radii.max() <= cover:
+            break
+
+    counts = np.bincount(labels, minlength=len(medoids))
+    return np.column_stack([vectors[medoids], radii, counts]).astype(np.float32)
+
+
+def decide(template, login, tolerance):
+    """
+    Early decision from prototypes only. Returns (decision, distance)
+    where decision is True (accept), False (reject) or None (undecided:
+    run the full scan). `distance` is the best medoid distance.
+    """
+    dim = template.shape[1] - 2
+    diff = template[:, :dim] - login
+    d = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+    best = float(d.min())
+
+    if best < tolerance:
+        return True, best
+    # float32 storage: keep a small slack so rounding never flips a reject
+    if float((d - template[:, dim]).min()) - 1e-4 >= tolerance:
+        return False, best
+    return None, best
+
+
+def proto_path(voter_id, enc_dir="encodings"):
+    return os.path.join(enc_dir, f"{voter_id}_{PROTO_SUFFIX}.npy")
+
+
+def save_prototypes(voter_id, fr_encodings, enc_path="encodings"):
+    template = compress_template(fr_encodings)
+    np.save(proto_path(voter_id, enc_path), template)
+    return template
+
+
+def remove_prototypes(voter_id, enc_path="encodings"):
+    """A stale prototype file must not outlive a re-enrollment without one."""
+    try:
+        os.remove(proto_path(voter_id, enc_path))
+    except FileNotFoundError:
+        pass
+
+
+def load_prototypes(voter_id, enc_dir="encodings"):
+    """The voter's prototype template, or None. Cached like embeddings."""
+    key = (PROTO_SUFFIX, voter_id)
+    path = proto_path(voter_id, enc_dir)
+    version = file_version(path)
+    if version is None:
+        embedding_cache.invalidate(key)
+        return None
+
+    cached = embedding_cache.get(key, version)
+    if cached is not None:
+        return cached
+
+    template = np.load(path)
+    template.flags.writeable = False
+    embedding_cache.put(key, template, version)
+    return template
@@ -1,174 +1,441 @@
 import cv2
-import face_recognition
+import hashlib
 import os
 import sys
 import numpy as np
-from sklearn.preprocessing import normalize
+
+from embedding_store import get_store, invalidate_voter
+from encoder_backends import get_backend
+from encoding_cache import EncodingCache
+from face_metrics import incr, record, stage, to_ms
+from face_templates import remove_prototypes, save_prototypes
+from frame import Frame, scale_boxes
+from lazy_imports import lazy
+from quantized_store import MODES, QUANT_MODE, get_view
+
+# Loaded on the first detection (see lazy_imports.py)
+face_recognition = lazy("face_recognition")
+
+
+def l2_normalize(vector):
+    """
+    sklearn.preprocessing.normalize for one vector, without importing
+    scikit-learn: same row-norm einsum, zero vectors left unchanged.
+    """
+    row = np.asarray(vector)[None, :]
+    if row.dtype not in (np.float32, np.float64):
+        row = row.astype(np.float64)
+    norm = np.sqrt(np.einsum("ij,ij->i", row, row))
+    norm[norm == 0.0] = 1.0
+    return (row / norm[:, None])[0]
 
 # -------------------------------------------------------------
 # SIMPLE ROBUST FACE ENCODER (HOG + LBP Feature Vector)
 # -------------------------------------------------------------
+HOG_CELL_SIZE = 16
+HOG_BINS = 9
+LBP_STEP = 8
+LBP_BINS = 256
+EXTRACT_CHUNK = 4  # images per pass in extract_batch
+
+# Same edges np.histogram(bins=9, range=(-pi, pi)) builds internally, so
+# the bin lookup below lands every angle in exactly the same bin.
+_HOG_EDGES = np.histogram_bin_edges([], bins=HOG_BINS, range=(-np.pi, np.pi))
+_HOG_SCALE = HOG_BINS / (_HOG_EDGES[-1] - _HOG_EDGES[0])
+
+# Neighbour offsets in the bit order of the original per-pixel LBP loop.
+_LBP_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1))
+
+
+def _sobel(gray_stack):
+    """
+    3x3 Sobel x / y derivatives of an (N, H, W) uint8 stack as float64,
+    equal to cv2.Sobel(img, cv2.CV_64F, ..., ksize=3) per image: the
+    border is reflected the same way (BORDER_REFLECT_101, numpy's
+    "reflect") and the integer sums convert to float64 exactly.
+    """
+    padded = np.pad(gray_stack.astype(np.int16), ((0, 0), (1, 1), (1, 1)), mode="reflect")
+    dx = padded[:, :, 2:] - padded[:, :, :-2]
+    gx = dx[:, :-2] + 2 * dx[:, 1:-1] + dx[:, 2:]
+    sy = padded[:, :, :-2] + 2 * padded[:, :, 1:-1] + padded[:, :, 2:]
+    gy = sy[:, 2:] - sy[:, :-2]
+    return gx.astype(np.float64), gy.astype(np.float64)
+
+
+def _hog_histograms(gray_stack):
+    """
+    Magnitude-weighted orientation histograms for every 16x16 cell of an
+    (N, H, W) uint8 stack, returned as (N, cells * 9) float64.
+
+    All cells of all images are binned with a single bincount. Within a
+    (image, cell, bin) slot the weights are summed in row-major order of
+    the cell, which is the order np.histogram used per cell, so the sums
+    are bit-identical to the old loop.
+    """
+    n, h, w = gray_stack.shape
+    gx, gy = _sobel(gray_stack)
+    magnitude = np.sqrt(gx**2 + gy**2)
+    angle = np.arctan2(gy, gx)
+
+    # Estimate the bin arithmetically, then step it onto the right side
+    # of the actual edges (cheaper than a searchsorted per pixel)
+    bins = ((angle - _HOG_EDGES[0]) * _HOG_SCALE).astype(np.intp)
+    np.clip(bins, 0, HOG_BINS - 1, out=bins)  # angle == pi goes in the last bin
+    bins -= angle < _HOG_EDGES[bins]
+    bins += (angle >= _HOG_EDGES[bins + 1]) & (bins < HOG_BINS - 1)
+
+    cells_y = -(-h // HOG_CELL_SIZE)
+    cells_x = -(-w // HOG_CELL_SIZE)
+    n_cells = cells_y * cells_x
+    cell_ids = ((np.arange(h) // HOG_CELL_SIZE)[:, None] * cells_x
+                + (np.arange(w) // HOG_CELL_SIZE)[None, :])
+
+    keys = (np.arange(n)[:, None, None] * n_cells + cell_ids) * HOG_BINS + bins
+    hist = np.bincount(keys.ravel(), weights=magnitude.ravel(),
+                       minlength=n * n_cells * HOG_BINS)
+    return hist.reshape(n, n_cells * HOG_BINS)
+
+
+def _lbp_histograms(gray_stack):
+    """
+    256-bin histogram of 8-neighbour LBP codes sampled every 8 pixels,
+    for an (N, H, W) uint8 stack. Returns (N, 256) int64 counts.
+    """
+    n, h, w = gray_stack.shape
+    center = gray_stack[:, 1:h - 1:LBP_STEP, 1:w - 1:LBP_STEP]
+
+    codes = np.zeros(center.shape, dtype=np.int64)
+    for bit, (dy, dx) in enumerate(_LBP_OFFSETS):
+        neighbor = gray_stack[:, 1 + dy:h - 1 + dy:LBP_STEP, 1 + dx:w - 1 + dx:LBP_STEP]
+        codes |= (neighbor >= center).astype(np.int64) << bit
+
+    keys = np.arange(n)[:, None, None] * LBP_BINS + codes
+    return np.bincount(keys.ravel(), minlength=n * LBP_BINS).reshape(n, LBP_BINS)
+
+
+def _gray_stats(gray_stack):
+    """
+    [mean, std, median, var] of every image of an (N, H, W) uint8 stack,
+    bit-identical to np.mean / np.std / np.median / np.var per image.
+    Each row is reduced on its own, in the same pairwise order; std is
+    sqrt(var) as np.std computes it, and the median is read off a
+    256-bin histogram of the image instead of a partition.
+    """
+    n = len(gray_stack)
+    flat = gray_stack.reshape(n, -1)
+    size = flat.shape[1]
+
+    var = flat.var(axis=1)
+    counts = np.bincount((np.arange(n)[:, None] * 256 + flat).ravel(),
+                         minlength=n * 256).reshape(n, 256)
+    cumulative = counts.cumsum(axis=1)
+    lower = (cumulative > (size - 1) // 2).argmax(axis=1)
+    upper = (cumulative > size // 2).argmax(axis=1)
+
+    return np.column_stack([flat.mean(axis=1), np.sqrt(var), (lower + upper) / 2.0, var])
+
+
 class RobustFaceEncoder:
     def extract_face_features(self, image):
         # Convert to grayscale
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return self.extract_from_gray(gray)
 
+    def extract_from_gray(self, gray):
         # Resize to standard size
         resized = cv2.resize(gray, (128, 128))
 
         return self._combine_features(resized)
 
+    def extract_batch(self, gray_stack):
+        """
+        Feature vectors for an (N, 128, 128) uint8 stack of resized
+        grayscale faces, returned as an (N, 836) float32 matrix.
+        """
+        gray_stack = np.asarray(gray_stack, dtype=np.uint8)
+        if gray_stack.ndim == 2:
+            gray_stack = gray_stack[None]
+
+        # A few images per pass: the float64 gradient planes of a large
+        # stack fall out of cache, which costs more than the per-call
+        # overhead batching saves
+        parts = []
+        for s in range(0, len(gray_stack), EXTRACT_CHUNK):
+            chunk = gray_stack[s:s + EXTRACT_CHUNK]
+            parts.append(np.hstack([
+                _hog_histograms(chunk),
+                _lbp_histograms(chunk).astype(np.float64),
+                _gray_stats(chunk),
+            ]))
+        return np.concatenate(parts).astype(np.float32)
+
     def _combine_features(self, gray):
-        features = []
-
-        # HOG-like gradients
-        gx = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-        gy = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-        magnitude = np.sqrt(gx**2 + gy**2)
-        angle = np.arctan2(gy, gx)
-
-        cell_size = 16
-        for i in range(0, gray.shape[0], cell_size):
-            for j in range(0, gray.shape[1], cell_size):
-                mag_cell = magnitude[i:i+cell_size, j:j+cell_size]
-                ang_cell = angle[i:i+cell_size, j:j+cell_size]
-                hist, _ = np.histogram(
-                    ang_cell,
-                    bins=9,
-                    range=(-np.pi, np.pi),
-                    weights=mag_cell
-                )
-                features.extend(hist)
-
-        # LBP
-        lbp_vals = []
-        for i in range(1, gray.shape[0]-1, 8):
-            for j in range(1, gray.shape[1]-1, 8):
-                center = gray[i, j]
-                neighbors = [
-                    gray[i-1, j-1], gray[i-1, j], gray[i-1, j+1],
-                    gray[i, j+1], gray[i+1, j+1], gray[i+1, j],
-                    gray[i+1, j-1], gray[i, j-1]
-                ]
-                val = 0
-                for idx, n in enumerate(neighbors):
-                    if n >= center:
-                        val |= (1 << idx)
-                lbp_vals.append(val)
-
-        lbp_hist, _ = np.histogram(lbp_vals, bins=256, range=(0, 256))
-        features.extend(lbp_hist.tolist())
-
-        # Stats
-        features.extend([
-            np.mean(gray),
-            np.std(gray),
-            np.median(gray),
-            np.var(gray),
-        ])
-
-        return np.array(features, dtype=np.float32)
+        # HOG-like gradients, LBP histogram and global stats
+        return self.extract_batch(gray[None])[0]
 
 
 # -------------------------------------------------------------
 # SAFE IMAGE LOAD
 # -------------------------------------------------------------
 def load_clean_image(img_path):
-    img_bgr = cv2.imread(img_path)
-
-    if img_bgr is None:
+    """
+    (bgr, rgb) from a single decode. bgr is one contiguous copy of the
+    channel-reversed rgb buffer: cv2 functions cannot use a negative
+    stride view and would silently copy it on every call instead.
+    Callers that only need RGB or grayscale should use Frame directly.
+    """
+    frame = Frame.from_path(img_path)
+    if frame is None:
         return None, None
+    return np.ascontiguousarray(frame.bgr), frame.rgb
+
 
-    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-    return img_bgr, img_rgb.astype(np.uint8)
+def _read_bytes(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
 
 
 # -------------------------------------------------------------
 # MAIN ENCODER
 # -------------------------------------------------------------
-def encode_faces(voter_id):
-    dataset_path = os.path.join("dataset", voter_id)
-    enc_path = "encodings"
+STAGES = ("hash", "decode", "detect", "dlib_encode", "robust_encode")
 
-    if not os.path.exists(dataset_path):
-        print(f"❌ No dataset found for voter ID: {voter_id}")
-        return
+# Detect on a JPEG decoded at 1/2, 1/4 or 1/8 size (1 = full size). The
+# dlib encoding always runs on the full-resolution frame.
+DETECT_REDUCTION = int(os.environ.get("FACE_ENROLL_DETECT_REDUCTION", "1"))
 
-    os.makedirs(enc_path, exist_ok=True)
 
-    robust_encoder = RobustFaceEncoder()
-    fr_encodings = []
-    robust_encodings = []
-
-    print(f"[INFO] Encoding images for: {voter_id}")
+def list_voter_images(voter_id):
+    dataset_path = os.path.join("dataset", voter_id)
+    if not os.path.exists(dataset_path):
+        return None
 
-    image_files = sorted([
+    return sorted([
         f for f in os.listdir(dataset_path)
         if f.lower().endswith((".jpg", ".jpeg", ".png"))
     ])
 
-    if not image_files:
-        print("❌ No images found.")
-        return
 
-    success_count = 0
+def encode_voter_images(voter_id, image_files, robust_encoder, log=print, timings=None,
+                        cache=None, encoder=None):
+    """
+    Runs both encoders over a voter's images.
+
+    Returns (fr_encodings, robust_encodings, success_count). When a
+    `timings` dict is given, the seconds spent in each of STAGES are
+    added to it. With an EncodingCache, images whose content hash is
+    already cached are not decoded or encoded again, and entries for
+    images no longer present are evicted; cache.hits / misses / evicted
+    count what happened.
+
+    The primary ("fr") vectors come from `encoder` (default: the
+    FACE_ENCODER backend, see encoder_backends.py); detected faces are
+    queued and encoded batch_size at a time.
+    """
+    if timings is None:
+        timings = {}
+    for name in STAGES:
+        timings.setdefault(name, 0.0)
+
+    encoder = encoder or get_backend()
+    # The cache holds 128-d dlib vectors only
+    if encoder.kind != "face_recognition":
+        cache = None
+
+    dataset_path = os.path.join("dataset", voter_id)
+    # One slot per image in file order: [file, fr_vec, robust_vec, digest, cacheable]
+    slots = []
+    pending = []  # (slot, rgb, box) waiting for a batch encode
+
+    digests = []
+
+    def flush():
+        if not pending:
+            return
+        try:
+            with stage(timings, "dlib_encode"):
+                vectors = encoder.encode([rgb for _, rgb, _ in pending],
+                                         [box for _, _, box in pending])
+            for (slot, _, _), vec in zip(pending, vectors):
+                slot[1] = vec
+                log(f"✅ {encoder.name} encoded {slot[0]}")
+        except Exception as e:
+            incr("encode_error_dlib", len(pending))
+            log(f"⚠️ {encoder.name} encoder error: {e}")
+            for slot, _, _ in pending:
+                slot[4] = False
+        pending.clear()
 
     for file in image_files:
         path = os.path.join(dataset_path, file)
-        print(f"\n--- Processing {file} ---")
-
-        bgr, rgb = load_clean_image(path)
-        if rgb is None:
-            print(f"❌ Cannot load {file}")
+        log(f"\n--- Processing {file} ---")
+
+        # The file is read once: the same bytes are hashed and decoded
+        data = digest = None
+        if cache is not None:
+            with stage(timings, "hash"):
+                data = _read_bytes(path)
+                digest = hashlib.sha256(data or b"").hexdigest()
+            digests.append(digest)
+
+            hit = cache.get(digest)
+            if hit is not None:
+                cache.hits += 1
+                slots.append([file, hit[0], hit[1], None, False])
+                log(f"♻️ Cached encodings reused for {file}")
+                continue
+            cache.misses += 1
+
+        with stage(timings, "decode"):
+            frame = Frame.from_bytes(data) if data is not None else Frame.from_path(path)
+        if frame is None:
+            incr("encode_decode_failed")
+            log(f"❌ Cannot load {file}")
             continue
 
-        # Dlib / face_recognition encoding
-        try:
-            img_rgb = np.ascontiguousarray(rgb)
+        slot = [file, None, None, digest, True]
+        slots.append(slot)
 
-            boxes = face_recognition.face_locations(img_rgb, model="hog")
+        # Detection now, primary encoding once a batch is full
+        try:
+            with stage(timings, "detect"):
+                if DETECT_REDUCTION > 1:
+                    small, scale = frame.reduced(DETECT_REDUCTION)
+                    boxes = scale_boxes(face_recognition.face_locations(small, model="hog"),
+                                        scale, frame.shape)
+                else:
+                    boxes = face_recognition.face_locations(frame.rgb, model="hog")
 
             if boxes:
-                enc = face_recognition.face_encodings(img_rgb, boxes)
-                if enc:
-                    fr_encodings.append(enc[0])
-                    print(f"✅ face_recognition encoded {file}")
-                    success_count += 1
+                pending.append((slot, frame.rgb, boxes[0]))
             else:
-                print("⚠️ No face detected (face_recognition)")
+                incr("encode_no_face_dlib")
+                log("⚠️ No face detected (face_recognition)")
 
         except Exception as e:
-            print(f"⚠️ face_recognition error: {e}")
+            slot[4] = False
+            incr("encode_error_dlib")
+            log(f"⚠️ face_recognition error: {e}")
 
         # Robust encoder
         try:
-            feat = robust_encoder.extract_face_features(bgr)
+            with stage(timings, "robust_encode"):
+                feat = robust_encoder.extract_from_gray(frame.gray)
             if feat is not None:
-                robust_encodings.append(normalize([feat])[0])
-                print(f"✅ Robust encoder processed {file}")
+                slot[2] = l2_normalize(feat)
+                log(f"✅ Robust encoder processed {file}")
             else:
-                print("⚠️ Robust encoder found no face")
+                incr("encode_no_face_robust")
+                log("⚠️ Robust encoder found no face")
         except Exception as e:
-            print(f"⚠️ Robust encoder error: {e}")
+            slot[4] = False
+            incr("encode_error_robust")
+            log(f"⚠️ Robust encoder error: {e}")
 
-    saved = []
+        if len(pending) >= encoder.batch_size:
+            flush()
+
+    flush()
+
+    fr_encodings = [fr_vec for _, fr_vec, _, _, _ in slots if fr_vec is not None]
+    robust_encodings = [robust_vec for _, _, robust_vec, _, _ in slots if robust_vec is not None]
+
+    # Errors may be transient, so only clean results are cached
+    if cache is not None:
+        for _, fr_vec, robust_vec, digest, cacheable in slots:
+            if cacheable:
+                cache.put(digest, fr_vec, robust_vec)
+        cache.evicted += cache.retain(digests)
 
-    if fr_encodings:
-        np.save(f"{enc_path}/{voter_id}_face_recognition.npy", np.array(fr_encodings))
-        saved.append(f"{voter_id}_face_recognition.npy")
+    return fr_encodings, robust_encodings, len(fr_encodings)
 
-    if robust_encodings:
+
+def save_encodings(voter_id, fr_encodings, robust_encodings, enc_path="encodings",
+                   prototypes=False, kind=None):
+    """
+    With `prototypes`, the dlib template is also compressed into a few
+    medoids (see face_templates.py) that verification checks first.
+
+    The primary vectors are saved under `kind` (default: the FACE_ENCODER
+    backend's store, "face_recognition" for dlib).
+    """
+    kind = kind or get_backend().kind
+    os.makedirs(enc_path, exist_ok=True)
+    saved = []
+
+    if len(fr_encodings):
+        np.save(f"{enc_path}/{voter_id}_{kind}.npy", np.array(fr_encodings))
+        get_store(kind).append(voter_id, fr_encodings)
+        saved.append(f"{voter_id}_{kind}.npy")
+
+        # Prototypes are only built for the dlib template
+        if kind == "face_recognition" and prototypes:
+            template = save_prototypes(voter_id, fr_encodings, enc_path)
+            saved.append(f"{voter_id}_face_recognition_proto.npy ({len(template)} prototypes)")
+        elif kind == "face_recognition":
+            remove_prototypes(voter_id, enc_path)
+
+    # With FACE_ENCODER=robust the primary (face crop) vectors already
+    # fill the robust store; the whole-frame ones must not be mixed in
+    if len(robust_encodings) and kind != "robust":
         np.save(f"{enc_path}/{voter_id}_robust.npy", np.array(robust_encodings))
+        get_store("robust").append(voter_id, robust_encodings)
         saved.append(f"{voter_id}_robust.npy")
 
+    if saved:
+        invalidate_voter(voter_id)
+        # Quantize the new rows now rather than on the first login
+        if QUANT_MODE in MODES:
+            for name in {kind, "robust"}:
+                get_view(name, QUANT_MODE).sync()
+
+    return saved
+
+
+def encode_faces(voter_id, use_cache=True, prototypes=False):
+    image_files = list_voter_images(voter_id)
+
+    if image_files is None:
+        print(f"❌ No dataset found for voter ID: {voter_id}")
+        return
+
+    print(f"[INFO] Encoding images for: {voter_id}")
+
+    if not image_files:
+        print("❌ No images found.")
+        return
+
+    cache = EncodingCache(voter_id) if use_cache else None
+    timings = {}
+
+    fr_encodings, robust_encodings, success_count = encode_voter_images(
+        voter_id, image_files, RobustFaceEncoder(), timings=timings, cache=cache
+    )
+
+    saved = save_encodings(voter_id, fr_encodings, robust_encodings, prototypes=prototypes)
+    if cache is not None:
+        cache.save()
+
+    record("encode", {"voter_id": voter_id, "images": len(image_files),
+                      "success_count": success_count,
+                      "outcome": "success" if saved else "no_encodings"},
+           to_ms(timings))
+
     print("\n=== SUMMARY ===")
     print(f"Images processed   : {len(image_files)}")
     print(f"Total success      : {success_count}")
     print(f"FR encodings       : {len(fr_encodings)}")
     print(f"Robust encodings   : {len(robust_encodings)}")
     print(f"Saved files        : {saved}")
+    if cache is not None:
+        print(f"Cache hit/miss/evict: {cache.hits}/{cache.misses}/{cache.evicted}")
+    print(f"Stage timings (ms) : {to_ms(timings)}")
 
 
 if __name__ == "__main__":
     voter_id = sys.argv[1]
-    encode_faces(voter_id)
+    encode_faces(voter_id, use_cache="--no-cache" not in sys.argv[2:],
+                 prototypes="--prototypes" in sys.argv[2:])
@@ -0,0 +1,101 @@
+import cv2
+import numpy as np
+
+# -------------------------------------------------------------
+# SINGLE-DECODE FRAMES
+#
+# An image is read from disk (or taken from memory) once and decoded
+# once, straight into RGB. That one buffer is what dlib wants; the BGR
+# image OpenCV code expects is a channel-reversed view of it (which cv2
+# copies when it is passed in, so the hot paths use rgb / gray), and the
+# grayscale image for the robust encoder is computed from it once and
+# kept. For detection, JPEGs can also be decoded at 1/2, 1/4 or 1/8
+# resolution from the same bytes (IMREAD_REDUCED_*), which skips most
+# of the IDCT work instead of decoding in full and resizing.
+# -------------------------------------------------------------
+
+# OpenCV >= 4.10 can decode straight to RGB; older builds decode BGR and
+# the channels are swapped in place, still without a second buffer.
+_RGB_FLAG = getattr(cv2, "IMREAD_COLOR_RGB", None)
+_REDUCED = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+            8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def decode_rgb(data, reduction=1):
+    """Decodes encoded image bytes to an RGB uint8 array, or None."""
+    if data is None or len(data) == 0:
+        return None
+    buf = np.frombuffer(data, dtype=np.uint8)
+
+    flags = _REDUCED.get(reduction, cv2.IMREAD_COLOR)
+    if _RGB_FLAG is not None:
+        # IMREAD_COLOR and IMREAD_COLOR_RGB are exclusive
+        img = cv2.imdecode(buf, (flags & ~cv2.IMREAD_COLOR) | _RGB_FLAG)
+    else:
+        img = cv2.imdecode(buf, flags)
+        if img is not None:
+            cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
+    return img
+
+
+class Frame:
+    def __init__(self, data, rgb):
+        self.data = data
+        self.rgb = rgb
+        self._gray = None
+
+    @classmethod
+    def from_bytes(cls, data):
+        rgb = decode_rgb(data)
+        return None if rgb is None else cls(data, rgb)
+
+    @classmethod
+    def from_path(cls, path):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        return cls.from_bytes(data)
+
+    @property
+    def bgr(self):
+        """
+        BGR view of the same buffer. The view itself is free, but cv2
+        copies negative-stride input on every call; pass rgb / gray to
+        cv2 where possible, or np.ascontiguousarray this once.
+        """
+        return self.rgb[:, :, ::-1]
+
+    @property
+    def gray(self):
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.rgb, cv2.COLOR_RGB2GRAY)
+        return self._gray
+
+    @property
+    def shape(self):
+        return self.rgb.shape
+
+    def reduced(self, reduction):
+        """
+        (rgb, scale) at roughly 1/reduction of the full size, decoded
+        again from the original bytes at reduced resolution. `scale`
+        maps coordinates back: full = reduced * scale.
+        """
+        if reduction <= 1 or self.data is None:
+            return self.rgb, 1.0
+        small = decode_rgb(self.data, reduction)
+        if small is None:
+            return self.rgb, 1.0
+        return small, self.rgb.shape[1] / small.shape[1]
+
+
+def scale_boxes(boxes, scale, shape):
+    """Maps (top, right, bottom, left) boxes back to a full-size frame."""
+    h, w = shape[:2]
+    return [
+        (max(0, int(round(top * scale))), min(w, int(round(right * scale))),
+         min(h, int(round(bottom * scale))), max(0, int(round(left * scale))))
+        for top, right, bottom, left in boxes
+    ]
@@ -0,0 +1,151 @@
+import argparse
+import importlib
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+
+# -------------------------------------------------------------
+# LAZY IMPORTS + COLD-START REPORT
+#
+# face_recognition pulls in dlib and loads its models at import time,
+# which dominates a one-shot CLI call (verify_voter via face_recog.py,
+# feature_encoding.py). Entry points bind such modules with lazy(): the
+# name is bound at import, the module only executes on first attribute
+# access, i.e. on the code path that actually detects or encodes. A
+# call that exits early (voter not enrolled, no dataset, frame rejected
+# by the quality gate) never pays for it.
+#
+# A missing optional dependency is reported when it is first used, not
+# when the entry point is imported.
+#
+# tests/test_cold_start.py runs the budget check and the early exits.
+#
+# Report (-X importtime of a fresh interpreter, summarised) and check:
+#   python python/lazy_imports.py face_recog feature_encoding
+#   python python/lazy_imports.py face_recog --budget-ms 400   -> exit 1 if over
+# -------------------------------------------------------------
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class _Missing:
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        raise ModuleNotFoundError(f"No module named {self._name!r}", name=self._name)
+
+
+def lazy(name):
+    """Module `name`, imported on first attribute access."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return _Missing(name)
+
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def is_loaded(name):
+    """True if module `name` has actually executed (not just been bound lazily)."""
+    module = sys.modules.get(name)
+    return module is not None and not isinstance(module, importlib.util._LazyModule)
+
+
+def ensure_loaded(module):
+    """Forces a lazy module to load now (worker warm-up)."""
+    getattr(module, "__file__", None)
+    return module
+
+
+# -------------------------------------------------------------
+# REPORT
+# -------------------------------------------------------------
+def profile_import(module, cwd=None):
+    """
+    Imports `module` in a fresh interpreter with -X importtime. Returns
+    (wall seconds, [(self_us, cumulative_us, depth, name), ...]).
+    """
+    code = f"import sys; sys.path.insert(0, {HERE!r}); import {module}"
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=cwd, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(self_us), int(cum_us), depth, name.strip()))
+    return wall, rows
+
+
+def report(module, top=10, cwd=None):
+    wall, rows = profile_import(module, cwd)
+
+    # -X importtime prints a module after everything it imported, so the
+    # module's own imports are the depth-1 rows since the previous root
+    end = max(i for i, r in enumerate(rows) if r[2] == 0 and r[3] == module)
+    start = end
+    while start > 0 and rows[start - 1][2] > 0:
+        start -= 1
+    direct = sorted((r for r in rows[start:end] if r[2] == 1), key=lambda r: -r[1])
+    heaviest = sorted(rows[start:end + 1], key=lambda r: -r[0])[:top]
+
+    return {
+        "module": module,
+        "process_ms": round(wall * 1000, 1),
+        "import_ms": round(rows[end][1] / 1000, 1),
+        "direct_imports": [(name, round(cum / 1000, 1)) for _, cum, _, name in direct[:top]],
+        "heaviest_self": [(name, round(s / 1000, 1)) for s, _, _, name in heaviest],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import report")
+    parser.add_argument("modules", nargs="*", default=["face_recog", "feature_encoding"])
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=3,
+                        help="Cold starts per module; the median is reported")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Exit with status 1 if a module's median import exceeds this")
+    args = parser.parse_args()
+
+    over = []
+    for module in args.modules:
+        runs = [report(module, args.top) for _ in range(args.runs)]
+        runs.sort(key=lambda r: r["import_ms"])
+        median = runs[len(runs) // 2]
+
+        print(f"\n=== {module}: {median['import_ms']} ms import, "
+              f"{median['process_ms']} ms process (median of {args.runs}) ===")
+        print("  direct imports (cumulative ms):")
+        for name, ms in median["direct_imports"]:
+            print(f"    {ms:8.1f}  {name}")
+        print("  heaviest modules (self ms):")
+        for name, ms in median["heaviest_self"]:
+            print(f"    {ms:8.1f}  {name}")
+
+        if args.budget_ms is not None and median["import_ms"] > args.budget_ms:
+            over.append(f"{module}: {median['import_ms']} ms > {args.budget_ms} ms")
+
+    if over:
+        print("\n❌ Cold start over budget:\n  " + "\n  ".join(over))
+        sys.exit(1)
+    if args.budget_ms is not None:
+        print(f"\n✅ All imports within {args.budget_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+# -------------------------------------------------------------
+# LOGIN FRAME QUALITY GATE
+#
+# Cheap checks run on the decoded login frame before any detection or
+# encoding, so frames that can never match (black, blown out, heavily
+# blurred, thumbnail-sized) are turned away in about a millisecond
+# instead of going through the HOG cascade and the dlib encoder:
+#
+#   too_small       shorter side below MIN_SIDE pixels
+#   too_dark        mean luminance below EXPOSURE_RANGE[0]
+#   too_bright      mean luminance above EXPOSURE_RANGE[1]
+#   low_contrast    luminance std-dev below MIN_CONTRAST (lens covered,
+#                   blank frame)
+#   blurred         Laplacian variance below MIN_SHARPNESS
+#
+# All of them are measured on a grayscale copy downscaled to
+# GATE_MAX_SIDE, so the cost does not grow with the upload size.
+#
+# The face-size check needs a face box, so it runs right after the
+# downscaled detector stage of the cascade (face_recog.locate_face) and
+# before the full-resolution landmarks + encoding:
+#
+#   face_too_small  the detected face's shorter side below MIN_FACE_PX
+#
+# Thresholds are deliberately loose: the gate only rejects frames that
+# would fail anyway. Each rejection is a distinct match_voter reason,
+# so face_metrics counts it as its own outcome (verify_quality_*).
+#
+#   python python/quality_gate.py temp/*.jpg    -> verdict + ms per image
+# -------------------------------------------------------------
+
+GATE_MAX_SIDE = 256
+MIN_SIDE = int(os.environ.get("FACE_GATE_MIN_SIDE", "100"))
+EXPOSURE_RANGE = (40, 225)
+MIN_CONTRAST = 12.0
+MIN_SHARPNESS = float(os.environ.get("FACE_GATE_MIN_SHARPNESS", "8"))
+MIN_FACE_PX = int(os.environ.get("FACE_GATE_MIN_FACE_PX", "48"))
+ENABLED = os.environ.get("FACE_QUALITY_GATE", "1") != "0"
+
+# Rejection code -> match_voter reason
+REASONS = {
+    "too_small": "Login image too small",
+    "too_dark": "Login image too dark",
+    "too_bright": "Login image too bright",
+    "low_contrast": "Login image has no contrast",
+    "blurred": "Login image too blurred",
+    "face_too_small": "Face too small in login image",
+}
+
+
+def measure(rgb):
+    """Resolution, exposure and sharpness of an RGB frame."""
+    h, w = rgb.shape[:2]
+    # Large uploads are strided down to ~2x the gate size first, so the
+    # colour conversion and area resize only ever touch a small image
+    step = max(1, max(h, w) // (2 * GATE_MAX_SIDE))
+    gray = cv2.cvtColor(np.ascontiguousarray(rgb[::step, ::step]), cv2.COLOR_RGB2GRAY)
+    gh, gw = gray.shape
+    scale = GATE_MAX_SIDE / float(max(gh, gw))
+    if scale < 1.0:
+        gray = cv2.resize(gray, (max(1, int(gw * scale)), max(1, int(gh * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    mean, std = cv2.meanStdDev(gray)
+    return {
+        "min_side": min(h, w),
+        "brightness": float(mean[0, 0]),
+        "contrast": float(std[0, 0]),
+        "sharpness": float(cv2.Laplacian(gray, cv2.CV_32F).var()),
+    }
+
+
+def check_frame(rgb):
+    """
+    Returns (code, measurements): `code` is None when the frame passes,
+    else one of the REASONS keys.
+    """
+    if rgb is None or rgb.ndim != 3 or min(rgb.shape[:2]) < MIN_SIDE:
+        return "too_small", {"min_side": None if rgb is None else min(rgb.shape[:2])}
+
+    m = measure(rgb)
+    if m["brightness"] < EXPOSURE_RANGE[0]:
+        return "too_dark", m
+    if m["brightness"] > EXPOSURE_RANGE[1]:
+        return "too_bright", m
+    if m["contrast"] < MIN_CONTRAST:
+        return "low_contrast", m
+    if m["sharpness"] < MIN_SHARPNESS:
+        return "blurred", m
+    return None, m
+
+
+def check_face(box):
+    """'face_too_small' for a (top, right, bottom, left) box below MIN_FACE_PX, else None."""
+    top, right, bottom, left = box
+    if min(bottom - top, right - left) < MIN_FACE_PX:
+        return "face_too_small"
+    return None
+
+
+if __name__ == "__main__":
+    from frame import Frame
+
+    for path in sys.argv[1:]:
+        frame = Frame.from_path(path)
+        start = time.perf_counter()
+        code, m = check_frame(None if frame is None else frame.rgb)
+        ms = (time.perf_counter() - start) * 1000
+        verdict = "ok" if code is None else code
+        print(f"{path}: {verdict} ({ms:.3f} ms)",
+              {k: round(v, 1) for k, v in m.items() if v is not None})
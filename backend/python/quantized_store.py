@@ -0,0 +1,285 @@
+import os
+import sys
+import numpy as np
+
+from embedding_store import DEFAULT_ROOT, ENCODERS, embedding_cache, get_store, store_exists
+
+# -------------------------------------------------------------
+# QUANTIZED EMBEDDING SIDECARS
+#
+# A compact copy of an EmbeddingStore's matrix, kept next to it:
+#
+#   <root>/<name>.float16   (rows, dim) float16
+#   <root>/<name>.int8      (rows, dim + 4) int8: symmetric per-row
+#                           codes, then the row's float32 scale as 4 bytes
+#
+# (<name>.g<N>.float16 / .int8 after the store's N-th compaction.)
+#
+# Rows line up with the .f32 store, so the store's voter index is reused
+# as is. Candidate scoring runs on the compact rows (2x / ~4x fewer bytes
+# to page in and cache), and only the best `rerank` rows are re-scored
+# against the float32 originals. The distance compared with the
+# tolerance is an exact distance to one of those rows: the exact
+# minimum unless quantization pushed the true nearest row out of the
+# best `rerank` (report() counts how often that flips a decision).
+# EMBEDDING_RERANK=0 re-scores all of a voter's rows.
+#
+# The sidecar follows the store: rows appended since the last sync are
+# quantized incrementally, and a compact() of the store (new generation)
+# rebuilds it.
+#
+#   python python/quantized_store.py [int8|float16]   -> build + report
+# -------------------------------------------------------------
+
+QUANT_MODE = os.environ.get("EMBEDDING_QUANT", "none")  # none | float16 | int8
+RERANK = int(os.environ.get("EMBEDDING_RERANK", "2"))
+MODES = ("float16", "int8")
+
+
+def quantize(vectors, mode):
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    if mode == "float16":
+        return vectors.astype(np.float16)
+
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    packed = np.empty((len(vectors), vectors.shape[1] + 4), dtype=np.int8)
+    packed[:, :-4] = codes
+    packed[:, -4:] = scales.astype(np.float32).view(np.int8).reshape(-1, 4)
+    return packed
+
+
+def dequantize(rows):
+    if rows.dtype == np.float16:
+        return rows.astype(np.float32)
+    scales = np.ascontiguousarray(rows[:, -4:]).view(np.float32)
+    return rows[:, :-4].astype(np.float32) * scales
+
+
+def approx_sq_distances(rows, query):
+    """Squared L2 distance from `query` to every quantized row."""
+    query = np.asarray(query, dtype=np.float32)
+    if rows.dtype == np.float16:
+        diff = rows.astype(np.float32) - query
+        return np.einsum("ij,ij->i", diff, diff)
+
+    # |q - s c|^2 = |q|^2 - 2 s (c . q) + s^2 |c|^2, all from the int8 codes
+    codes = rows[:, :-4].astype(np.float32)
+    scales = np.ascontiguousarray(rows[:, -4:]).view(np.float32).ravel()
+    return (query @ query - 2.0 * scales * (codes @ query)
+            + scales ** 2 * np.einsum("ij,ij->i", codes, codes))
+
+
+class QuantizedView:
+    def __init__(self, store, mode):
+        if mode not in MODES:
+            raise ValueError(f"unknown quantization mode: {mode}")
+        self.store = store
+        self.mode = mode
+        self._map = None
+        self._mapped = (0, -1)  # (rows, generation)
+
+    def path_for(self, generation):
+        # One file per store generation, so a rebuild never truncates a
+        # file another process has mapped
+        suffix = f"g{generation}.{self.mode}" if generation else self.mode
+        return os.path.join(self.store.root, f"{self.store.name}.{suffix}")
+
+    @property
+    def path(self):
+        return self.path_for(self.store.generation)
+
+    @property
+    def dtype(self):
+        return np.float16 if self.mode == "float16" else np.int8
+
+    @property
+    def width(self):
+        dim = self.store.dim
+        return dim if self.mode == "float16" else dim + 4
+
+    def sync(self):
+        """Quantizes rows appended to the store since the last sync."""
+        store = self.store
+        rows_key, gen_key = f"{self.mode}_rows", f"{self.mode}_generation"
+
+        # The store's write lock also serialises sidecar writers
+        store._db.execute("BEGIN IMMEDIATE")
+        try:
+            rows, generation = store.rows, store.generation
+            done = store._meta(rows_key)
+            rebuild = store._meta(gen_key, -1) != generation
+            if rebuild or not os.path.exists(self.path):
+                done = 0
+
+            if done < rows:
+                matrix = store.matrix()
+                mode = "r+b" if done and os.path.exists(self.path) else "wb"
+                itemsize = np.dtype(self.dtype).itemsize
+                with open(self.path, mode) as f:
+                    f.seek(done * self.width * itemsize)
+                    for s in range(done, rows, 65536):
+                        f.write(quantize(matrix[s:min(rows, s + 65536)], self.mode).tobytes())
+                    f.truncate(rows * self.width * itemsize)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            store._set_meta(rows_key, rows)
+            store._set_meta(gen_key, generation)
+            store._db.execute("COMMIT")
+        except Exception:
+            store._db.execute("ROLLBACK")
+            raise
+
+        for old in range(generation if rebuild else 0):
+            try:
+                os.remove(self.path_for(old))
+            except OSError:
+                pass  # missing, or still mapped elsewhere (Windows)
+
+    def matrix(self):
+        rows, generation = self.store.snapshot()
+        if rows == 0:
+            return None
+        if (self.store._meta(f"{self.mode}_rows") < rows
+                or self.store._meta(f"{self.mode}_generation", -1) != generation):
+            self.sync()
+        if self._map is None or self._mapped != (rows, generation):
+            self._map = np.memmap(self.path, dtype=self.dtype, mode="r",
+                                  shape=(rows, self.width))
+            self._mapped = (rows, generation)
+        return self._map
+
+    def get(self, voter_id, entry=None):
+        entry = entry or self.store.entry(voter_id)
+        if entry is None:
+            return None
+        start, count = entry[0], entry[1]
+        matrix = self.matrix()
+        return None if matrix is None else matrix[start:start + count]
+
+
+_views = {}
+
+
+def get_view(name, mode, root=DEFAULT_ROOT):
+    key = (name, mode, root)
+    if key not in _views:
+        _views[key] = QuantizedView(get_store(name, root), mode)
+    return _views[key]
+
+
+def load_voter_quantized(voter_id, name="face_recognition", mode=QUANT_MODE):
+    """
+    (rows, entry): the voter's compact rows and the (start, count,
+    generation) store entry they were read for, or None when
+    quantization is off or the voter is not in the store. Pass `entry`
+    on to verify_distance so the re-scored float32 rows are the same
+    ones. Cached in embedding_cache like the float32 embeddings, under a
+    separate key.
+    """
+    if mode not in MODES or not store_exists(name):
+        return None
+    view = get_view(name, mode)
+    key = (f"{name}.{mode}", voter_id)
+
+    for _ in range(3):
+        entry = view.store.locate(voter_id)
+        if entry is None:
+            return None
+
+        version = ("store",) + tuple(entry)
+        cached = embedding_cache.get(key, version)
+        if cached is not None:
+            return cached, entry
+
+        rows = view.get(voter_id, entry)
+        # The sidecar is mapped for the current generation; if a
+        # compaction moved the voter meanwhile, look it up again
+        if rows is None or view.store.locate(voter_id) != entry:
+            continue
+        rows = np.array(rows)
+        rows.flags.writeable = False
+        embedding_cache.put(key, rows, version)
+        return rows, entry
+    return None
+
+
+def verify_distance(voter_id, rows, login, name="face_recognition", rerank=RERANK,
+                    entry=None):
+    """
+    Distance between `login` and the voter's enrolled encodings: the
+    `rerank` rows closest in the quantized form are re-scored in
+    float32 and the smallest exact distance among them is returned.
+    This is approximate (never below the true minimum): it equals the
+    exact minimum unless quantization ranked the nearest row below the
+    first `rerank`. rerank <= 0 re-scores every row, which is exact.
+
+    `entry` is the store entry `rows` came from (see
+    load_voter_quantized); the float32 rows are read for that same
+    entry. Returns None when the voter has no enrolled rows any more.
+    """
+    stored = get_store(name).get(voter_id, entry)
+    if stored is None or len(stored) != len(rows):
+        return None
+    if rerank <= 0 or rerank >= len(rows):
+        exact = stored
+    else:
+        approx = approx_sq_distances(rows, login)
+        exact = stored[np.argpartition(approx, rerank - 1)[:rerank]]
+    return float(np.linalg.norm(exact - np.asarray(login, np.float32), axis=1).min())
+
+
+# -------------------------------------------------------------
+# REPORT
+# -------------------------------------------------------------
+def report(mode, names=ENCODERS, rerank=RERANK):
+    """Footprint and distance error of `mode` for every existing store."""
+    out = {}
+    for name in names:
+        if not store_exists(name):
+            continue
+        store = get_store(name)
+        view = get_view(name, mode)
+        full, compact = store.matrix(), view.matrix()
+        if full is None:
+            continue
+
+        approx = dequantize(np.asarray(compact))
+        ranges = list(store.ranges())
+        # Each voter's first encoding as the login against every voter
+        approx_err, rerank_err, flips = [], [], 0
+        for _, qs, _ in ranges:
+            query = np.asarray(full[qs])
+            for voter_id, start, count in ranges:
+                exact = float(np.linalg.norm(full[start:start + count] - query, axis=1).min())
+                rough = float(np.linalg.norm(approx[start:start + count] - query, axis=1).min())
+                reranked = verify_distance(voter_id, compact[start:start + count], query,
+                                           name, rerank, entry=(start, count))
+                approx_err.append(abs(rough - exact))
+                rerank_err.append(abs(reranked - exact))
+                flips += (reranked < 0.5) != (exact < 0.5)
+
+        out[name] = {
+            "rows": len(full),
+            "dim": store.dim,
+            "float32_bytes": int(full.nbytes),
+            f"{mode}_bytes": int(compact.nbytes),
+            "saving": round(1 - compact.nbytes / full.nbytes, 3),
+            "max_abs_distance_error_quantized": round(max(approx_err), 6) if approx_err else None,
+            "max_abs_distance_error_reranked": round(max(rerank_err), 6) if rerank_err else None,
+            # Only dlib distances are compared against the 0.5 tolerance
+            "decision_flips_at_0.5": flips if name == "face_recognition" else None,
+        }
+    return out
+
+
+if __name__ == "__main__":
+    import json
+
+    mode = sys.argv[1] if len(sys.argv) > 1 else "int8"
+    for name in ENCODERS:
+        if store_exists(name):
+            get_view(name, mode).sync()
+    print(json.dumps(report(mode), indent=2))
@@ -0,0 +1,483 @@
+import argparse
+import json
+import os
+import socketserver
+import sqlite3
+import threading
+import time
+import urllib.request
+
+# -------------------------------------------------------------
+# ON-CHAIN TALLY INDEXER
+#
+# Follows the Voting contract's events over JSON-RPC (eth_getLogs) and
+# keeps the tallies in a small SQLite store (encodings/tally.sqlite), so
+# results are one read of the candidates table and never a call to the
+# chain:
+#
+#   CandidateAdded(id, name)  -> candidates row
+#   VoterRegistered(voter)    -> voters row (repeat registrations of the
+#                                same address are counted once)
+#   Voted(voter, candidateId) -> candidate votes + 1, turnout + 1
+#
+# Blocks are indexed in ranges of up to BLOCK_RANGE, each range applied
+# and checkpointed (last block number + hash) in one transaction, so a
+# restart resumes from the checkpoint without double counting.
+#
+# Reorgs: the hashes of recently indexed blocks are kept. Before each
+# range the checkpoint hash is compared with the chain's; on a mismatch
+# the newest block whose hash still matches is the fork point, and the
+# journal of events applied above it is undone in reverse order. Only
+# blocks within REORG_DEPTH of the head are journaled, so catching up on
+# old (final) blocks costs no journal writes. A fork deeper than the
+# kept hashes resets the store and reindexes from the start block.
+#
+# Service protocol (JSON lines over TCP, like face_server.py):
+#   {"id": 1, "op": "results"}  -> {"id": 1, "results": {...}}
+#   {"id": 2, "op": "status"}   -> checkpoint, events applied, reorgs
+#
+#   python python/tally_indexer.py serve --contract 0x...
+#   python python/tally_indexer.py sync --contract 0x...
+#   python python/tally_indexer.py results
+# -------------------------------------------------------------
+
+TALLY_PATH = os.environ.get("TALLY_DB_PATH", os.path.join("encodings", "tally.sqlite"))
+RPC_URL = os.environ.get("CHAIN_RPC_URL", "http://127.0.0.1:7545")
+CONTRACT = os.environ.get("VOTING_CONTRACT")
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = int(os.environ.get("TALLY_SERVER_PORT", "5057"))
+CONFIRMATIONS = int(os.environ.get("TALLY_CONFIRMATIONS", "0"))
+REORG_DEPTH = 64
+BLOCK_RANGE = 2000
+POLL_S = 1.0
+
+# keccak256 of the event signatures in smart-contract/contracts/Voting.sol
+TOPIC_VOTED = "0x4d99b957a2bc29a30ebd96a7be8e68fe50a3c701db28a91436490b7d53870ca4"
+TOPIC_CANDIDATE_ADDED = "0xe83b2a43e7e82d975c8a0a6d2f045153c869e111136a34d1889ab7b598e396a3"
+TOPIC_VOTER_REGISTERED = "0xb6be2187d059cc2a55fe29e0e503b566e1e0f8c8780096e185429350acffd3dd"
+TOPICS = [TOPIC_VOTED, TOPIC_CANDIDATE_ADDED, TOPIC_VOTER_REGISTERED]
+
+
+# -------------------------------------------------------------
+# JSON-RPC
+# -------------------------------------------------------------
+class RpcError(Exception):
+    pass
+
+
+class RpcClient:
+    def __init__(self, url=RPC_URL, timeout=30):
+        self.url = url
+        self.timeout = timeout
+        self._id = 0
+
+    def call(self, method, params):
+        self._id += 1
+        body = json.dumps({"jsonrpc": "2.0", "id": self._id, "method": method,
+                           "params": params}).encode("utf-8")
+        req = urllib.request.Request(self.url, body, {"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            reply = json.loads(resp.read())
+        if reply.get("error"):
+            raise RpcError(reply["error"].get("message", str(reply["error"])))
+        return reply["result"]
+
+    def block_number(self):
+        return int(self.call("eth_blockNumber", []), 16)
+
+    def block_hash(self, number):
+        block = self.call("eth_getBlockByNumber", [hex(number), False])
+        return block["hash"] if block else None
+
+    def get_logs(self, address, from_block, to_block):
+        return self.call("eth_getLogs", [{"address": address, "fromBlock": hex(from_block),
+                                          "toBlock": hex(to_block), "topics": [TOPICS]}])
+
+
+def decode_log(log):
+    """(block, log_index, kind, voter bytes or None, candidate id or None, name or None)."""
+    data = bytes.fromhex(log["data"][2:])
+    block, index = int(log["blockNumber"], 16), int(log["logIndex"], 16)
+    topic = log["topics"][0]
+    if topic == TOPIC_VOTED:
+        return block, index, "vote", data[12:32], int.from_bytes(data[32:64], "big"), None
+    if topic == TOPIC_VOTER_REGISTERED:
+        return block, index, "register", data[12:32], None, None
+    if topic == TOPIC_CANDIDATE_ADDED:
+        # (uint id, string name): id, offset, then length + bytes at offset
+        offset = int.from_bytes(data[32:64], "big")
+        length = int.from_bytes(data[offset:offset + 32], "big")
+        name = data[offset + 32:offset + 32 + length].decode("utf-8", "replace")
+        return block, index, "candidate", None, int.from_bytes(data[:32], "big"), name
+    return None
+
+
+# -------------------------------------------------------------
+# STORE
+# -------------------------------------------------------------
+class TallyStore:
+    def __init__(self, path=TALLY_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                   check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS meta (
+                key   TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS candidates (
+                id    INTEGER PRIMARY KEY,
+                name  TEXT NOT NULL,
+                votes INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS voters (
+                address   BLOB PRIMARY KEY,
+                voted_for INTEGER
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS blocks (
+                number INTEGER PRIMARY KEY,
+                hash   TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS journal (
+                block     INTEGER NOT NULL,
+                log_index INTEGER NOT NULL,
+                kind      TEXT NOT NULL,
+                voter     BLOB,
+                candidate INTEGER,
+                PRIMARY KEY (block, log_index)
+            ) WITHOUT ROWID;
+        """)
+
+    # ---------------------------------------------------------
+    # METADATA
+    # ---------------------------------------------------------
+    def _meta(self, key, default=None):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    @staticmethod
+    def _set_meta(db, key, value):
+        db.execute("INSERT INTO meta(key, value) VALUES(?, ?) "
+                   "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                   (key, json.dumps(value)))
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn(self._db)
+                self._db.execute("COMMIT")
+                return out
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def checkpoint(self):
+        """(last indexed block, its hash), or (None, None) before the first range."""
+        with self._lock:
+            return self._meta("last_block"), self._meta("last_hash")
+
+    def bind(self, contract, start_block=0):
+        """Ties the store to a contract; a different contract resets it."""
+        with self._lock:
+            current = self._meta("contract")
+        if current and current.lower() != contract.lower():
+            self.reset()
+        if current is None or current.lower() != contract.lower():
+            self._transaction(lambda db: (self._set_meta(db, "contract", contract),
+                                          self._set_meta(db, "start_block", start_block)))
+
+    def reset(self):
+        def clear(db):
+            for table in ("candidates", "voters", "blocks", "journal"):
+                db.execute(f"DELETE FROM {table}")
+            db.execute("DELETE FROM meta WHERE key NOT IN ('contract', 'start_block')")
+        self._transaction(clear)
+
+    # ---------------------------------------------------------
+    # WRITE PATH
+    # ---------------------------------------------------------
+    def apply(self, events, to_block, hashes, journal_from):
+        """
+        Applies decoded events (in chain order) for blocks up to
+        `to_block` and moves the checkpoint there, atomically. `hashes`
+        maps block numbers to hashes and must include to_block. Events
+        in blocks >= journal_from are journaled for rollback.
+        """
+        def write(db):
+            registered, voted = self._meta("registered", 0), self._meta("voted", 0)
+
+            # Repeat registrations (same address) only count once
+            addresses = {e[3] for e in events if e[2] == "register"}
+            known = set()
+            pending = list(addresses)
+            for s in range(0, len(pending), 500):
+                chunk = pending[s:s + 500]
+                known.update(r[0] for r in db.execute(
+                    f"SELECT address FROM voters WHERE address IN ({','.join('?' * len(chunk))})",
+                    chunk))
+
+            new_voters, votes, cast, candidates, journal = [], {}, [], [], []
+            for block, index, kind, voter, candidate, name in events:
+                if kind == "register":
+                    if voter in known:
+                        # Journaled as a no-op so rollback can uncount it
+                        if block >= journal_from:
+                            journal.append((block, index, "register_repeat", voter, None))
+                        continue
+                    known.add(voter)
+                    new_voters.append((voter,))
+                elif kind == "vote":
+                    votes[candidate] = votes.get(candidate, 0) + 1
+                    cast.append((candidate, voter))
+                else:
+                    candidates.append((candidate, name))
+                if block >= journal_from:
+                    journal.append((block, index, kind, voter, candidate))
+
+            db.executemany("INSERT INTO candidates(id, name) VALUES(?, ?) "
+                           "ON CONFLICT(id) DO UPDATE SET name = excluded.name", candidates)
+            db.executemany("INSERT INTO voters(address) VALUES(?)", new_voters)
+            db.executemany("UPDATE voters SET voted_for = ? WHERE address = ?", cast)
+            db.executemany("UPDATE candidates SET votes = votes + ? WHERE id = ?",
+                           [(n, c) for c, n in votes.items()])
+            db.executemany("INSERT OR REPLACE INTO journal VALUES(?, ?, ?, ?, ?)", journal)
+
+            # Fork points are only searched where events were journaled
+            db.executemany("INSERT OR REPLACE INTO blocks VALUES(?, ?)",
+                           [(n, h) for n, h in hashes.items() if n >= journal_from])
+            db.execute("DELETE FROM blocks WHERE number < ?", (to_block - REORG_DEPTH,))
+            db.execute("DELETE FROM journal WHERE block < ?", (to_block - REORG_DEPTH,))
+
+            self._set_meta(db, "registered", registered + len(new_voters))
+            self._set_meta(db, "voted", voted + len(cast))
+            self._set_meta(db, "events", self._meta("events", 0) + len(events))
+            self._set_meta(db, "last_block", to_block)
+            self._set_meta(db, "last_hash", hashes[to_block])
+
+        self._transaction(write)
+
+    def recent_blocks(self):
+        """Kept (number, hash) pairs, newest first."""
+        with self._lock:
+            return self._db.execute("SELECT number, hash FROM blocks ORDER BY number DESC").fetchall()
+
+    def rollback(self, block):
+        """Undoes every journaled event above `block` and moves the checkpoint back to it."""
+        def undo(db):
+            registered, voted = self._meta("registered", 0), self._meta("voted", 0)
+            rows = db.execute("SELECT kind, voter, candidate FROM journal WHERE block > ? "
+                              "ORDER BY block DESC, log_index DESC", (block,)).fetchall()
+            for kind, voter, candidate in rows:
+                if kind == "vote":
+                    db.execute("UPDATE candidates SET votes = votes - 1 WHERE id = ?", (candidate,))
+                    db.execute("UPDATE voters SET voted_for = NULL WHERE address = ?", (voter,))
+                    voted -= 1
+                elif kind == "register":
+                    db.execute("DELETE FROM voters WHERE address = ?", (voter,))
+                    registered -= 1
+                elif kind == "candidate":
+                    db.execute("DELETE FROM candidates WHERE id = ?", (candidate,))
+
+            db.execute("DELETE FROM journal WHERE block > ?", (block,))
+            db.execute("DELETE FROM blocks WHERE number > ?", (block,))
+            row = db.execute("SELECT hash FROM blocks WHERE number = ?", (block,)).fetchone()
+            self._set_meta(db, "registered", registered)
+            self._set_meta(db, "voted", voted)
+            self._set_meta(db, "events", self._meta("events", 0) - len(rows))
+            self._set_meta(db, "last_block", block)
+            self._set_meta(db, "last_hash", row[0] if row else None)
+            self._set_meta(db, "reorgs", self._meta("reorgs", 0) + 1)
+            return len(rows)
+
+        return self._transaction(undo)
+
+    # ---------------------------------------------------------
+    # READ PATH
+    # ---------------------------------------------------------
+    def results(self):
+        """Tallies and turnout: one pass over the candidates, no chain access."""
+        with self._lock:
+            candidates = [{"id": i, "name": n, "votes": v} for i, n, v in
+                          self._db.execute("SELECT id, name, votes FROM candidates ORDER BY id")]
+            registered, voted = self._meta("registered", 0), self._meta("voted", 0)
+            block = self._meta("last_block")
+        return {
+            "candidates": candidates,
+            "registered": registered,
+            "voted": voted,
+            "turnout": round(voted / registered, 4) if registered else 0.0,
+            "block": block,
+        }
+
+    def status(self):
+        with self._lock:
+            return {key: self._meta(key) for key in
+                    ("contract", "start_block", "last_block", "last_hash", "events", "reorgs")}
+
+
+# -------------------------------------------------------------
+# INDEXER
+# -------------------------------------------------------------
+class TallyIndexer:
+    def __init__(self, store, rpc, contract, start_block=0,
+                 confirmations=CONFIRMATIONS, block_range=BLOCK_RANGE):
+        self.store = store
+        self.rpc = rpc
+        self.contract = contract
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.block_range = block_range
+        store.bind(contract, start_block)
+
+    def _check_reorg(self):
+        """Rolls back to the fork point if the checkpoint is no longer on the chain."""
+        last, last_hash = self.store.checkpoint()
+        if last is None or self.rpc.block_hash(last) == last_hash:
+            return False
+
+        for number, stored in self.store.recent_blocks():
+            if self.rpc.block_hash(number) == stored:
+                undone = self.store.rollback(number)
+                print(f"[WARN] Reorg: rolled back to block {number} ({undone} events undone)",
+                      flush=True)
+                return True
+
+        print("[WARN] Reorg deeper than the kept block hashes; reindexing", flush=True)
+        self.store.reset()
+        return True
+
+    def sync_once(self):
+        """Indexes one range of blocks. Returns the number of blocks indexed."""
+        self._check_reorg()
+        head = self.rpc.block_number()
+        target = head - self.confirmations
+        last, _ = self.store.checkpoint()
+        start = self.start_block if last is None else last + 1
+        if start > target:
+            return 0
+
+        end = min(target, start + self.block_range - 1)
+        while True:
+            try:
+                logs = self.rpc.get_logs(self.contract, start, end)
+                break
+            except RpcError:
+                # Nodes cap the logs per query; retry on a smaller range
+                if end == start:
+                    raise
+                end = start + (end - start) // 2
+
+        events = [e for e in map(decode_log, logs) if e is not None]
+        events.sort(key=lambda e: (e[0], e[1]))
+
+        # Every block near the head is a possible fork point
+        journal_from = head - REORG_DEPTH
+        hashes = {n: self.rpc.block_hash(n) for n in range(max(start, journal_from), end + 1)}
+        if end not in hashes:
+            hashes[end] = self.rpc.block_hash(end)
+        self.store.apply(events, end, hashes, journal_from)
+        return end - start + 1
+
+    def run(self, stop=None, poll_s=POLL_S):
+        while stop is None or not stop.is_set():
+            try:
+                if self.sync_once() == 0:
+                    time.sleep(poll_s)
+            except (OSError, RpcError) as e:
+                print(f"[WARN] Indexer: {e}", flush=True)
+                time.sleep(poll_s * 5)
+
+
+# -------------------------------------------------------------
+# SERVICE (TCP, JSON lines)
+# -------------------------------------------------------------
+def handle(store, request):
+    req_id = request.get("id")
+    op = request.get("op", "results")
+    if op == "ping":
+        return {"id": req_id, "ok": True}
+    if op == "results":
+        return {"id": req_id, "results": store.results()}
+    if op == "status":
+        return {"id": req_id, "status": store.status()}
+    return {"id": req_id, "error": f"Unknown op: {op}"}
+
+
+class _LineHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode("utf-8").strip()
+            if not line:
+                continue
+            try:
+                response = handle(self.server.store, json.loads(line))
+            except ValueError:
+                response = {"id": None, "error": "Invalid JSON"}
+            self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _ThreadedServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(contract, rpc_url=RPC_URL, start_block=0, host=DEFAULT_HOST, port=DEFAULT_PORT,
+          path=TALLY_PATH):
+    store = TallyStore(path)
+    indexer = TallyIndexer(store, RpcClient(rpc_url), contract, start_block)
+    stop = threading.Event()
+    threading.Thread(target=indexer.run, args=(stop,), daemon=True).start()
+
+    with _ThreadedServer((host, port), _LineHandler) as server:
+        server.store = store
+        print(f"[INFO] Tally indexer for {contract} listening on {host}:{port}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("[INFO] Tally indexer stopped.")
+        finally:
+            stop.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Voting contract tally indexer")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("serve", "sync"):
+        p = sub.add_parser(name)
+        p.add_argument("--contract", default=CONTRACT, required=CONTRACT is None)
+        p.add_argument("--rpc", default=RPC_URL)
+        p.add_argument("--start-block", type=int, default=0)
+        if name == "serve":
+            p.add_argument("--host", default=DEFAULT_HOST)
+            p.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    sub.add_parser("results")
+    sub.add_parser("status")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        serve(args.contract, args.rpc, args.start_block, args.host, args.port)
+        return
+
+    store = TallyStore()
+    if args.command == "sync":
+        # Catch up to the head once and exit
+        indexer = TallyIndexer(store, RpcClient(args.rpc), args.contract, args.start_block)
+        while indexer.sync_once():
+            pass
+        print(json.dumps(store.results(), indent=2))
+    elif args.command == "results":
+        print(json.dumps(store.results(), indent=2))
+    else:
+        print(json.dumps(store.status(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# The modules under test are flat scripts in backend/python
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    Runs the test in an empty directory. The stores use paths relative
+    to the working directory (encodings/, dataset/), so the process-wide
+    store and quantized view instances and the embedding cache are reset
+    as well.
+    """
+    monkeypatch.chdir(tmp_path)
+    _reset_stores()
+    yield tmp_path
+    _reset_stores()
+
+
+def _reset_stores():
+    import embedding_store
+    import quantized_store
+
+    for store in embedding_store._stores.values():
+        store.close()
+    embedding_store._stores.clear()
+    quantized_store._views.clear()
+    embedding_store.embedding_cache.clear()
@@ -0,0 +1,99 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+from embedding_store import embedding_cache, get_store, load_voter_embeddings
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _array(fill, n=100):
+    return np.full(n, fill, dtype=np.float64)  # 800 bytes
+
+
+def test_eviction_is_bounded_by_bytes_and_least_recently_used():
+    cache = EmbeddingCache(max_bytes=2400)
+    for key in "abc":
+        cache.put(key, _array(ord(key)))
+    assert cache.bytes == 2400 and len(cache) == 3
+
+    cache.get("a")  # b is now the least recently used
+    cache.put("d", _array(4))
+
+    assert cache.bytes == 2400
+    assert cache.evictions == 1
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "acd")
+
+
+def test_one_large_entry_evicts_several_small_ones():
+    cache = EmbeddingCache(max_bytes=2400)
+    for key in "abc":
+        cache.put(key, _array(0))
+
+    cache.put("big", _array(1, n=200))  # 1600 bytes
+
+    assert cache.evictions == 2
+    assert cache.bytes == 2400  # c + big
+    assert cache.get("a") is None and cache.get("b") is None
+    assert cache.get("c") is not None and cache.get("big") is not None
+
+
+def test_entry_larger_than_the_cache_is_not_stored():
+    cache = EmbeddingCache(max_bytes=100)
+    cache.put("a", _array(0))
+    assert len(cache) == 0 and cache.bytes == 0
+
+
+def test_version_mismatch_invalidates_entry():
+    cache = EmbeddingCache()
+    cache.put("a", _array(1), version=("store", 0, 3, 0))
+
+    assert cache.get("a", ("store", 0, 3, 0)) is not None
+    assert cache.get("a", ("store", 3, 3, 0)) is None
+    assert cache.invalidations == 1
+    assert len(cache) == 0 and cache.bytes == 0
+    # Without a version the entry is gone too, not resurrected
+    assert cache.get("a") is None
+
+
+def test_ttl_expires_entries():
+    clock = FakeClock()
+    cache = EmbeddingCache(ttl=10, clock=clock)
+    cache.put("a", _array(1))
+
+    clock.now = 9.9
+    assert cache.get("a") is not None
+    clock.now = 10.0
+    assert cache.get("a") is None
+    assert cache.expirations == 1
+
+
+def test_reenrollment_in_store_invalidates_cached_embeddings(workdir):
+    store = get_store("face_recognition")
+    store.append("v@x.com", np.zeros((2, 128), dtype=np.float32))
+    first = load_voter_embeddings("v@x.com")
+    assert load_voter_embeddings("v@x.com") is first  # served from the cache
+
+    store.append("v@x.com", np.ones((3, 128), dtype=np.float32))
+    second = load_voter_embeddings("v@x.com")
+
+    assert second.shape == (3, 128) and np.all(second == 1)
+    assert embedding_cache.invalidations == 1
+
+
+def test_rewritten_npy_file_invalidates_cached_embeddings(workdir):
+    workdir.joinpath("encodings").mkdir()
+    np.save("encodings/v@x.com_face_recognition.npy", np.zeros((2, 128)))
+    assert load_voter_embeddings("v@x.com").shape == (2, 128)
+
+    # A different size changes the version even on coarse mtime clocks
+    np.save("encodings/v@x.com_face_recognition.npy", np.ones((4, 128)))
+    reloaded = load_voter_embeddings("v@x.com")
+
+    assert reloaded.shape == (4, 128) and np.all(reloaded == 1)
@@ -0,0 +1,147 @@
+import os
+
+import numpy as np
+import pytest
+
+from embedding_store import EmbeddingStore, load_voter_embeddings, get_store
+
+
+def _vectors(seed, n=3, dim=8):
+    return np.random.default_rng(seed).random((n, dim), dtype=np.float32)
+
+
+def test_compact_switches_readers_to_a_new_generation_file(workdir, monkeypatch):
+    writer = EmbeddingStore("face_recognition", "store")
+    reader = EmbeddingStore("face_recognition", "store")  # another process
+    writer.append("a", _vectors(1))
+    writer.append("b", _vectors(2))
+    writer.append("a", _vectors(3))  # re-enrollment leaves garbage rows
+    assert np.array_equal(reader.get("b"), _vectors(2))  # reader has the file mapped
+    old_path = writer.data_path
+
+    # Windows semantics: a mapped file can be neither replaced nor deleted
+    def refuse(*args):
+        raise PermissionError("file is mapped by another process")
+    real_remove = os.remove
+    monkeypatch.setattr(os, "replace", refuse)
+    monkeypatch.setattr(os, "remove", refuse)
+    writer.compact()
+    monkeypatch.setattr(os, "remove", real_remove)
+
+    assert writer.generation == 1 and writer.rows == 6
+    assert writer.data_path != old_path and os.path.exists(old_path)
+    # The reader notices the generation change on its next lookup
+    assert np.array_equal(reader.get("a"), _vectors(3))
+    assert np.array_equal(reader.get("b"), _vectors(2))
+
+    reader.close()
+    assert writer.remove_stale_files() == [old_path]
+    writer.close()
+
+
+def test_append_after_compact_goes_to_the_new_file(workdir):
+    store = EmbeddingStore("robust", "store")
+    store.append("a", _vectors(1))
+    store.remove("a")
+    store.append("b", _vectors(2))
+    store.compact()
+    store.append("c", _vectors(3))
+
+    assert os.path.getsize(store.data_path) == 6 * 8 * 4
+    assert np.array_equal(store.get("c"), _vectors(3))
+    assert store.ranges().__next__() == ("b", 0, 3)
+    store.close()
+
+
+def test_cached_embeddings_are_invalidated_by_compaction(workdir):
+    store = get_store("face_recognition")
+    store.append("a", _vectors(1))
+    store.append("a", _vectors(4))
+    first = load_voter_embeddings("a")
+
+    store.compact()
+
+    again = load_voter_embeddings("a")
+    assert again is not first
+    assert np.array_equal(again, _vectors(4))
+
+
+def test_dimension_mismatch_is_rejected(workdir):
+    store = get_store("face_recognition")
+    store.append("a", _vectors(1, dim=8))
+    with pytest.raises(ValueError):
+        store.append("b", _vectors(2, dim=4))
+
+
+def _enroll_with_garbage(store):
+    store.append("a", _vectors(1))
+    store.append("b", _vectors(2))
+    store.append("a", _vectors(3))  # compaction moves b from row 3 to row 0
+    store.append("c", _vectors(5))
+
+
+@pytest.mark.parametrize("mapped", [False, True])
+def test_lookup_during_compaction_never_mixes_generations(workdir, monkeypatch, mapped):
+    store = get_store("face_recognition")
+    _enroll_with_garbage(store)
+    if mapped:
+        store.get("a")  # the old generation is already mapped here
+    other = EmbeddingStore("face_recognition", store.root)  # another process
+
+    # compact() lands between locating the voter and reading the rows
+    real_locate = store.locate
+    calls = []
+
+    def locate_then_compact(voter_id):
+        hit = real_locate(voter_id)
+        if not calls:
+            other.compact()
+        calls.append(hit)
+        return hit
+
+    monkeypatch.setattr(store, "locate", locate_then_compact)
+    rows = load_voter_embeddings("b")
+
+    assert calls[0] == (3, 3, 0)
+    assert np.array_equal(rows, _vectors(2))
+    # Cached under the generation the rows were actually read from
+    monkeypatch.setattr(store, "locate", real_locate)
+    assert np.array_equal(load_voter_embeddings("b"), _vectors(2))
+    assert np.array_equal(load_voter_embeddings("c"), _vectors(5))
+    other.close()
+
+
+def test_concurrent_compactions_never_return_another_voters_rows(workdir):
+    import threading
+
+    store = get_store("face_recognition")
+    _enroll_with_garbage(store)
+    other = EmbeddingStore("face_recognition", store.root)
+    stop = threading.Event()
+
+    def churn():
+        while not stop.is_set():
+            other.append("a", _vectors(3))
+            other.compact()
+
+    thread = threading.Thread(target=churn)
+    thread.start()
+    try:
+        for _ in range(300):
+            from embedding_store import embedding_cache
+            embedding_cache.clear()
+            assert np.array_equal(load_voter_embeddings("b"), _vectors(2))
+            assert np.array_equal(store.get("c"), _vectors(5))
+    finally:
+        stop.set()
+        thread.join()
+        other.close()
+
+
+def test_lookup_uses_the_store_under_enc_dir(workdir):
+    store = EmbeddingStore("face_recognition", os.path.join("elsewhere", "store"))
+    store.append("a", _vectors(1))
+
+    assert load_voter_embeddings("a") is None
+    assert np.array_equal(load_voter_embeddings("a", enc_dir="elsewhere"), _vectors(1))
+    store.close()
@@ -0,0 +1,105 @@
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+import encoding_cache
+import feature_encoding
+from encoding_cache import EncodingCache
+
+
+class CountingEncoder:
+    """Primary-encoder double: a 128-d vector derived from the face pixels."""
+
+    name = "counting"
+    kind = "face_recognition"
+    batch_size = 4
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, images, boxes):
+        self.encoded += len(images)
+        return np.array([np.full(128, img.mean() / 255.0) for img in images])
+
+
+@pytest.fixture
+def voter(workdir, monkeypatch):
+    # Every image is one whole-frame face, so no dlib is needed
+    detector = types.SimpleNamespace(
+        face_locations=lambda rgb, model="hog": [(0, rgb.shape[1], rgb.shape[0], 0)])
+    monkeypatch.setattr(feature_encoding, "face_recognition", detector)
+
+    folder = workdir / "dataset" / "v@x.com"
+    folder.mkdir(parents=True)
+    for i in range(3):
+        write_image(folder / f"{i}.jpg", 40 + 60 * i)
+    return folder
+
+
+def write_image(path, level):
+    image = np.full((64, 64, 3), level, dtype=np.uint8)
+    image[16:48, 16:48] = 255 - level
+    cv2.imwrite(str(path), image)
+
+
+def encode(cache, encoder):
+    files = feature_encoding.list_voter_images("v@x.com")
+    return feature_encoding.encode_voter_images(
+        "v@x.com", files, feature_encoding.RobustFaceEncoder(), log=lambda *a: None,
+        cache=cache, encoder=encoder)
+
+
+def test_unchanged_images_are_cache_hits(voter):
+    encoder = CountingEncoder()
+    cache = EncodingCache("v@x.com")
+    fr, robust, _ = encode(cache, encoder)
+    cache.save()
+    assert (cache.hits, cache.misses, encoder.encoded) == (0, 3, 3)
+
+    # A fresh process reads the saved cache and encodes nothing
+    cache = EncodingCache("v@x.com")
+    fr_again, robust_again, _ = encode(cache, encoder)
+
+    assert (cache.hits, cache.misses, encoder.encoded) == (3, 0, 3)
+    assert np.array_equal(np.array(fr_again), np.array(fr))
+    assert np.array_equal(np.array(robust_again), np.array(robust))
+
+
+def test_changed_content_is_a_miss_and_deleted_images_are_evicted(voter):
+    encoder = CountingEncoder()
+    cache = EncodingCache("v@x.com")
+    encode(cache, encoder)
+    cache.save()
+
+    # Same file name, new bytes: the key is the content hash
+    write_image(voter / "1.jpg", 200)
+    (voter / "2.jpg").unlink()
+
+    cache = EncodingCache("v@x.com")
+    encode(cache, encoder)
+
+    assert (cache.hits, cache.misses, cache.evicted) == (1, 1, 2)
+    assert encoder.encoded == 4
+    assert len(cache.entries) == 2
+
+
+def test_encoder_version_change_discards_the_cache(voter, monkeypatch):
+    cache = EncodingCache("v@x.com")
+    encode(cache, CountingEncoder())
+    cache.save()
+
+    monkeypatch.setattr(encoding_cache, "ENCODER_VERSION", "dlib-hog-2/robust-1")
+    cache = EncodingCache("v@x.com")
+    assert cache.entries == {}
+
+
+def test_detect_reduction_change_discards_the_cache(voter, monkeypatch):
+    cache = EncodingCache("v@x.com")
+    encode(cache, CountingEncoder())
+    cache.save()
+    assert len(EncodingCache("v@x.com").entries) == 3
+
+    monkeypatch.setattr(feature_encoding, "DETECT_REDUCTION", 2)
+    assert EncodingCache("v@x.com").entries == {}
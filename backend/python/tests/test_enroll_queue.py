@@ -0,0 +1,103 @@
+import enroll_queue
+from enroll_queue import JobQueue
+
+
+def _expire_lease(queue, job_id):
+    queue._execute("UPDATE jobs SET heartbeat = heartbeat - ? WHERE id = ?",
+                   (enroll_queue.LEASE_S + 1, job_id))
+
+
+def test_expired_lease_requeues_then_fails_when_attempts_are_used(workdir):
+    queue = JobQueue("jobs.sqlite")
+    job = queue.submit("v@x.com", max_attempts=2)
+
+    # The worker dies mid-job twice: the lease expires each time
+    for attempt in (1, 2):
+        claimed = queue.claim("w0")
+        assert claimed["id"] == job["id"] and claimed["attempts"] == attempt
+        _expire_lease(queue, job["id"])
+
+    assert queue.claim("w1") is None
+    failed = queue.get(job["id"])
+    assert failed["status"] == "failed"
+    assert "lease expired" in failed["message"]
+
+
+def test_worker_with_expired_lease_cannot_touch_the_reclaimed_job(workdir):
+    queue = JobQueue("jobs.sqlite")
+    job = queue.submit("v@x.com", max_attempts=3)
+    queue.claim("w0")
+    _expire_lease(queue, job["id"])
+    assert queue.claim("w1")["worker"] == "w1"
+
+    # w0 was only slow, not dead: its late updates must all be refused
+    assert queue.progress(job["id"], "w0", 5, 10) is False
+    assert queue.finish(job["id"], "w0", {"fr": 1}) is False
+    assert queue.fail(job["id"], "w0", "boom") is None
+    assert queue.fail(job["id"], "w0", "boom", permanent=True) is None
+
+    current = queue.get(job["id"])
+    assert (current["status"], current["worker"], current["result"]) == ("running", "w1", None)
+
+    assert queue.finish(job["id"], "w1", {"fr": 2}) is True
+    assert queue.get(job["id"])["result"] == {"fr": 2}
+
+
+def test_expired_lease_requeued_job_cannot_be_finished_by_old_worker(workdir):
+    queue = JobQueue("jobs.sqlite")
+    job = queue.submit("v@x.com")
+    queue.claim("w0")
+    _expire_lease(queue, job["id"])
+    assert queue.claim("w1")["id"] == job["id"]
+    assert queue.fail(job["id"], "w1", "transient") == "queued"
+
+    # Back in the queue, owned by nobody: the old worker still cannot finish it
+    assert queue.finish(job["id"], "w0", {"fr": 1}) is False
+    assert queue.get(job["id"])["status"] == "queued"
+
+
+def test_release_worker_requeues_its_running_job(workdir):
+    queue = JobQueue("jobs.sqlite")
+    job = queue.submit("v@x.com")
+    queue.claim("w0")
+
+    queue.release_worker("w0")
+
+    assert queue.get(job["id"])["status"] == "queued"
+    assert queue.claim("w1")["attempts"] == 2
+
+
+class _Proc:
+    def __init__(self, alive, exitcode=None):
+        self.alive, self.exitcode = alive, exitcode
+
+    def is_alive(self):
+        return self.alive
+
+
+class _Stop:
+    """wait() returns False `rounds` times, then True."""
+
+    def __init__(self, rounds):
+        self.rounds = rounds
+
+    def wait(self, timeout):
+        self.rounds -= 1
+        return self.rounds < 0
+
+
+def test_supervisor_respawns_dead_workers(workdir, monkeypatch):
+    queue = JobQueue("jobs.sqlite")
+    job = queue.submit("v@x.com")
+    queue.claim("worker-1")
+
+    spawned = []
+    monkeypatch.setattr(enroll_queue, "_spawn",
+                        lambda path, name, stop: spawned.append(name) or _Proc(True))
+    procs = {"worker-0": _Proc(True), "worker-1": _Proc(False, exitcode=-11)}
+
+    enroll_queue.supervise(queue, procs, "jobs.sqlite", _Stop(1), interval=0)
+
+    assert spawned == ["worker-1"]
+    assert procs["worker-1"].is_alive()
+    assert queue.get(job["id"])["status"] == "queued"
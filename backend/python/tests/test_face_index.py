@@ -0,0 +1,56 @@
+import numpy as np
+
+from embedding_store import get_store
+from face_index import IVFIndex, build_index
+
+
+def _enroll(store, rng, voters, rows=3):
+    for voter_id in voters:
+        store.append(voter_id, rng.normal(0, 1, (rows, 16)).astype(np.float32))
+
+
+def test_compaction_rebuilds_instead_of_duplicating(workdir):
+    rng = np.random.default_rng(0)
+    store = get_store("face_recognition")
+    _enroll(store, rng, [f"v{i}" for i in range(20)])
+    index = build_index(store, nlist=4)
+    assert len(index) == 60
+
+    # Re-enroll one voter (garbage rows), remove another, then compact
+    _enroll(store, rng, ["v3"])
+    store.remove("v7")
+    index.sync_from_store(store)
+    store.compact()
+    index.sync_from_store(store)
+
+    assert len(index) == 19 * 3
+    assert sorted(index.voter_code) == sorted(v for v, _, _ in store.ranges())
+    v3 = store.get("v3")[0]
+    voter, dist = index.search(v3, k=1, nprobe=4)[0]
+    assert voter == "v3" and dist < 1e-3
+
+
+def test_removed_voter_is_not_searchable(workdir):
+    rng = np.random.default_rng(1)
+    store = get_store("face_recognition")
+    _enroll(store, rng, ["a", "b", "c"])
+    index = build_index(store, nlist=2)
+    gone = store.get("b")[0].copy()
+
+    store.remove("b")
+    assert index.sync_from_store(store) == 1
+
+    assert "b" not in [v for v, _ in index.search(gone, k=3, nprobe=2)]
+
+
+def test_save_load_keeps_generation(workdir):
+    rng = np.random.default_rng(2)
+    store = get_store("face_recognition")
+    _enroll(store, rng, ["a", "b"])
+    index = build_index(store, nlist=2)
+    index.save("encodings/idx.npz")
+
+    loaded = IVFIndex.load("encodings/idx.npz")
+    assert loaded.store_generation == store.generation
+    assert loaded.sync_from_store(store) == 0
+    assert len(loaded) == len(index)
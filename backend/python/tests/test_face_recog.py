@@ -0,0 +1,23 @@
+import numpy as np
+
+import face_recog
+
+
+def test_burst_stops_decoding_after_a_clear_match(monkeypatch):
+    decoded = []
+
+    def decode(voter_id, data, timings):
+        decoded.append(data)
+        return np.zeros((4, 4, 3), np.uint8), None
+
+    monkeypatch.setattr(face_recog, "load_references", lambda voter_id: {"quantized": None})
+    monkeypatch.setattr(face_recog, "decode_login_frame", decode)
+    monkeypatch.setattr(face_recog, "encode_login_frame",
+                        lambda rgb, detector, timings: (np.zeros(128), None))
+    monkeypatch.setattr(face_recog, "best_distance", lambda *args: 0.1)
+
+    result = face_recog.match_voter_burst("v@x.com", [b"1", b"2", b"3", b"4"])
+
+    assert result["success"] and result["frames_used"] == 1
+    # Frame 2 may already be decoding when frame 1 matches; 3 and 4 never are
+    assert decoded[:1] == [b"1"] and len(decoded) <= 2
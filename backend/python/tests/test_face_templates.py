@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from face_templates import compress_template, decide
+
+
+def _voter(rng, clusters=2, per_cluster=8, spread=0.08):
+    centers = rng.normal(size=(clusters, 128))
+    centers *= 0.6 / np.linalg.norm(centers, axis=1, keepdims=True)
+    rows = np.concatenate([c + rng.normal(scale=spread / np.sqrt(128), size=(per_cluster, 128))
+                           for c in centers])
+    return rows.astype(np.float32)
+
+
+def test_decide_agrees_with_exhaustive_minimum_distance():
+    rng = np.random.default_rng(0)
+    tolerance = 0.5
+    decided = undecided = 0
+
+    for _ in range(20):
+        enrolled = _voter(rng)
+        template = compress_template(enrolled)
+        # Logins from near an enrolled row out to well beyond tolerance
+        for scale in (0.05, 0.3, 0.45, 0.5, 0.55, 0.7, 1.5):
+            anchor = enrolled[rng.integers(len(enrolled))]
+            direction = rng.normal(size=128)
+            login = (anchor + scale * direction / np.linalg.norm(direction)).astype(np.float32)
+
+            exact = float(np.linalg.norm(enrolled - login, axis=1).min())
+            decision, best = decide(template, login, tolerance)
+
+            if decision is None:
+                undecided += 1
+                continue
+            decided += 1
+            assert decision == (exact < tolerance)
+            # The medoid is an enrolled row: never closer than the full scan
+            assert best >= exact - 1e-5
+
+    # Clear accepts and rejects must not all fall back to the scan
+    assert decided > undecided
+
+
+def test_single_encoding_template_is_exact():
+    rng = np.random.default_rng(1)
+    enrolled = _voter(rng, clusters=1, per_cluster=1)
+    template = compress_template(enrolled)
+    login = enrolled[0] + 0.3 / np.sqrt(128)
+
+    decision, best = decide(template, login, 0.5)
+
+    assert decision is True
+    assert best == pytest.approx(float(np.linalg.norm(enrolled[0] - login)), rel=1e-6)
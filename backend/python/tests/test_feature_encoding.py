@@ -0,0 +1,62 @@
+import numpy as np
+
+import feature_encoding
+from embedding_store import get_store
+
+
+def test_robust_backend_save_keeps_only_face_crop_vectors(workdir):
+    rng = np.random.default_rng(0)
+    crops = rng.random((3, 836), dtype=np.float32)
+    whole_frames = rng.random((3, 836), dtype=np.float32)
+
+    saved = feature_encoding.save_encodings("v@x.com", crops, whole_frames, kind="robust")
+
+    assert saved == ["v@x.com_robust.npy"]
+    assert np.array_equal(np.load("encodings/v@x.com_robust.npy"), crops)
+    store = get_store("robust")
+    assert store.rows == 3
+    assert np.array_equal(store.get("v@x.com"), crops)
+
+
+def test_dlib_backend_save_writes_both_stores(workdir):
+    rng = np.random.default_rng(1)
+    fr = rng.random((2, 128), dtype=np.float32)
+    robust = rng.random((2, 836), dtype=np.float32)
+
+    feature_encoding.save_encodings("v@x.com", fr, robust, kind="face_recognition")
+
+    assert np.array_equal(get_store("face_recognition").get("v@x.com"), fr)
+    assert np.array_equal(get_store("robust").get("v@x.com"), robust)
+
+
+def _faces(count, shape=(128, 128)):
+    rng = np.random.default_rng(7)
+    faces = rng.integers(0, 256, (count,) + shape, dtype=np.uint8)
+    faces[0] = 0        # flat image: zero gradients, angle 0
+    faces[1, :, 64:] = 255  # one hard edge
+    return faces
+
+
+def test_extract_batch_is_bit_identical_to_per_image_reference():
+    from bench_feature_encoding import reference_combine_features
+
+    encoder = feature_encoding.RobustFaceEncoder()
+    faces = _faces(feature_encoding.EXTRACT_CHUNK * 2 + 3)  # ragged last chunk
+
+    batched = encoder.extract_batch(faces)
+
+    assert batched.shape == (len(faces), 836) and batched.dtype == np.float32
+    for face, row in zip(faces, batched):
+        assert np.array_equal(row, reference_combine_features(face))
+        assert np.array_equal(row, encoder._combine_features(face))
+
+
+def test_extract_batch_matches_reference_on_odd_sizes():
+    from bench_feature_encoding import reference_combine_features
+
+    encoder = feature_encoding.RobustFaceEncoder()
+    for shape in ((37, 53), (17, 16)):
+        faces = _faces(3, shape)
+        batched = encoder.extract_batch(faces)
+        for face, row in zip(faces, batched):
+            assert np.array_equal(row, reference_combine_features(face))
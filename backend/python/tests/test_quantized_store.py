@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from embedding_store import get_store
+from quantized_store import dequantize, load_voter_quantized, quantize, verify_distance
+
+
+@pytest.mark.parametrize("mode", ["float16", "int8"])
+def test_verify_distance_bounds(workdir, mode):
+    rng = np.random.default_rng(3)
+    enrolled = rng.normal(0, 0.1, (12, 128)).astype(np.float32)
+    get_store("face_recognition").append("v@x.com", enrolled)
+    rows, entry = load_voter_quantized("v@x.com", mode=mode)
+
+    for _ in range(20):
+        login = rng.normal(0, 0.1, 128).astype(np.float32)
+        exact = float(np.linalg.norm(enrolled - login, axis=1).min())
+
+        assert verify_distance("v@x.com", rows, login, rerank=0,
+                               entry=entry) == pytest.approx(exact, abs=1e-6)
+        # Re-scoring a subset can only miss the minimum, never undercut it
+        assert verify_distance("v@x.com", rows, login, rerank=2, entry=entry) >= exact - 1e-6
+
+
+@pytest.mark.parametrize("mode", ["float16", "int8"])
+def test_quantize_round_trip_error_is_small(mode):
+    vectors = np.random.default_rng(4).normal(0, 0.1, (50, 128)).astype(np.float32)
+    err = np.abs(dequantize(quantize(vectors, mode)) - vectors).max()
+    assert err < (1e-3 if mode == "float16" else 2e-3)
+
+
+def test_sidecar_follows_compaction_into_a_new_file(workdir):
+    rng = np.random.default_rng(5)
+    store = get_store("face_recognition")
+    store.append("a", rng.normal(0, 0.1, (4, 128)).astype(np.float32))
+    store.append("b", rng.normal(0, 0.1, (4, 128)).astype(np.float32))
+    store.append("a", rng.normal(0, 0.1, (4, 128)).astype(np.float32))
+    before, _ = load_voter_quantized("b", mode="int8")
+
+    store.compact()
+
+    after, entry = load_voter_quantized("b", mode="int8")
+    assert np.array_equal(after, before)
+    assert entry == (0, 4, 1)
+    assert len(load_voter_quantized("a", mode="int8")[0]) == 4
+
+
+def test_verify_distance_after_removal_is_no_enrollment(workdir):
+    store = get_store("face_recognition")
+    store.append("v@x.com", np.full((3, 128), 0.1, dtype=np.float32))
+    rows, entry = load_voter_quantized("v@x.com", mode="int8")
+
+    store.remove("v@x.com")
+
+    assert verify_distance("v@x.com", rows, np.zeros(128, np.float32)) is None
+
+
+def test_verify_distance_rescores_the_rows_it_was_given(workdir):
+    rng = np.random.default_rng(6)
+    store = get_store("face_recognition")
+    enrolled = rng.normal(0, 0.1, (6, 128)).astype(np.float32)
+    store.append("v@x.com", enrolled)
+    rows, entry = load_voter_quantized("v@x.com", mode="int8")
+
+    # Re-enrolled after the compact rows were loaded: different rows and count
+    store.append("v@x.com", rng.normal(0, 0.1, (2, 128)).astype(np.float32))
+
+    login = enrolled[4] + 0.001
+    distance = verify_distance("v@x.com", rows, login, rerank=0, entry=entry)
+    assert distance == pytest.approx(float(np.linalg.norm(enrolled - login, axis=1).min()),
+                                     abs=1e-6)
+    # Without the entry the row counts no longer line up
+    assert verify_distance("v@x.com", rows, login, rerank=2) is None
@@ -0,0 +1,91 @@
+import pytest
+
+from bench_tally import CONTRACT, FakeChain
+from tally_indexer import REORG_DEPTH, TallyIndexer, TallyStore
+
+
+def _sync(indexer):
+    while indexer.sync_once():
+        pass
+
+
+def _assert_matches(store, chain, total_events):
+    votes, registered, voted = chain.recount()
+    results = store.results()
+    assert {c["id"]: c["votes"] for c in results["candidates"]} == votes
+    assert results["registered"] == registered
+    assert results["voted"] == voted
+    assert results["block"] == chain.block_number()
+    assert store.status()["events"] == total_events
+
+
+@pytest.fixture
+def chain():
+    # 3 candidates, ~400 voters (with repeat registrations), 10 events per block
+    return FakeChain(events=1000, candidates=3, per_block=10, seed=7)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TallyStore(str(tmp_path / "tally.sqlite"))
+    yield store
+    store._db.close()
+
+
+def test_shallow_reorg_rolls_back_and_reapplies(chain, store):
+    indexer = TallyIndexer(store, chain, CONTRACT, block_range=25)
+    _sync(indexer)
+    _assert_matches(store, chain, 1000)
+    before = store.results()
+
+    chain.reorg(5, seed=99)
+    _sync(indexer)
+
+    assert store.status()["reorgs"] == 1
+    assert store.results() != before
+    _assert_matches(store, chain, 1000)
+
+
+def test_reorg_deeper_than_kept_hashes_reindexes(chain, store, monkeypatch):
+    indexer = TallyIndexer(store, chain, CONTRACT, block_range=25)
+    _sync(indexer)
+
+    resets = []
+    reset = store.reset
+    monkeypatch.setattr(store, "reset", lambda: resets.append(1) or reset())
+
+    # Only the last REORG_DEPTH blocks' hashes are kept: no fork point
+    assert len(chain.blocks) > REORG_DEPTH + 10
+    chain.reorg(REORG_DEPTH + 10, seed=5)
+    _sync(indexer)
+
+    assert resets == [1]
+    _assert_matches(store, chain, 1000)
+
+
+def test_resume_from_checkpoint_does_not_double_count(chain, tmp_path):
+    path = str(tmp_path / "tally.sqlite")
+
+    first = TallyStore(path)
+    indexer = TallyIndexer(first, chain, CONTRACT, block_range=7)
+    for _ in range(5):
+        indexer.sync_once()
+    stopped_at, _ = first.checkpoint()
+    first._db.close()
+
+    resumed = TallyStore(path)
+    assert resumed.checkpoint()[0] == stopped_at
+    _sync(TallyIndexer(resumed, chain, CONTRACT, block_range=7))
+    _assert_matches(resumed, chain, 1000)
+    resumed._db.close()
+
+
+def test_rollback_uncounts_undone_events(chain, store):
+    indexer = TallyIndexer(store, chain, CONTRACT, block_range=25)
+    _sync(indexer)
+    head = chain.block_number()
+
+    undone = store.rollback(head - 3)
+
+    assert undone == sum(len(b) for b in chain.blocks[head - 2:])
+    assert store.status()["events"] == 1000 - undone
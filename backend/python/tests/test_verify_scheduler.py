@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import verify_scheduler
+from embedding_store import get_store
+
+
+@pytest.fixture
+def scheduler_for(monkeypatch):
+    """
+    Builds a scheduler whose "workers" return a fixed login encoding
+    per voter (image_bytes is the voter's login vector).
+    """
+    pools = []
+
+    def encode_chunk(items):
+        return [(np.frombuffer(data, dtype=np.float32), None, {"encode": 0.0})
+                for _, data in items]
+
+    monkeypatch.setattr(verify_scheduler, "_encode_chunk", encode_chunk)
+
+    def build(**kwargs):
+        pool = ThreadPoolExecutor(max_workers=2)
+        pools.append(pool)
+        return verify_scheduler.VerificationScheduler(pool, 2, window_ms=20, **kwargs)
+
+    yield build
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_scheduler_reads_the_active_backend_store(workdir, scheduler_for):
+    rng = np.random.default_rng(0)
+    robust = rng.random((3, 836), dtype=np.float32)
+    get_store("robust").append("v@x.com", robust)
+    # A dlib-sized template for the same voter must not be used
+    get_store("face_recognition").append("v@x.com", rng.random((3, 128), dtype=np.float32))
+
+    scheduler = scheduler_for(kind="robust")
+    result = scheduler.submit("v@x.com", robust[1].tobytes(), 0.5).result(timeout=5)
+
+    assert result["success"]
+    assert result["distance"] == pytest.approx(0.0)
+
+
+def test_batched_results_match_per_request_results(workdir, scheduler_for):
+    rng = np.random.default_rng(1)
+    store = get_store("face_recognition")
+    voters = [f"v{i}@x.com" for i in range(12)]
+    for i, voter_id in enumerate(voters):
+        store.append(voter_id, rng.normal(scale=0.1, size=(2 + i % 4, 128)).astype(np.float32))
+
+    requests = []
+    for i, voter_id in enumerate(voters):
+        # Own face, a stranger's face and an unenrolled voter
+        row = store.get(voter_id)[0]
+        noise = rng.normal(scale=0.02 * (i % 5), size=128)
+        login = (row + noise if i % 3 else store.get(voters[i - 1])[0]).astype(np.float32)
+        requests.append((voter_id, login, 0.3 + 0.05 * (i % 4)))
+    requests.append(("ghost@x.com", requests[0][1], 0.5))
+
+    batched = scheduler_for(max_batch=len(requests))
+    futures = [batched.submit(v, login.tobytes(), tol) for v, login, tol in requests]
+    together = [f.result(timeout=5) for f in futures]
+
+    one_by_one = scheduler_for(max_batch=1)
+    alone = [one_by_one.submit(v, login.tobytes(), tol).result(timeout=5)
+             for v, login, tol in requests]
+
+    assert max(r["batch_size"] for r in together) > 1
+    assert {r["success"] for r in together} == {True, False}
+    assert all(r["batch_size"] == 1 for r in alone)
+    for (voter_id, login, tolerance), a, b in zip(requests, together, alone):
+        for key in ("success", "reason", "outcome"):
+            assert a[key] == b[key]
+        if a["distance"] is None:
+            assert b["distance"] is None and voter_id == "ghost@x.com"
+            continue
+        exact = float(np.linalg.norm(store.get(voter_id) - login, axis=1).min())
+        assert a["distance"] == pytest.approx(exact, abs=1e-6)
+        assert b["distance"] == pytest.approx(exact, abs=1e-6)
+        assert a["success"] == (exact < tolerance)
@@ -0,0 +1,194 @@
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from embedding_store import load_voter_embeddings
+from encoder_backends import get_backend
+from face_metrics import outcome_for, record
+
+# -------------------------------------------------------------
+# MICRO-BATCHED VERIFICATION SCHEDULER
+#
+# Requests are collected for up to `window_ms` (or until `max_batch`
+# are waiting), the batch is split across the worker processes for
+# decode / detection / encoding, and all distances for the batch are
+# then computed in one vectorized pass. Every caller still gets its own
+# Future with its own result dict.
+# -------------------------------------------------------------
+
+LATENCY_SAMPLES = 2048
+
+
+def _encode_chunk(items):
+    import face_recog
+    return face_recog.encode_logins(items)
+
+
+def batch_min_distances(stored_list, logins):
+    """
+    Minimum L2 distance between each login encoding and its own voter's
+    stored encodings, for the whole batch at once.
+
+    stored_list[i] is a (n_i, dim) array, logins is (B, dim).
+    """
+    counts = np.array([len(s) for s in stored_list])
+    stored = np.concatenate(stored_list).astype(np.float64, copy=False)
+    owner = np.repeat(np.arange(len(stored_list)), counts)
+
+    dist = np.linalg.norm(stored - logins[owner], axis=1)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    return np.minimum.reduceat(dist, starts)
+
+
+class VerificationScheduler:
+    def __init__(self, pool, workers, window_ms=10, max_batch=32, kind=None):
+        self.pool = pool
+        # Store the workers' encoder (FACE_ENCODER) enrolled into
+        self.kind = kind or get_backend().kind
+        self.workers = workers
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self._batch_sizes = collections.deque(maxlen=LATENCY_SAMPLES)
+        self._batches = 0
+        self._requests = 0
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # ---------------------------------------------------------
+    # PUBLIC API
+    # ---------------------------------------------------------
+    def submit(self, voter_id, image_bytes=None, tolerance=0.5):
+        future = Future()
+        self._queue.put((voter_id, image_bytes, tolerance, future, time.perf_counter()))
+        return future
+
+    def metrics(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            sizes = list(self._batch_sizes)
+            batches, requests = self._batches, self._requests
+
+        def pct(q):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2)
+
+        return {
+            "queue_depth": self._queue.qsize(),
+            "batches": batches,
+            "requests": requests,
+            "mean_batch_size": round(float(np.mean(sizes)), 2) if sizes else None,
+            "max_batch_size": max(sizes) if sizes else None,
+            "p50_ms": pct(0.50),
+            "p99_ms": pct(0.99),
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+        }
+
+    # ---------------------------------------------------------
+    # BATCHING LOOP
+    # ---------------------------------------------------------
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except Exception as e:
+                for *_, future, _ in batch:
+                    if not future.done():
+                        future.set_result({"success": False, "distance": None,
+                                           "reason": f"Scheduler error: {e}", "timings": {}})
+
+    def _process(self, batch):
+        results = [None] * len(batch)
+        pending = []
+
+        # Stored encodings are looked up in this process (memmap views),
+        # so voters without an enrollment never reach a worker.
+        stored = []
+        for i, (voter_id, image_bytes, tolerance, future, _) in enumerate(batch):
+            emb = load_voter_embeddings(voter_id, self.kind)
+            if emb is None:
+                results[i] = {"success": False, "distance": None,
+                              "reason": "Encoding file NOT FOUND", "timings": {}}
+            else:
+                pending.append(i)
+                stored.append(emb)
+
+        # Fan the frames out over the worker processes in contiguous chunks
+        encoded = []
+        if pending:
+            chunk = -(-len(pending) // self.workers)
+            futures = [
+                self.pool.submit(_encode_chunk,
+                                 [(batch[i][0], batch[i][1]) for i in pending[s:s + chunk]])
+                for s in range(0, len(pending), chunk)
+            ]
+            for f in futures:
+                encoded.extend(f.result())
+
+        ok = [(k, i) for k, i in enumerate(pending) if encoded[k][0] is not None]
+        for k, i in enumerate(pending):
+            enc, reason, timings = encoded[k]
+            if enc is None:
+                results[i] = {"success": False, "distance": None, "reason": reason,
+                              "timings": timings}
+
+        # One vectorized distance pass for every encoded login in the batch
+        if ok:
+            t = time.perf_counter()
+            logins = np.stack([encoded[k][0] for k, _ in ok])
+            best = batch_min_distances([stored[k] for k, _ in ok], logins)
+            compare_ms = round((time.perf_counter() - t) * 1000, 3)
+
+            for (k, i), distance in zip(ok, best):
+                tolerance = batch[i][2]
+                distance = float(distance)
+                timings = dict(encoded[k][2], compare=compare_ms)
+                if distance < tolerance:
+                    results[i] = {"success": True, "distance": distance,
+                                  "reason": "Match", "timings": timings}
+                else:
+                    results[i] = {"success": False, "distance": distance,
+                                  "reason": "Distance >= tolerance", "timings": timings}
+
+        for (voter_id, *_), result in zip(batch, results):
+            result["outcome"] = outcome_for(result["reason"])
+            record("verify", {"voter_id": voter_id, "success": result["success"],
+                              "outcome": result["outcome"],
+                              "distance": result["distance"], "batch_size": len(batch)},
+                   result["timings"])
+
+        now = time.perf_counter()
+        with self._lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._batch_sizes.append(len(batch))
+            for *_, enqueued in batch:
+                self._latencies.append(now - enqueued)
+
+        for (voter_id, _, _, future, _), result in zip(batch, results):
+            result["batch_size"] = len(batch)
+            future.set_result(result)
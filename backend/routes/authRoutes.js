@@ -3,7 +3,9 @@ import {
   registerUser,
   loginUser,
   verifyFace,
-  checkWalletExists
+  checkWalletExists,
+  enrollmentStatus,
+  enrollmentMetrics
 } from "../controllers/authController.js";
 
 import {
@@ -11,7 +13,8 @@ import {
   getElections,
   deleteElection,
   castVote,
-  fetchElectionResults
+  fetchElectionResults,
+  fetchChainResults
 } from "../controllers/electionController.js";
 
 import { fetchUserProfile } from "../controllers/profileController.js";
@@ -23,6 +26,8 @@ router.post("/register", registerUser);
 router.post("/login", loginUser);
 router.post("/verify-face", verifyFace);
 router.post("/check-wallet", checkWalletExists);
+router.get("/enrollment/metrics", enrollmentMetrics);
+router.get("/enrollment/:email", enrollmentStatus);
 
 /* ELECTION */
 router.post("/election/create", createElection);
@@ -31,6 +36,7 @@ router.get("/election/all", getElections);
 router.post("/election/vote", castVote);  
 // router.get("/election/results", fetchElectionResults);
 router.get("/election/all-results", fetchElectionResults);
+router.get("/election/chain-results", fetchChainResults);
 
 
 router.delete("/election/:id", deleteElection); 
@@ -0,0 +1,194 @@
+import { ethers } from "ethers";
+
+/* ============================================================
+   BATCHED + PIPELINED CONTRACT WRITES
+
+   Starting an election used to send one registerVoter transaction per
+   voter and wait for its confirmation before sending the next, so it
+   took one block per voter. Here:
+
+   - entries are packed into registerVoters(address[]) /
+     addCandidates(string[]) calls, each chunk sized from a gas
+     estimate to use at most BATCH_GAS_FRACTION of the block gas limit
+   - transactions are sent with locally assigned nonces, keeping up to
+     TX_MAX_IN_FLIGHT unconfirmed at once, and confirmed in order
+
+   Against a contract deployed before the batch functions existed (no
+   selector in its code, or an estimate that reverts without data), the
+   single-entry functions are used instead, still pipelined. Any other
+   revert of the estimate is thrown to the caller.
+============================================================ */
+
+const MAX_IN_FLIGHT = Number(process.env.TX_MAX_IN_FLIGHT || 16);
+const BATCH_GAS_FRACTION = Number(process.env.BATCH_GAS_FRACTION || 0.5);
+const PROBE_SIZE = 20;
+
+// The batch entry points, in case the ABI the contract was built with
+// predates them
+const BATCH_ABI = [
+  "function registerVoters(address[] _voters)",
+  "function addCandidates(string[] _names)",
+];
+
+const withBatchAbi = (contract) => {
+  const missing = BATCH_ABI.map((f) => ethers.Fragment.from(f))
+    .filter((f) => !contract.interface.getFunction(f.name));
+  if (missing.length === 0) return contract;
+  return new ethers.Contract(contract.target, [...contract.interface.fragments, ...missing],
+    contract.runner);
+};
+
+// A deployed contract without the function has no dispatch entry for its
+// selector; calling it anyway reverts without revert data. A revert that
+// carries data (or a reason) is the function itself refusing, e.g.
+// "Election already started", and must reach the caller.
+const deployedHasFunction = async (contract, name) => {
+  const code = await contract.runner.provider.getCode(contract.target);
+  const selector = contract.interface.getFunction(name).selector.slice(2);
+  return code.toLowerCase().includes(selector);
+};
+
+const isMissingFunction = (err) =>
+  err.code === "CALL_EXCEPTION" && !err.reason && !err.revert && (!err.data || err.data === "0x");
+
+const isNonceError = (err) =>
+  err.code === "NONCE_EXPIRED" || /nonce/i.test(err.message || "");
+
+/* ------------------------------------------------------------
+   sendPipelined(signer, requests)
+
+   `requests` are functions (overrides) => Promise<TransactionResponse>.
+   They are sent in order with consecutive nonces; at most maxInFlight
+   are left unconfirmed before the oldest is awaited. Returns one
+   { index, hash, gasUsed, ok, error } per request, in order.
+------------------------------------------------------------ */
+export const sendPipelined = async (signer, requests, { maxInFlight = MAX_IN_FLIGHT } = {}) => {
+  const results = new Array(requests.length);
+  const inFlight = [];
+  let nonce = await signer.getNonce("pending");
+
+  const settle = async ({ index, tx }) => {
+    try {
+      const receipt = await tx.wait();
+      results[index] = { index, hash: tx.hash, gasUsed: receipt.gasUsed, ok: receipt.status === 1 };
+    } catch (err) {
+      results[index] = { index, hash: tx.hash, gasUsed: err.receipt?.gasUsed ?? 0n, ok: false, error: err.shortMessage || err.message };
+    }
+  };
+
+  for (let index = 0; index < requests.length; index++) {
+    if (inFlight.length >= maxInFlight) await settle(inFlight.shift());
+
+    let tx;
+    for (let attempt = 0; attempt < 2 && !tx; attempt++) {
+      try {
+        tx = await requests[index]({ nonce });
+        nonce++;
+      } catch (err) {
+        // A rejected send does not use its nonce; resync in case another
+        // sender (or a dropped transaction) moved the account's nonce
+        nonce = await signer.getNonce("pending");
+        if (attempt === 1 || !isNonceError(err)) {
+          results[index] = { index, hash: null, gasUsed: 0n, ok: false, error: err.shortMessage || err.message };
+          break;
+        }
+      }
+    }
+    if (tx) inFlight.push({ index, tx });
+  }
+
+  for (const pending of inFlight) await settle(pending);
+  return results;
+};
+
+/* ------------------------------------------------------------
+   Chunk sizing: gas(n) ~ base + n * perEntry, measured with two
+   estimates on probe entries that are as expensive as real ones.
+------------------------------------------------------------ */
+const gasModel = async (estimate, probe) => {
+  const one = await estimate(probe.slice(0, 1));
+  const many = await estimate(probe);
+  const perEntry = (many - one) / BigInt(Math.max(1, probe.length - 1)) || one;
+  return { perEntry, base: one > perEntry ? one - perEntry : 0n };
+};
+
+const chunkEntries = async (contract, entries, model) => {
+  const block = await contract.runner.provider.getBlock("latest");
+  const budget = (block.gasLimit * BigInt(Math.round(BATCH_GAS_FRACTION * 100))) / 100n;
+  const size = Math.max(1, Number((budget - model.base) / model.perEntry));
+
+  const chunks = [];
+  for (let i = 0; i < entries.length; i += size) chunks.push(entries.slice(i, i + size));
+  return chunks;
+};
+
+// 20% headroom over the model, so chunks do not need their own estimate
+const chunkGasLimit = (model, n) => ((model.base + model.perEntry * BigInt(n)) * 12n) / 10n;
+
+const summarise = (results, chunks) => {
+  const failed = results.filter((r) => !r.ok);
+  return {
+    transactions: results.length,
+    entries: chunks.reduce((n, c) => n + c.length, 0),
+    failedEntries: failed.reduce((n, r) => n + chunks[r.index].length, 0),
+    gasUsed: results.reduce((g, r) => g + BigInt(r.gasUsed), 0n),
+    errors: failed.map((r) => r.error),
+  };
+};
+
+const batchedWrite = async (contract, entries, { batchFn, singleFn, probe }) => {
+  if (entries.length === 0) return { transactions: 0, entries: 0, failedEntries: 0, gasUsed: 0n, errors: [] };
+
+  const batched = withBatchAbi(contract);
+  const signer = contract.runner;
+
+  let model = null;
+  let missing = !(await deployedHasFunction(batched, batchFn));
+  if (!missing) {
+    try {
+      model = await gasModel((chunk) => batched[batchFn].estimateGas(chunk), probe);
+    } catch (err) {
+      if (!isMissingFunction(err)) throw err;
+      missing = true;
+    }
+  }
+
+  if (missing) {
+    console.log(`⚠️ ${batchFn} not deployed, sending ${singleFn} per entry`);
+    const chunks = entries.map((e) => [e]);
+    const results = await sendPipelined(
+      signer,
+      entries.map((e) => (overrides) => contract[singleFn](e, overrides))
+    );
+    return summarise(results, chunks);
+  }
+
+  const chunks = await chunkEntries(contract, entries, model);
+  const results = await sendPipelined(
+    signer,
+    chunks.map((chunk) => (overrides) =>
+      batched[batchFn](chunk, { ...overrides, gasLimit: chunkGasLimit(model, chunk.length) }))
+  );
+  return summarise(results, chunks);
+};
+
+/* ------------------------------------------------------------
+   PUBLIC
+------------------------------------------------------------ */
+export const registerVotersBatched = (contract, addresses) =>
+  batchedWrite(contract, [...new Set(addresses)], {
+    batchFn: "registerVoters",
+    singleFn: "registerVoter",
+    // Fresh addresses: never registered, so the estimate is the worst case
+    probe: Array.from({ length: PROBE_SIZE }, () => ethers.getAddress(ethers.hexlify(ethers.randomBytes(20)))),
+  });
+
+export const addCandidatesBatched = (contract, names) => {
+  // The longest names make the most expensive probe
+  const longest = [...names].sort((a, b) => b.length - a.length)[0];
+  return batchedWrite(contract, names, {
+    batchFn: "addCandidates",
+    singleFn: "addCandidate",
+    probe: Array.from({ length: Math.min(PROBE_SIZE, Math.max(2, names.length)) }, () => longest),
+  });
+};
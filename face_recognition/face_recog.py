@@ -1,8 +1,22 @@
 import cv2
-import face_recognition
 import numpy as np
 import os
 import sys
+import threading
+import time
+
+# dlib and its models take most of the start-up time, so face_recognition
+# is imported only once the voter is known to have encodings
+face_recognition = None
+
+
+def _load_face_recognition():
+    global face_recognition
+    if face_recognition is None:
+        import face_recognition as fr
+        face_recognition = fr
+    return face_recognition
+
 
 def verify_voter(voter_id, tolerance=0.5):
     encodings_dir = "encodings"
@@ -13,6 +27,7 @@ def verify_voter(voter_id, tolerance=0.5):
         return False
 
     stored_encodings = np.load(face_rec_file)
+    _load_face_recognition()
 
     cap = cv2.VideoCapture(0)
     print("[INFO] Please look at the camera...")
@@ -48,9 +63,288 @@ def verify_voter(voter_id, tolerance=0.5):
     cv2.destroyAllWindows()
     return False
 
+# -------------------------------------------------------------
+# PIPELINED KIOSK MODE
+#
+# capture thread : reads the camera as fast as it delivers and keeps only
+#                  the newest frame, so nobody ever works on a stale one
+# worker thread  : detection (HOG) on a downscaled frame every Nth frame,
+#                  template-match tracking of the box in between; once the
+#                  box has held still for a few frames the face is encoded
+#                  at full resolution and compared
+# main thread    : preview only, with the tracked box, preview FPS and
+#                  time-to-verify drawn on the frame
+# -------------------------------------------------------------
+# dlib's HOG detector finds faces down to about 80 px, 40 px with the
+# one upsample face_locations does by default. The detection scale is
+# chosen so the smallest face the kiosk should find (a voter standing at
+# the back of the booth, ~80 px across at 640x480) still reaches that.
+HOG_MIN_FACE = 40
+KIOSK_MIN_FACE = int(os.environ.get("FACE_KIOSK_MIN_FACE", "80"))
+KIOSK_SCALE = min(1.0, HOG_MIN_FACE / KIOSK_MIN_FACE)
+
+# Give up after this long overall, or once the camera has delivered no
+# new frame for NO_FRAME_TIMEOUT seconds (unplugged, held by another app)
+KIOSK_TIMEOUT = float(os.environ.get("FACE_KIOSK_TIMEOUT", "60"))
+NO_FRAME_TIMEOUT = 5.0
+
+
+class LatestFrame:
+    """Camera reader thread that keeps only the most recent frame."""
+
+    def __init__(self, cap):
+        self.cap = cap
+        self._frame = None
+        self._seq = 0
+        self._cond = threading.Condition()
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                time.sleep(0.005)
+                continue
+            with self._cond:
+                self._frame = frame
+                self._seq += 1
+                self._cond.notify_all()
+
+    def read(self, after=0, timeout=1.0):
+        """Waits for a frame newer than `after`; returns (seq, frame)."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after or not self.running, timeout)
+            return self._seq, self._frame
+
+    def stop(self):
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        self._thread.join(timeout=1.0)
+
+
+def _track(gray, template, box, search=0.5):
+    """
+    Finds `template` (the face crop from the last detection) near `box`
+    in `gray` by normalised cross-correlation. Returns (box, score).
+    """
+    top, right, bottom, left = box
+    h, w = bottom - top, right - left
+    pad_y, pad_x = int(h * search), int(w * search)
+    y0, x0 = max(0, top - pad_y), max(0, left - pad_x)
+    y1, x1 = min(gray.shape[0], bottom + pad_y), min(gray.shape[1], right + pad_x)
+
+    region = gray[y0:y1, x0:x1]
+    if region.shape[0] < h or region.shape[1] < w:
+        return box, 0.0
+
+    scores = cv2.matchTemplate(region, template, cv2.TM_CCOEFF_NORMED)
+    _, score, _, (dx, dy) = cv2.minMaxLoc(scores)
+    top, left = y0 + dy, x0 + dx
+    return (top, left + w, top + h, left), score
+
+
+class KioskVerifier:
+    def __init__(self, stored_encodings, tolerance=0.5, detect_every=5, scale=KIOSK_SCALE,
+                 stable_frames=3, max_shift=0.08, min_track_score=0.5):
+        self.stored = stored_encodings
+        self.tolerance = tolerance
+        self.detect_every = detect_every
+        self.scale = scale
+        self.stable_frames = stable_frames
+        self.max_shift = max_shift
+        self.min_track_score = min_track_score
+
+        self.lock = threading.Lock()
+        self.box = None           # full-resolution (top, right, bottom, left)
+        self.status = "Looking for a face..."
+        self.result = None        # (success, distance) once decided
+        self.counters = {"frames": 0, "detections": 0, "tracked": 0, "encodes": 0}
+
+    def _detect(self, small):
+        rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+        boxes = face_recognition.face_locations(rgb, model="hog")
+        self.counters["detections"] += 1
+        if not boxes:
+            return None
+        return max(boxes, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]))
+
+    def _encode(self, frame, small_box):
+        # Scale the tracked box back up and encode at full resolution
+        top, right, bottom, left = (int(round(v / self.scale)) for v in small_box)
+        h, w = frame.shape[:2]
+        box = (max(0, top), min(w, right), min(h, bottom), max(0, left))
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        self.counters["encodes"] += 1
+        encodings = face_recognition.face_encodings(rgb, [box])
+        if not encodings:
+            return None
+        return float(np.min(face_recognition.face_distance(self.stored, encodings[0])))
+
+    def run(self, frames, stop):
+        """Worker loop; stops once a match is found or `stop` is set."""
+        seq = 0
+        small_box = template = None
+        steady = 0
+
+        while not stop.is_set():
+            seq, frame = frames.read(after=seq)
+            if frame is None:
+                continue
+            self.counters["frames"] += 1
+
+            small = cv2.resize(frame, None, fx=self.scale, fy=self.scale,
+                               interpolation=cv2.INTER_AREA)
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+            previous = small_box
+            if (small_box is None or template is None or template.size == 0
+                    or self.counters["frames"] % self.detect_every == 0):
+                small_box = self._detect(small)
+            else:
+                small_box, score = _track(gray, template, small_box)
+                self.counters["tracked"] += 1
+                if score < self.min_track_score:
+                    small_box = self._detect(small)
+
+            if small_box is None:
+                steady = 0
+                with self.lock:
+                    self.box = None
+                    self.status = "Looking for a face..."
+                continue
+
+            top, right, bottom, left = small_box
+            template = gray[top:bottom, left:right].copy()
+
+            # The face is "stable" once its centre has moved by less than
+            # max_shift of the box size for stable_frames frames in a row
+            if previous is not None:
+                size = max(1, right - left)
+                shift = np.hypot((top + bottom - previous[0] - previous[2]) / 2,
+                                 (left + right - previous[1] - previous[3]) / 2)
+                steady = steady + 1 if shift / size < self.max_shift else 0
+
+            with self.lock:
+                self.box = tuple(int(round(v / self.scale)) for v in small_box)
+                self.status = "Hold still..." if steady < self.stable_frames else "Verifying..."
+
+            if steady < self.stable_frames:
+                continue
+
+            distance = self._encode(frame, small_box)
+            steady = 0
+            if distance is None:
+                continue
+
+            if distance < self.tolerance:
+                print(f"[SUCCESS] Face matched (Distance: {distance:.4f})")
+                with self.lock:
+                    self.result = (True, distance)
+                    self.status = f"Verified ({distance:.3f})"
+                return
+            print(f"[FAILED] Face does not match (Best Distance: {distance:.4f})")
+            with self.lock:
+                self.status = f"No match ({distance:.3f})"
+
+
+def verify_voter_kiosk(voter_id, tolerance=0.5, detect_every=5, scale=KIOSK_SCALE,
+                       stable_frames=3, timeout=KIOSK_TIMEOUT, camera=0):
+    encodings_dir = "encodings"
+    face_rec_file = os.path.join(encodings_dir, f"{voter_id}_face_recognition.npy")
+
+    if not os.path.exists(face_rec_file):
+        print("[ERROR] No encoding file found for this voter.")
+        return False
+
+    stored_encodings = np.load(face_rec_file)
+    _load_face_recognition()
+
+    cap = cv2.VideoCapture(camera)
+    if not cap.isOpened():
+        print("[ERROR] Could not open webcam.")
+        return False
+    print("[INFO] Please look at the camera...")
+
+    frames = LatestFrame(cap)
+    verifier = KioskVerifier(stored_encodings, tolerance, detect_every, scale, stable_frames)
+    stop = threading.Event()
+    worker = threading.Thread(target=verifier.run, args=(frames, stop), daemon=True)
+
+    start = time.perf_counter()
+    worker.start()
+
+    shown = 0
+    fps = 0.0
+    fps_t = time.perf_counter()
+    last_log = start
+    last_frame = start
+    seq = 0
+
+    try:
+        while True:
+            previous = seq
+            seq, frame = frames.read(after=seq)
+            now = time.perf_counter()
+            elapsed = now - start
+            if timeout is not None and elapsed > timeout:
+                print(f"[INFO] Timed out after {elapsed:.1f}s")
+                return False
+            if seq != previous:
+                last_frame = now
+            elif now - last_frame > NO_FRAME_TIMEOUT:
+                print(f"[ERROR] No frame from the camera for {NO_FRAME_TIMEOUT:.0f}s")
+                return False
+            if frame is None or seq == previous:
+                continue
+            frame = frame.copy()
+
+            shown += 1
+            if now - fps_t >= 1.0:
+                fps = shown / (now - fps_t)
+                shown, fps_t = 0, now
+
+            with verifier.lock:
+                box, status, result = verifier.box, verifier.status, verifier.result
+
+            if box is not None:
+                top, right, bottom, left = box
+                color = (0, 255, 0) if result else (0, 200, 255)
+                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+
+            cv2.putText(frame, f"FPS: {fps:.1f}", (10, 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+            cv2.putText(frame, f"{status}  {elapsed:.1f}s", (10, 60),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+            cv2.imshow("Verification", frame)
+
+            if now - last_log >= 5.0:
+                print(f"[INFO] Preview {fps:.1f} FPS | worker {verifier.counters}")
+                last_log = now
+
+            if result is not None:
+                print(f"[INFO] Time to verify: {elapsed:.2f}s | preview {fps:.1f} FPS "
+                      f"| worker {verifier.counters}")
+                cv2.waitKey(500)
+                return True
+
+            if cv2.waitKey(1) & 0xFF == ord("q"):
+                return False
+    finally:
+        stop.set()
+        frames.stop()
+        worker.join(timeout=2.0)
+        cap.release()
+        cv2.destroyAllWindows()
+
+
 if __name__ == "__main__":
     voter_id = sys.argv[1]
-    if verify_voter(voter_id):
+    # --kiosk: threaded capture, frame-skipping detection and tracking
+    verify = verify_voter_kiosk if "--kiosk" in sys.argv[2:] else verify_voter
+    if verify(voter_id):
         print("SUCCESS")
     else:
         print("FAILED")
@@ -1,31 +1,181 @@
 import cv2
-import face_recognition
+import importlib.util
+import io
 import os
 import sys
 import numpy as np
-from PIL import Image
-from sklearn.preprocessing import normalize
-import mediapipe as mp
+
+# face_recognition (dlib + models), MediaPipe and PIL are slow to import;
+# each is loaded only on the path that uses it, after the early exits.
+face_recognition = None
+
+
+def _load_face_recognition():
+    global face_recognition
+    if face_recognition is None:
+        import face_recognition as fr
+        face_recognition = fr
+    return face_recognition
+
+
+def l2_normalize(vector):
+    """
+    sklearn.preprocessing.normalize for one vector, without importing
+    scikit-learn: same row-norm einsum, zero vectors left unchanged.
+    """
+    row = np.asarray(vector)[None, :]
+    if row.dtype not in (np.float32, np.float64):
+        row = row.astype(np.float64)
+    norm = np.sqrt(np.einsum("ij,ij->i", row, row))
+    norm[norm == 0.0] = 1.0
+    return (row / norm[:, None])[0]
+
+
+# -------------------------------------------------------------
+# VECTORIZED FEATURES (mirrors backend/python/feature_encoding.py)
+# -------------------------------------------------------------
+HOG_CELL_SIZE = 16
+HOG_BINS = 9
+LBP_STEP = 8
+LBP_BINS = 256
+EXTRACT_CHUNK = 4  # images per pass in extract_features_batch
+
+# Same edges np.histogram(bins=9, range=(-pi, pi)) builds internally, so
+# the bin lookup below lands every angle in exactly the same bin.
+_HOG_EDGES = np.histogram_bin_edges([], bins=HOG_BINS, range=(-np.pi, np.pi))
+_HOG_SCALE = HOG_BINS / (_HOG_EDGES[-1] - _HOG_EDGES[0])
+
+# Neighbour offsets in the bit order of the original per-pixel LBP loop.
+_LBP_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1))
+
+
+def _sobel(gray_stack):
+    """
+    3x3 Sobel x / y derivatives of an (N, H, W) uint8 stack as float64,
+    equal to cv2.Sobel(img, cv2.CV_64F, ..., ksize=3) per image: the
+    border is reflected the same way (BORDER_REFLECT_101, numpy's
+    "reflect") and the integer sums convert to float64 exactly.
+    """
+    padded = np.pad(gray_stack.astype(np.int16), ((0, 0), (1, 1), (1, 1)), mode="reflect")
+    dx = padded[:, :, 2:] - padded[:, :, :-2]
+    gx = dx[:, :-2] + 2 * dx[:, 1:-1] + dx[:, 2:]
+    sy = padded[:, :, :-2] + 2 * padded[:, :, 1:-1] + padded[:, :, 2:]
+    gy = sy[:, 2:] - sy[:, :-2]
+    return gx.astype(np.float64), gy.astype(np.float64)
+
+
+def _hog_histograms(gray_stack):
+    """
+    Magnitude-weighted orientation histograms for every 16x16 cell of an
+    (N, H, W) uint8 stack, returned as (N, cells * 9) float64.
+
+    All cells of all images are binned with a single bincount. Within a
+    (image, cell, bin) slot the weights are summed in row-major order of
+    the cell, which is the order np.histogram used per cell, so the sums
+    are bit-identical to the old loop.
+    """
+    n, h, w = gray_stack.shape
+    gx, gy = _sobel(gray_stack)
+    magnitude = np.sqrt(gx**2 + gy**2)
+    angle = np.arctan2(gy, gx)
+
+    # Estimate the bin arithmetically, then step it onto the right side
+    # of the actual edges (cheaper than a searchsorted per pixel)
+    bins = ((angle - _HOG_EDGES[0]) * _HOG_SCALE).astype(np.intp)
+    np.clip(bins, 0, HOG_BINS - 1, out=bins)  # angle == pi goes in the last bin
+    bins -= angle < _HOG_EDGES[bins]
+    bins += (angle >= _HOG_EDGES[bins + 1]) & (bins < HOG_BINS - 1)
+
+    cells_y = -(-h // HOG_CELL_SIZE)
+    cells_x = -(-w // HOG_CELL_SIZE)
+    n_cells = cells_y * cells_x
+    cell_ids = ((np.arange(h) // HOG_CELL_SIZE)[:, None] * cells_x
+                + (np.arange(w) // HOG_CELL_SIZE)[None, :])
+
+    keys = (np.arange(n)[:, None, None] * n_cells + cell_ids) * HOG_BINS + bins
+    hist = np.bincount(keys.ravel(), weights=magnitude.ravel(),
+                       minlength=n * n_cells * HOG_BINS)
+    return hist.reshape(n, n_cells * HOG_BINS)
+
+
+def _lbp_histograms(gray_stack):
+    """
+    256-bin histogram of 8-neighbour LBP codes sampled every 8 pixels,
+    for an (N, H, W) uint8 stack. Returns (N, 256) int64 counts.
+    """
+    n, h, w = gray_stack.shape
+    center = gray_stack[:, 1:h - 1:LBP_STEP, 1:w - 1:LBP_STEP]
+
+    codes = np.zeros(center.shape, dtype=np.int64)
+    for bit, (dy, dx) in enumerate(_LBP_OFFSETS):
+        neighbor = gray_stack[:, 1 + dy:h - 1 + dy:LBP_STEP, 1 + dx:w - 1 + dx:LBP_STEP]
+        codes |= (neighbor >= center).astype(np.int64) << bit
+
+    keys = np.arange(n)[:, None, None] * LBP_BINS + codes
+    return np.bincount(keys.ravel(), minlength=n * LBP_BINS).reshape(n, LBP_BINS)
+
+
+def _gray_stats(gray_stack):
+    """
+    [mean, std, median, var] of every image of an (N, H, W) uint8 stack,
+    bit-identical to np.mean / np.std / np.median / np.var per image.
+    Each row is reduced on its own, in the same pairwise order; std is
+    sqrt(var) as np.std computes it, and the median is read off a
+    256-bin histogram of the image instead of a partition.
+    """
+    n = len(gray_stack)
+    flat = gray_stack.reshape(n, -1)
+    size = flat.shape[1]
+
+    var = flat.var(axis=1)
+    counts = np.bincount((np.arange(n)[:, None] * 256 + flat).ravel(),
+                         minlength=n * 256).reshape(n, 256)
+    cumulative = counts.cumsum(axis=1)
+    lower = (cumulative > (size - 1) // 2).argmax(axis=1)
+    upper = (cumulative > size // 2).argmax(axis=1)
+
+    return np.column_stack([flat.mean(axis=1), np.sqrt(var), (lower + upper) / 2.0, var])
+
 
 class RobustFaceEncoder:
     def __init__(self):
-        try:
-            self.mp_face_detection = mp.solutions.face_detection
-            self.face_detection = self.mp_face_detection.FaceDetection(
-                model_selection=0, min_detection_confidence=0.5
-            )
-            self.mediapipe_available = True
-        except:
-            self.mediapipe_available = False
-            print("⚠️ MediaPipe not available - install with: pip install mediapipe scikit-learn")
+        # The MediaPipe detector is built on first use
+        self._face_detection = None
+        self.mediapipe_available = importlib.util.find_spec("mediapipe") is not None
+        if not self.mediapipe_available:
+            print("⚠️ MediaPipe not available - install with: pip install mediapipe")
+
+    @property
+    def face_detection(self):
+        if self._face_detection is None and self.mediapipe_available:
+            try:
+                import mediapipe as mp
+                self.mp_face_detection = mp.solutions.face_detection
+                self._face_detection = self.mp_face_detection.FaceDetection(
+                    model_selection=0, min_detection_confidence=0.5
+                )
+            except Exception:
+                self.mediapipe_available = False
+                print("⚠️ MediaPipe not available - install with: pip install mediapipe")
+        return self._face_detection
 
     def extract_face_features(self, image):
         """Extract face features using MediaPipe"""
         if not self.mediapipe_available:
             return None
-            
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = self.face_detection.process(rgb_image)
+
+        return self.extract_face_features_rgb(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+    def extract_face_features_rgb(self, image):
+        """Same as extract_face_features, for an image that is already RGB"""
+        if not self.mediapipe_available:
+            return None
+
+        detector = self.face_detection
+        if detector is None:
+            return None
+
+        results = detector.process(image)
         
         if not results.detections:
             return None
@@ -55,90 +205,131 @@ class RobustFaceEncoder:
         
         # Resize to standard size and create feature vector
         face_resized = cv2.resize(face_region, (128, 128))
-        face_gray = cv2.cvtColor(face_resized, cv2.COLOR_BGR2GRAY)
+        face_gray = cv2.cvtColor(face_resized, cv2.COLOR_RGB2GRAY)
         
         # Create feature vector using multiple methods
         features = self._extract_combined_features(face_gray)
         return features
 
+    def extract_features_batch(self, face_stack):
+        """Extract combined features for an (N, 128, 128) grayscale face stack"""
+        face_stack = np.asarray(face_stack, dtype=np.uint8)
+        if face_stack.ndim == 2:
+            face_stack = face_stack[None]
+
+        # A few images per pass: the float64 gradient planes of a large
+        # stack fall out of cache, which costs more than the per-call
+        # overhead batching saves
+        parts = []
+        for s in range(0, len(face_stack), EXTRACT_CHUNK):
+            chunk = face_stack[s:s + EXTRACT_CHUNK]
+            parts.append(np.hstack([
+                _hog_histograms(chunk),                     # 1. HOG-like features
+                _lbp_histograms(chunk).astype(np.float64),  # 2. LBP-like features
+                _gray_stats(chunk),                         # 3. Statistical features
+            ]))
+        return np.concatenate(parts).astype(np.float32)
+
     def _extract_combined_features(self, face_gray):
         """Extract combined features from face"""
-        features = []
-        
-        # 1. HOG-like features
-        grad_x = cv2.Sobel(face_gray, cv2.CV_64F, 1, 0, ksize=3)
-        grad_y = cv2.Sobel(face_gray, cv2.CV_64F, 0, 1, ksize=3)
-        magnitude = np.sqrt(grad_x**2 + grad_y**2)
-        angle = np.arctan2(grad_y, grad_x)
-        
-        # Compute histogram of gradients
-        cell_size = 16
-        for i in range(0, face_gray.shape[0], cell_size):
-            for j in range(0, face_gray.shape[1], cell_size):
-                cell_mag = magnitude[i:i+cell_size, j:j+cell_size]
-                cell_angle = angle[i:i+cell_size, j:j+cell_size]
-                
-                hist, _ = np.histogram(cell_angle, bins=9, range=(-np.pi, np.pi), 
-                                     weights=cell_mag)
-                features.extend(hist)
-        
-        # 2. LBP-like features (Local Binary Patterns)
-        lbp_features = self._extract_lbp_features(face_gray)
-        features.extend(lbp_features)
-        
-        # 3. Statistical features
-        features.extend([
-            np.mean(face_gray), np.std(face_gray),
-            np.median(face_gray), np.var(face_gray)
-        ])
-        
-        return np.array(features, dtype=np.float32)
+        return self.extract_features_batch(face_gray[None])[0]
 
     def _extract_lbp_features(self, face_gray):
         """Extract Local Binary Pattern features"""
-        lbp_features = []
-        
-        # Simple LBP implementation
-        for i in range(1, face_gray.shape[0] - 1, 8):
-            for j in range(1, face_gray.shape[1] - 1, 8):
-                center = face_gray[i, j]
-                binary_pattern = 0
-                
-                # 8-neighborhood
-                neighbors = [
-                    face_gray[i-1, j-1], face_gray[i-1, j], face_gray[i-1, j+1],
-                    face_gray[i, j+1], face_gray[i+1, j+1], face_gray[i+1, j],
-                    face_gray[i+1, j-1], face_gray[i, j-1]
-                ]
-                
-                for idx, neighbor in enumerate(neighbors):
-                    if neighbor >= center:
-                        binary_pattern |= (1 << idx)
-                
-                lbp_features.append(binary_pattern)
-        
-        # Create histogram of LBP values
-        hist, _ = np.histogram(lbp_features, bins=256, range=(0, 256))
-        return hist.tolist()
+        return _lbp_histograms(face_gray[None])[0].tolist()
+
+
+# Detect on a JPEG decoded at 1/2, 1/4 or 1/8 size (1 = full size). The
+# dlib encoding always runs on the full-resolution image.
+DETECT_REDUCTION = int(os.environ.get("FACE_ENROLL_DETECT_REDUCTION", "1"))
+
+_CV2_REDUCED = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4,
+                8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def read_bytes(img_path):
+    try:
+        with open(img_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    return data or None
+
+
+def decode_rgb(data, reduction=1):
+    """
+    Decodes image bytes to an RGB uint8 array, or None.
+
+    PIL is used as before (it is what face_recognition.load_image_file
+    does), so dlib sees exactly the pixels it always did; OpenCV is the
+    fallback when PIL is missing or cannot decode the file. With
+    reduction 2, 4 or 8 a JPEG is decoded at that fraction of its size
+    (PIL draft mode / IMREAD_REDUCED_*), which scales in the IDCT instead
+    of decoding in full and resizing; other formats come back full size.
+    """
+    if data is None:
+        return None
+    try:
+        from PIL import Image
+        pil_image = Image.open(io.BytesIO(data))
+        if reduction > 1:
+            pil_image.draft("RGB", (pil_image.width // reduction, pil_image.height // reduction))
+        return np.array(pil_image.convert("RGB"))
+    except Exception:
+        pass
 
-def diagnose_image(img_path):
-    """Diagnose image properties"""
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8),
+                       _CV2_REDUCED.get(reduction, cv2.IMREAD_COLOR))
+    if img is not None:
+        # Swap channels in place rather than allocating a second image
+        cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
+    return img
+
+
+def load_rgb(img_path):
+    """
+    Reads and decodes an image once, into the RGB buffer that both
+    face_recognition and the robust encoder use. Returns None if it
+    cannot be read.
+    """
+    return decode_rgb(read_bytes(img_path))
+
+
+def detect_faces(data, img_rgb, reduction=DETECT_REDUCTION):
+    """
+    HOG face boxes for the full-size `img_rgb`. With reduction > 1 the
+    detector runs on a reduced decode of the same bytes and the boxes
+    are mapped back to full size.
+    """
+    small = decode_rgb(data, reduction) if reduction > 1 else None
+    if small is None or small.shape == img_rgb.shape:
+        return face_recognition.face_locations(img_rgb, model="hog")
+
+    h, w = img_rgb.shape[:2]
+    scale = w / small.shape[1]
+    return [
+        (max(0, int(round(top * scale))), min(w, int(round(right * scale))),
+         min(h, int(round(bottom * scale))), max(0, int(round(left * scale))))
+        for top, right, bottom, left in face_recognition.face_locations(small, model="hog")
+    ]
+
+def diagnose_image(img_path, img_rgb=None):
+    """Diagnose image properties (reuses an already decoded image if given)"""
     print(f"\n=== Diagnosing {os.path.basename(img_path)} ===")
-    
-    # Check with OpenCV
-    img_cv = cv2.imread(img_path)
-    if img_cv is not None:
-        print(f"OpenCV - Shape: {img_cv.shape}, dtype: {img_cv.dtype}")
-        print(f"OpenCV - Min: {img_cv.min()}, Max: {img_cv.max()}")
+
+    if img_rgb is None:
+        img_rgb = load_rgb(img_path)
+    if img_rgb is not None:
+        print(f"Decoded - Shape: {img_rgb.shape}, dtype: {img_rgb.dtype}")
+        print(f"Decoded - Min: {img_rgb.min()}, Max: {img_rgb.max()}")
     else:
-        print("OpenCV - Failed to read")
-    
-    # Check with PIL
+        print("Decoded - Failed to read")
+
+    # PIL only parses the header here; the pixels are not decoded again
     try:
+        from PIL import Image
         pil_img = Image.open(img_path)
         print(f"PIL - Mode: {pil_img.mode}, Size: {pil_img.size}")
-        pil_array = np.array(pil_img)
-        print(f"PIL Array - Shape: {pil_array.shape}, dtype: {pil_array.dtype}")
     except Exception as e:
         print(f"PIL - Error: {e}")
     
@@ -146,6 +337,7 @@ def diagnose_image(img_path):
     file_size = os.path.getsize(img_path)
     print(f"File size: {file_size} bytes")
 
+
 def encode_faces(voter_id):
     """
     Processes a dataset of images for a given voter ID using multiple methods.
@@ -177,77 +369,53 @@ def encode_faces(voter_id):
     if not image_files:
         print("❌ No image files found in dataset")
         return
-    
-    # Diagnose first image
-    first_img_path = os.path.join(dataset_path, image_files[0])
-    diagnose_image(first_img_path)
+
+    _load_face_recognition()
     
     success_count = 0
+    diagnosed = False
     
     for file in sorted(image_files):
         img_path = os.path.join(dataset_path, file)
         print(f"\n--- Processing {file} ---")
+
+        # One read and one decode per image, shared by both methods
+        data = read_bytes(img_path)
+        img_rgb = decode_rgb(data)
+        if not diagnosed:
+            diagnose_image(img_path, img_rgb)
+            diagnosed = True
+        if img_rgb is None:
+            print(f"❌ Could not read {file}")
+            continue
         
         # Method 1: Try face_recognition library
         face_rec_success = False
         try:
-            # Try PIL first
-            pil_image = Image.open(img_path).convert('RGB')
-            img_rgb = np.array(pil_image)
+            boxes = detect_faces(data, img_rgb)
             
-            # Ensure proper format
-            if img_rgb.dtype != np.uint8:
-                img_rgb = img_rgb.astype(np.uint8)
-            
-            if len(img_rgb.shape) == 3 and img_rgb.shape[2] == 3:
-                boxes = face_recognition.face_locations(img_rgb, model="hog")
-                
-                if boxes:
-                    faces = face_recognition.face_encodings(img_rgb, boxes)
-                    if faces:
-                        face_recognition_encodings.append(faces[0])
-                        print(f"✅ Face_recognition encoded {file}")
-                        face_rec_success = True
+            if boxes:
+                faces = face_recognition.face_encodings(img_rgb, boxes)
+                if faces:
+                    face_recognition_encodings.append(faces[0])
+                    print(f"✅ Face_recognition encoded {file}")
+                    face_rec_success = True
                     
         except Exception as e:
             print(f"⚠️ Face_recognition failed for {file}: {e}")
-            
-            # Fallback: Try OpenCV reading
-            try:
-                img = cv2.imread(img_path, cv2.IMREAD_COLOR)
-                if img is not None:
-                    if img.dtype != np.uint8:
-                        img = img.astype(np.uint8)
-                    
-                    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-                    boxes = face_recognition.face_locations(img_rgb, model="hog")
-                    
-                    if boxes:
-                        faces = face_recognition.face_encodings(img_rgb, boxes)
-                        if faces:
-                            face_recognition_encodings.append(faces[0])
-                            print(f"✅ Face_recognition encoded {file} (OpenCV fallback)")
-                            face_rec_success = True
-                        
-            except Exception as fallback_error:
-                print(f"⚠️ Face_recognition OpenCV fallback failed: {fallback_error}")
         
         # Method 2: Try robust encoding
         robust_success = False
         try:
-            img = cv2.imread(img_path)
-            if img is not None:
-                features = robust_encoder.extract_face_features(img)
-                if features is not None:
-                    # Normalize features
-                    features = normalize([features])[0]
-                    robust_encodings.append(features)
-                    print(f"✅ Robust encoder processed {file}")
-                    robust_success = True
-                else:
-                    print(f"⚠️ Robust encoder found no face in {file}")
+            features = robust_encoder.extract_face_features_rgb(img_rgb)
+            if features is not None:
+                # Normalize features
+                features = l2_normalize(features)
+                robust_encodings.append(features)
+                print(f"✅ Robust encoder processed {file}")
+                robust_success = True
             else:
-                print(f"❌ Could not read {file} with OpenCV")
+                print(f"⚠️ Robust encoder found no face in {file}")
                 
         except Exception as e:
             print(f"⚠️ Robust encoding failed for {file}: {e}")
@@ -283,7 +451,7 @@ def encode_faces(voter_id):
         print("  1. Check if images contain clear faces")
         print("  2. Improve lighting during capture")
         print("  3. Ensure faces are well-centered")
-        print("  4. Install MediaPipe: pip install mediapipe scikit-learn")
+        print("  4. Install MediaPipe: pip install mediapipe")
 
 if __name__ == "__main__":
     voter_id = sys.argv[1]
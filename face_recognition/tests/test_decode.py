@@ -0,0 +1,41 @@
+import types
+
+import cv2
+import numpy as np
+
+import feature_encoding
+
+
+def _jpeg(h=240, w=320):
+    bgr = np.zeros((h, w, 3), dtype=np.uint8)
+    bgr[:, :, 2] = 200  # red in BGR order
+    return cv2.imencode(".jpg", bgr)[1].tobytes()
+
+
+def test_decode_is_rgb_and_reduced_decode_is_smaller():
+    data = _jpeg()
+    full = feature_encoding.decode_rgb(data)
+    half = feature_encoding.decode_rgb(data, 2)
+
+    assert full.shape == (240, 320, 3)
+    assert full[..., 0].mean() > 190 and full[..., 2].mean() < 10
+    assert half.shape == (120, 160, 3)
+    assert feature_encoding.decode_rgb(None) is None
+    assert feature_encoding.decode_rgb(b"not an image") is None
+
+
+def test_reduced_detection_maps_boxes_back_to_full_size(monkeypatch):
+    seen = []
+
+    def face_locations(rgb, model="hog"):
+        seen.append(rgb.shape)
+        return [(10, 60, 50, 20)]
+
+    monkeypatch.setattr(feature_encoding, "face_recognition",
+                        types.SimpleNamespace(face_locations=face_locations))
+    data = _jpeg()
+    full = feature_encoding.decode_rgb(data)
+
+    assert feature_encoding.detect_faces(data, full, reduction=4) == [(40, 240, 200, 80)]
+    assert feature_encoding.detect_faces(data, full, reduction=1) == [(10, 60, 50, 20)]
+    assert seen == [(60, 80, 3), (240, 320, 3)]
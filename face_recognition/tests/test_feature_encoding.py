@@ -0,0 +1,76 @@
+import cv2
+import numpy as np
+
+import feature_encoding
+
+
+def reference_combine_features(face_gray):
+    """The pre-vectorization _extract_combined_features and _extract_lbp_features, inlined."""
+    features = []
+
+    grad_x = cv2.Sobel(face_gray, cv2.CV_64F, 1, 0, ksize=3)
+    grad_y = cv2.Sobel(face_gray, cv2.CV_64F, 0, 1, ksize=3)
+    magnitude = np.sqrt(grad_x**2 + grad_y**2)
+    angle = np.arctan2(grad_y, grad_x)
+
+    cell_size = 16
+    for i in range(0, face_gray.shape[0], cell_size):
+        for j in range(0, face_gray.shape[1], cell_size):
+            cell_mag = magnitude[i:i+cell_size, j:j+cell_size]
+            cell_angle = angle[i:i+cell_size, j:j+cell_size]
+
+            hist, _ = np.histogram(cell_angle, bins=9, range=(-np.pi, np.pi),
+                                   weights=cell_mag)
+            features.extend(hist)
+
+    lbp_features = []
+    for i in range(1, face_gray.shape[0] - 1, 8):
+        for j in range(1, face_gray.shape[1] - 1, 8):
+            center = face_gray[i, j]
+            binary_pattern = 0
+            neighbors = [
+                face_gray[i-1, j-1], face_gray[i-1, j], face_gray[i-1, j+1],
+                face_gray[i, j+1], face_gray[i+1, j+1], face_gray[i+1, j],
+                face_gray[i+1, j-1], face_gray[i, j-1]
+            ]
+            for idx, neighbor in enumerate(neighbors):
+                if neighbor >= center:
+                    binary_pattern |= (1 << idx)
+            lbp_features.append(binary_pattern)
+    hist, _ = np.histogram(lbp_features, bins=256, range=(0, 256))
+    features.extend(hist.tolist())
+
+    features.extend([
+        np.mean(face_gray), np.std(face_gray),
+        np.median(face_gray), np.var(face_gray)
+    ])
+
+    return np.array(features, dtype=np.float32)
+
+
+def _faces(count, shape=(128, 128)):
+    rng = np.random.default_rng(7)
+    faces = rng.integers(0, 256, (count,) + shape, dtype=np.uint8)
+    faces[0] = 0        # flat image: zero gradients, angle 0
+    faces[1, :, 64:] = 255  # one hard edge
+    return faces
+
+
+def test_extract_features_batch_is_bit_identical_to_per_image_reference():
+    encoder = object.__new__(feature_encoding.RobustFaceEncoder)  # no MediaPipe needed
+    faces = _faces(feature_encoding.EXTRACT_CHUNK * 2 + 3)  # ragged last chunk
+
+    batched = encoder.extract_features_batch(faces)
+
+    assert batched.shape == (len(faces), 836) and batched.dtype == np.float32
+    for face, row in zip(faces, batched):
+        assert np.array_equal(row, reference_combine_features(face))
+        assert np.array_equal(row, encoder._extract_combined_features(face))
+
+
+def test_extract_features_batch_matches_reference_on_odd_sizes():
+    encoder = object.__new__(feature_encoding.RobustFaceEncoder)
+    for shape in ((37, 53), (17, 16)):
+        faces = _faces(3, shape)
+        for face, row in zip(faces, encoder.extract_features_batch(faces)):
+            assert np.array_equal(row, reference_combine_features(face))
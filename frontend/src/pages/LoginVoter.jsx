@@ -4,6 +4,10 @@ import { loginUser, verifyFace } from "../services/api";
 import Navbar from "../components/Navbar";
 import { ethers } from "ethers";
 
+// Frames per verification request and the gap between them
+const BURST_FRAMES = 3;
+const BURST_GAP_MS = 150;
+
 export default function VoterLogin() {
   const navigate = useNavigate();
 
@@ -83,20 +87,24 @@ export default function VoterLogin() {
     verifyInterval.current = setInterval(async () => {
       if (!videoRef.current || !loggedUser) return;
 
-      // Capture frame
+      // Capture a short burst: the server stops at the first clear
+      // match, so one blurred frame does not cost a whole retry
       const canvas = document.createElement("canvas");
       canvas.width = 400;
       canvas.height = 300;
 
       const ctx = canvas.getContext("2d");
-      ctx.drawImage(videoRef.current, 0, 0, canvas.width, canvas.height);
-
-      const capturedImage = canvas.toDataURL("image/jpeg");
+      const images = [];
+      for (let i = 0; i < BURST_FRAMES; i++) {
+        if (i > 0) await new Promise((r) => setTimeout(r, BURST_GAP_MS));
+        ctx.drawImage(videoRef.current, 0, 0, canvas.width, canvas.height);
+        images.push(canvas.toDataURL("image/jpeg"));
+      }
 
       // Send to backend
       const res = await verifyFace({
         voterId: loggedUser.email, // MUST use voterId from DB
-        image: capturedImage,
+        images,
       });
 
       if (res.success && res.confidence === 100) {
@@ -43,6 +43,31 @@ contract Voting {
         emit VoterRegistered(_voter);
     }
 
+    // Batch forms: one transaction per chunk instead of one per entry.
+    // The caller sizes chunks to fit the block gas limit; voters that are
+    // already registered are skipped, so a retried chunk is harmless.
+    function addCandidates(string[] calldata _names) external onlyAdmin {
+        require(!electionStarted, "Election already started");
+        uint count = candidatesCount;
+        for (uint i = 0; i < _names.length; i++) {
+            count++;
+            candidates[count] = Candidate(count, _names[i], 0);
+            emit CandidateAdded(count, _names[i]);
+        }
+        candidatesCount = count;
+    }
+
+    function registerVoters(address[] calldata _voters) external onlyAdmin {
+        require(!electionStarted, "Election already started");
+        for (uint i = 0; i < _voters.length; i++) {
+            address voter = _voters[i];
+            if (!registeredVoters[voter]) {
+                registeredVoters[voter] = true;
+                emit VoterRegistered(voter);
+            }
+        }
+    }
+
     function startElection() external onlyAdmin {
         electionStarted = true;
     }